@@ -1,13 +1,20 @@
 # mcp_server/app.py
 import os
+import json
+import threading
+import time
 import torch
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from transformers import pipeline
 from chatterbox import Chatterbox
 from google.cloud import speech
 from google.cloud import texttospeech
-import tempfile
 import io
+from batching import BatchScheduler
+from audio_decode import decode_audio, decode_pcm16, AudioDecodeError, PCM_CONTENT_TYPES
+from streaming_stt import IncrementalTranscriber
+from streaming_tts import join_wavs, split_sentences, stream_pcm
+from tts_cache import TTSAudioCache, tts_cache_key
 
 # --- Initialization ---
 app = Flask(__name__)
@@ -23,6 +30,45 @@ GOOGLE_TTS_LANGUAGE_CODE = "en-US"
 GOOGLE_TTS_VOICE_NAME = "en-US-Standard-J"
 GOOGLE_STT_LANGUAGE_CODE = "en-US"
 
+# --- Self-hosted STT Batching ---
+# Concurrent /stt requests are grouped into one Whisper call of up to
+# STT_MAX_BATCH_SIZE utterances. Requests that queue while the model is busy
+# always join the next batch; STT_BATCH_WAIT_MS additionally holds a lone
+# request back to wait for company (0 = never add latency).
+STT_MAX_BATCH_SIZE = int(os.environ.get('STT_MAX_BATCH_SIZE', 8))
+STT_BATCH_WAIT_MS = float(os.environ.get('STT_BATCH_WAIT_MS', 0))
+
+# --- Streaming STT (/stt/stream) ---
+# The open utterance is re-decoded every STT_STREAM_STEP_MS for partial
+# results and finalized after STT_ENDPOINT_SILENCE_MS of trailing silence.
+# STT_STREAM_MAX_WINDOW_S caps the audio in any one re-decode: longer
+# utterances commit their older audio as fixed text and keep going.
+STT_STREAM_STEP_MS = int(os.environ.get('STT_STREAM_STEP_MS', 1000))
+STT_STREAM_MAX_WINDOW_S = float(os.environ.get('STT_STREAM_MAX_WINDOW_S', 8))
+STT_ENDPOINT_SILENCE_MS = int(os.environ.get('STT_ENDPOINT_SILENCE_MS', 600))
+STT_VAD_ENERGY_THRESHOLD = float(os.environ.get('STT_VAD_ENERGY_THRESHOLD', 0.01))
+STT_STREAM_READ_MS = 100  # audio read from the request body per step
+
+# --- Streaming TTS (/tts/stream) ---
+# Sentences synthesized ahead of the one currently being sent
+TTS_STREAM_LOOKAHEAD = int(os.environ.get('TTS_STREAM_LOOKAHEAD', 1))
+
+# --- TTS Audio Cache ---
+# Synthesized audio is cached per sentence, keyed by normalized text,
+# provider, voice and format: a byte-bounded memory LRU in front of an
+# mmap-read disk tier that survives restarts.
+TTS_CACHE_ENABLED = os.environ.get('TTS_CACHE_ENABLED', 'true').lower() == 'true'
+TTS_CACHE_MEMORY_MB = int(os.environ.get('TTS_CACHE_MEMORY_MB', 64))
+TTS_CACHE_DIR = os.environ.get('TTS_CACHE_DIR', '/tmp/tts_cache')
+TTS_CACHE_DISK_MB = int(os.environ.get('TTS_CACHE_DISK_MB', 1024))
+SELF_HOSTED_TTS_VOICE = "chatterbox-default"
+
+tts_cache = TTSAudioCache(
+    memory_max_bytes=TTS_CACHE_MEMORY_MB * 1024 * 1024,
+    disk_dir=TTS_CACHE_DIR or None,
+    disk_max_bytes=TTS_CACHE_DISK_MB * 1024 * 1024,
+) if TTS_CACHE_ENABLED else None
+
 # --- Conditional Model Loading ---
 
 # Load self-hosted models only if they are selected as a provider
@@ -33,6 +79,14 @@ if 'self-hosted' in [STT_PROVIDER, TTS_PROVIDER]:
         device = 0 if torch.cuda.is_available() else -1
         print(f"Whisper using device: {'GPU' if device == 0 else 'CPU'}")
         stt_pipe = pipeline("automatic-speech-recognition", model="distil-whisper/distil-large-v2", device=device)
+        # Audio is decoded in memory straight to the rate the model expects
+        STT_SAMPLE_RATE = stt_pipe.feature_extractor.sampling_rate
+        stt_batcher = BatchScheduler(
+            lambda inputs: stt_pipe(inputs, batch_size=len(inputs)),
+            max_batch_size=STT_MAX_BATCH_SIZE,
+            max_wait_ms=STT_BATCH_WAIT_MS,
+            name="whisper",
+        )
         print("Whisper STT model loaded.")
     # Chatterbox TTS Model
     if TTS_PROVIDER == 'self-hosted':
@@ -58,61 +112,255 @@ def check_auth():
 
 # --- Internal Provider Functions ---
 
-def _stt_self_hosted(file):
-    with tempfile.NamedTemporaryFile(delete=True, suffix=".webm") as temp_audio:
-        file.save(temp_audio.name)
-        result = stt_pipe(temp_audio.name)
+def _read_audio_request():
+    """
+    Returns (audio_bytes, content_type, sample_rate, channels) for /stt.
+    Accepts the original multipart `file` upload, or a raw request body:
+    e.g. `Content-Type: audio/L16; rate=48000; channels=2` for 16-bit PCM
+    (rate/channels may also be passed as `sample_rate`/`channels` query args).
+    """
+    if 'file' in request.files:
+        file = request.files['file']
+        content_type = file.mimetype
+        params = file.mimetype_params
+        data = file.read()
+    else:
+        content_type = request.mimetype
+        params = request.mimetype_params
+        data = request.get_data()
+    sample_rate = int(params.get('rate') or request.args.get('sample_rate', 16000))
+    channels = int(params.get('channels') or request.args.get('channels', 1))
+    return data, content_type, sample_rate, channels
+
+def _stt_self_hosted(data, content_type, sample_rate, channels):
+    audio = decode_audio(data, content_type, STT_SAMPLE_RATE, sample_rate=sample_rate, channels=channels)
+    result = stt_batcher.submit({"raw": audio, "sampling_rate": STT_SAMPLE_RATE})
     return result['text']
 
-def _stt_google(file):
-    content = file.read()
-    audio = speech.RecognitionAudio(content=content)
-    config = speech.RecognitionConfig(
-        encoding=speech.RecognitionConfig.AudioEncoding.WEBM_OPUS,
-        sample_rate_hertz=48000,
-        language_code=GOOGLE_STT_LANGUAGE_CODE,
-    )
+def _stt_google(data, content_type, sample_rate, channels):
+    audio = speech.RecognitionAudio(content=data)
+    if content_type.lower() in PCM_CONTENT_TYPES:
+        config = speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            sample_rate_hertz=sample_rate,
+            audio_channel_count=channels,
+            language_code=GOOGLE_STT_LANGUAGE_CODE,
+        )
+    else:
+        config = speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.WEBM_OPUS,
+            sample_rate_hertz=48000,
+            language_code=GOOGLE_STT_LANGUAGE_CODE,
+        )
     response = google_speech_client.recognize(config=config, audio=audio)
     if response.results and response.results[0].alternatives:
         return response.results[0].alternatives[0].transcript
     return ""
 
-def _tts_self_hosted(text):
-    audio_bytes = tts_model.synthesize(text)
-    return send_file(io.BytesIO(audio_bytes), mimetype='audio/wav')
+_stream_stats_lock = threading.Lock()
+_stream_stats = {"active": 0, "streams": 0, "finals": 0, "partials": 0, "audio_seconds": 0.0, "decoded_seconds": 0.0}
 
-def _tts_google(text):
+def _stt_stream_self_hosted(stream, sample_rate, channels):
+    """
+    Reads 16-bit PCM from a chunked request body and yields NDJSON results
+    as the incremental transcriber produces them.
+    """
+    transcriber = IncrementalTranscriber(
+        lambda audio: stt_batcher.submit({"raw": audio, "sampling_rate": STT_SAMPLE_RATE})['text'],
+        sample_rate=STT_SAMPLE_RATE,
+        step_s=STT_STREAM_STEP_MS / 1000.0,
+        max_window_s=STT_STREAM_MAX_WINDOW_S,
+        endpoint_silence_ms=STT_ENDPOINT_SILENCE_MS,
+        energy_threshold=STT_VAD_ENERGY_THRESHOLD,
+    )
+    frame_bytes = 2 * channels
+    read_size = frame_bytes * sample_rate * STT_STREAM_READ_MS // 1000
+    audio_seconds = 0.0
+    with _stream_stats_lock:
+        _stream_stats["active"] += 1
+        _stream_stats["streams"] += 1
+    try:
+        while True:
+            data = stream.read(read_size)
+            if data:
+                # Keep whole sample frames together across reads
+                while len(data) % frame_bytes:
+                    more = stream.read(frame_bytes - len(data) % frame_bytes)
+                    if not more:
+                        break
+                    data += more
+                samples = decode_pcm16(data, sample_rate, channels, STT_SAMPLE_RATE)
+                audio_seconds += len(samples) / STT_SAMPLE_RATE
+                results = transcriber.feed(samples)
+            else:
+                results = transcriber.finish()
+            for result in results:
+                with _stream_stats_lock:
+                    _stream_stats["finals" if result["is_final"] else "partials"] += 1
+                yield json.dumps(result) + "\n"
+            if not data:
+                break
+    finally:
+        with _stream_stats_lock:
+            _stream_stats["active"] -= 1
+            _stream_stats["audio_seconds"] += audio_seconds
+            _stream_stats["decoded_seconds"] += transcriber.decoded_seconds
+
+def _stt_stream_stats():
+    with _stream_stats_lock:
+        stats = dict(_stream_stats)
+    # Seconds of audio decoded per second of input; bounded by the step and window sizes
+    stats["redecode_ratio"] = round(stats["decoded_seconds"] / stats["audio_seconds"], 3) if stats["audio_seconds"] else 0.0
+    stats["audio_seconds"] = round(stats["audio_seconds"], 3)
+    stats["decoded_seconds"] = round(stats["decoded_seconds"], 3)
+    return stats
+
+def _synthesize_google(text, encoding):
     synthesis_input = texttospeech.SynthesisInput(text=text)
     voice = texttospeech.VoiceSelectionParams(
         language_code=GOOGLE_TTS_LANGUAGE_CODE, name=GOOGLE_TTS_VOICE_NAME
     )
-    audio_config = texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.MP3)
+    audio_config = texttospeech.AudioConfig(audio_encoding=encoding)
     response = google_tts_client.synthesize_speech(
         input=synthesis_input, voice=voice, audio_config=audio_config
     )
-    return send_file(io.BytesIO(response.audio_content), mimetype='audio/mpeg')
+    return response.audio_content
+
+def _tts_synthesizer(audio_format):
+    """
+    Returns a function that synthesizes one sentence with the configured
+    provider in `audio_format` ('wav' or 'mp3'), going through the TTS cache.
+    """
+    if TTS_PROVIDER == 'self-hosted':
+        voice = SELF_HOSTED_TTS_VOICE
+        synthesize = tts_model.synthesize
+    else:
+        voice = GOOGLE_TTS_VOICE_NAME
+        # LINEAR16 responses carry a WAV header
+        encoding = texttospeech.AudioEncoding.MP3 if audio_format == 'mp3' else texttospeech.AudioEncoding.LINEAR16
+        synthesize = lambda text: _synthesize_google(text, encoding)
+    if tts_cache is None:
+        return synthesize
+
+    def cached_synthesize(text):
+        key = tts_cache_key(text, TTS_PROVIDER, voice, audio_format)
+        return tts_cache.get_or_synthesize(key, lambda: synthesize(text))
+    return cached_synthesize
+
+def _synthesize_by_sentence(text, audio_format):
+    # Sentences already in the cache are reused; only new ones are synthesized
+    synthesize = _tts_synthesizer(audio_format)
+    return [synthesize(sentence) for sentence in split_sentences(text) or [text]]
+
+def _tts_self_hosted(text):
+    audio_bytes = join_wavs(_synthesize_by_sentence(text, 'wav'))
+    return send_file(io.BytesIO(audio_bytes), mimetype='audio/wav')
+
+_tts_stream_stats_lock = threading.Lock()
+_tts_stream_stats = {"requests": 0, "chunks": 0, "bytes": 0, "ttfb_ms_total": 0.0, "duration_ms_total": 0.0}
+
+def _tts_stream(text, audio_format):
+    """
+    Returns (chunk_generator, sample_rate, channels). The first sentence is
+    synthesized before returning so the response headers can describe the
+    audio; the rest are synthesized while earlier ones are being sent.
+    """
+    synthesize = _tts_synthesizer('wav')
+    start = time.perf_counter()
+    chunks = stream_pcm(synthesize, text, audio_format=audio_format, lookahead=TTS_STREAM_LOOKAHEAD)
+    sample_rate, channels = next(chunks)
+
+    def timed_chunks():
+        sent = 0
+        count = 0
+        ttfb = None
+        try:
+            for chunk in chunks:
+                if ttfb is None:
+                    ttfb = time.perf_counter() - start
+                sent += len(chunk)
+                count += 1
+                yield chunk
+        finally:
+            chunks.close()
+            with _tts_stream_stats_lock:
+                _tts_stream_stats["requests"] += 1
+                _tts_stream_stats["chunks"] += count
+                _tts_stream_stats["bytes"] += sent
+                _tts_stream_stats["ttfb_ms_total"] += (ttfb or 0.0) * 1000
+                _tts_stream_stats["duration_ms_total"] += (time.perf_counter() - start) * 1000
+
+    return timed_chunks(), sample_rate, channels
+
+def _tts_stream_stats_snapshot():
+    with _tts_stream_stats_lock:
+        stats = dict(_tts_stream_stats)
+    requests = stats["requests"]
+    return {
+        "requests": requests,
+        "chunks": stats["chunks"],
+        "bytes": stats["bytes"],
+        "avg_ttfb_ms": round(stats.pop("ttfb_ms_total") / requests, 3) if requests else 0.0,
+        "avg_duration_ms": round(stats.pop("duration_ms_total") / requests, 3) if requests else 0.0,
+    }
+
+def _tts_google(text):
+    # MPEG audio frames can be concatenated as-is
+    audio_bytes = b''.join(_synthesize_by_sentence(text, 'mp3'))
+    return send_file(io.BytesIO(audio_bytes), mimetype='audio/mpeg')
 
 # --- API Endpoints ---
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    if not check_auth(): return jsonify({"error": "Unauthorized"}), 401
+    stats = {}
+    if STT_PROVIDER == 'self-hosted':
+        stats["stt_batching"] = stt_batcher.stats()
+        stats["stt_streaming"] = _stt_stream_stats()
+    stats["tts_streaming"] = _tts_stream_stats_snapshot()
+    if tts_cache is not None:
+        stats["tts_cache"] = tts_cache.stats()
+    return jsonify(stats)
+
 @app.route('/stt', methods=['POST'])
 def speech_to_text():
     if not check_auth(): return jsonify({"error": "Unauthorized"}), 401
-    if 'file' not in request.files: return jsonify({"error": "No audio file part"}), 400
+    audio_request = _read_audio_request()
+    if not audio_request[0]: return jsonify({"error": "No audio provided"}), 400
     
-    file = request.files['file']
     try:
         if STT_PROVIDER == 'self-hosted':
-            transcribed_text = _stt_self_hosted(file)
+            transcribed_text = _stt_self_hosted(*audio_request)
         elif STT_PROVIDER == 'google':
-            transcribed_text = _stt_google(file)
+            transcribed_text = _stt_google(*audio_request)
         else:
             return jsonify({"error": f"Invalid STT provider configured: {STT_PROVIDER}"}), 500
         
         return jsonify({"text": transcribed_text})
+    except AudioDecodeError as e:
+        print(f"Could not decode audio for STT: {e}")
+        return jsonify({"error": "Unsupported or corrupt audio"}), 400
     except Exception as e:
         print(f"Error during STT processing with {STT_PROVIDER}: {e}")
         return jsonify({"error": "Failed to process audio file"}), 500
 
+@app.route('/stt/stream', methods=['POST'])
+def speech_to_text_stream():
+    """
+    Streaming STT: the request body is chunked 16-bit PCM (rate/channels via
+    `Content-Type: audio/L16; rate=...; channels=...` or query args) and the
+    response is NDJSON {"text", "is_final"} lines, partials included.
+    """
+    if not check_auth(): return jsonify({"error": "Unauthorized"}), 401
+    if STT_PROVIDER != 'self-hosted':
+        return jsonify({"error": f"Streaming STT is not supported for provider: {STT_PROVIDER}"}), 501
+    params = request.mimetype_params
+    sample_rate = int(params.get('rate') or request.args.get('sample_rate', 16000))
+    channels = int(params.get('channels') or request.args.get('channels', 1))
+    generator = _stt_stream_self_hosted(request.stream, sample_rate, channels)
+    return Response(stream_with_context(generator), mimetype='application/x-ndjson')
+
 @app.route('/tts', methods=['POST'])
 def text_to_speech():
     if not check_auth(): return jsonify({"error": "Unauthorized"}), 401
@@ -131,5 +379,33 @@ def text_to_speech():
         print(f"Error during TTS synthesis with {TTS_PROVIDER}: {e}")
         return jsonify({"error": "Failed to synthesize speech"}), 500
 
+@app.route('/tts/stream', methods=['POST'])
+def text_to_speech_stream():
+    """
+    Streaming TTS: synthesizes sentence by sentence and writes each one to a
+    chunked response as soon as it is ready. `format` is 'wav' (a streamable
+    WAV header followed by 16-bit PCM, the default) or 'pcm' (raw audio/L16).
+    """
+    if not check_auth(): return jsonify({"error": "Unauthorized"}), 401
+    data = request.json
+    if not data or 'text' not in data: return jsonify({"error": "Text not provided"}), 400
+    audio_format = data.get('format', 'wav')
+    if audio_format not in ('wav', 'pcm'):
+        return jsonify({"error": f"Unsupported streaming format: {audio_format}"}), 400
+    if TTS_PROVIDER not in ('self-hosted', 'google'):
+        return jsonify({"error": f"Invalid TTS provider configured: {TTS_PROVIDER}"}), 500
+
+    try:
+        chunks, sample_rate, channels = _tts_stream(data.get('text'), audio_format)
+    except StopIteration:
+        return jsonify({"error": "Text contained nothing to synthesize"}), 400
+    except Exception as e:
+        print(f"Error during streaming TTS synthesis with {TTS_PROVIDER}: {e}")
+        return jsonify({"error": "Failed to synthesize speech"}), 500
+
+    mimetype = 'audio/wav' if audio_format == 'wav' else f'audio/L16;rate={sample_rate};channels={channels}'
+    headers = {"X-Sample-Rate": str(sample_rate), "X-Channels": str(channels)}
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 8081)))
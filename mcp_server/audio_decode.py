@@ -0,0 +1,70 @@
+# mcp_server/audio_decode.py
+import os
+import subprocess
+from math import gcd
+
+import numpy as np
+from scipy.signal import resample_poly
+
+FFMPEG_BINARY = os.environ.get('FFMPEG_BINARY', 'ffmpeg')
+
+# Content types treated as headerless little-endian 16-bit PCM
+PCM_CONTENT_TYPES = {'audio/l16', 'audio/pcm', 'audio/x-pcm', 'application/octet-stream'}
+
+class AudioDecodeError(ValueError):
+    pass
+
+def resample(audio: np.ndarray, orig_rate: int, target_rate: int) -> np.ndarray:
+    """
+    Polyphase resampling to the model's sample rate (e.g. 48 kHz -> 16 kHz).
+    """
+    if orig_rate == target_rate:
+        return audio
+    divisor = gcd(orig_rate, target_rate)
+    return resample_poly(audio, target_rate // divisor, orig_rate // divisor).astype(np.float32)
+
+def decode_pcm16(data: bytes, sample_rate: int, channels: int, target_rate: int) -> np.ndarray:
+    """
+    Converts interleaved 16-bit PCM to mono float32 in [-1, 1] at target_rate,
+    without any container parsing.
+    """
+    if len(data) % (2 * channels):
+        # Drop a trailing partial frame rather than failing the whole utterance
+        data = data[:len(data) - len(data) % (2 * channels)]
+    audio = np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768.0
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    return resample(audio, sample_rate, target_rate)
+
+def decode_container(data: bytes, target_rate: int) -> np.ndarray:
+    """
+    Decodes a compressed container (WebM/Opus, Ogg, WAV, MP3...) entirely
+    through pipes: bytes go to ffmpeg's stdin and mono float32 samples at
+    target_rate come back on stdout, so nothing touches the disk.
+    """
+    command = [
+        FFMPEG_BINARY, "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-ac", "1", "-ar", str(target_rate),
+        "-f", "f32le", "pipe:1",
+    ]
+    try:
+        process = subprocess.run(command, input=data, capture_output=True, check=True)
+    except FileNotFoundError:
+        raise AudioDecodeError(f"{FFMPEG_BINARY} is required to decode compressed audio")
+    except subprocess.CalledProcessError as e:
+        raise AudioDecodeError(f"ffmpeg could not decode audio: {e.stderr.decode(errors='replace').strip()}")
+    audio = np.frombuffer(process.stdout, dtype=np.float32)
+    if audio.size == 0:
+        raise AudioDecodeError("Audio contained no samples")
+    return audio
+
+def decode_audio(data: bytes, content_type: str, target_rate: int, sample_rate=16000, channels=1) -> np.ndarray:
+    """
+    Decodes request bytes into the float32 array the ASR pipeline expects.
+    Raw PCM (audio/L16 and friends) is converted directly; anything else is
+    handed to ffmpeg as a container.
+    """
+    if (content_type or '').lower() in PCM_CONTENT_TYPES:
+        return decode_pcm16(data, sample_rate, channels, target_rate)
+    return decode_container(data, target_rate)
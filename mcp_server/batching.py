@@ -0,0 +1,115 @@
+# mcp_server/batching.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+class BatchScheduler:
+    """
+    Dynamic micro-batcher in front of a model that accepts a list of inputs.
+    Request threads call submit() and block; a single worker thread takes
+    everything already queued plus whatever arrives within `max_wait_ms` of
+    the first request (up to `max_batch_size`), runs the model once for the
+    whole batch and hands each caller its own result. With max_wait_ms=0 the
+    scheduler never delays a request and batches only form under load.
+    """
+    def __init__(self, infer_fn, max_batch_size=8, max_wait_ms=0, name="batch"):
+        self.infer_fn = infer_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._max_queue_depth = 0
+        self._batch_size_counts = {}
+        self._queue_wait_total = 0.0
+        self._infer_total = 0.0
+        self._running = True
+        self._worker = threading.Thread(target=self._run, name=f"{name}-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, item, timeout=None):
+        """
+        Queues one input and blocks until its result is ready.
+        """
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self._max_queue_depth = max(self._max_queue_depth, depth)
+        return future.result(timeout=timeout)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Requests that queued up while the model was busy join at once;
+            # otherwise wait for company until the first request's deadline.
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is None:
+                self._running = False
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while self._running:
+            batch = self._collect()
+            if batch is None:
+                break
+            start = time.perf_counter()
+            inputs = [item for item, _, _ in batch]
+            try:
+                results = self.infer_fn(inputs)
+                if len(results) != len(inputs):
+                    raise RuntimeError(f"{self.name} returned {len(results)} results for {len(inputs)} inputs")
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                with self._stats_lock:
+                    self._errors += 1
+                continue
+            finally:
+                elapsed = time.perf_counter() - start
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._infer_total += elapsed
+                self._queue_wait_total += sum(start - queued_at for _, _, queued_at in batch)
+                self._batch_size_counts[len(batch)] = self._batch_size_counts.get(len(batch), 0) + 1
+
+    def shutdown(self):
+        self._running = False
+        self._queue.put(None)
+        self._worker.join()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "batches": self._batches,
+                "items": self._items,
+                "errors": self._errors,
+                "avg_batch_size": round(self._items / self._batches, 3) if self._batches else 0.0,
+                "batch_size_histogram": dict(sorted(self._batch_size_counts.items())),
+                "avg_queue_wait_ms": round(self._queue_wait_total / self._items * 1000, 3) if self._items else 0.0,
+                "avg_batch_infer_ms": round(self._infer_total / self._batches * 1000, 3) if self._batches else 0.0,
+            }
@@ -0,0 +1,84 @@
+# mcp_server/bench_audio_decode.py
+"""
+Per-request audio ingest overhead for /stt, excluding the model itself.
+
+- tempfile:  the previous path - save the upload to a NamedTemporaryFile and
+             let the pipeline read it back and decode it with ffmpeg
+- container: decode_container - the same bytes piped through ffmpeg in memory
+- pcm16:     decode_pcm16 - raw 16-bit PCM from the WebRTC server, no ffmpeg
+
+Requires ffmpeg on PATH (or FFMPEG_BINARY) to build the WebM/Opus fixture.
+
+    python bench_audio_decode.py --seconds 3 --iterations 50
+"""
+import argparse
+import statistics
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+from audio_decode import FFMPEG_BINARY, decode_container, decode_pcm16
+
+TARGET_RATE = 16000
+
+def make_fixture(seconds, sample_rate=48000, channels=2):
+    """
+    Returns (pcm16_bytes, webm_opus_bytes) for a speech-like test signal.
+    """
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 3 * t))
+    signal = envelope * (0.3 * np.sin(2 * np.pi * 220 * t) + 0.1 * np.sin(2 * np.pi * 1800 * t))
+    interleaved = np.repeat(signal[:, None], channels, axis=1)
+    pcm = (interleaved * 32767).astype('<i2').tobytes()
+    encode = [
+        FFMPEG_BINARY, "-hide_banner", "-loglevel", "error",
+        "-f", "s16le", "-ar", str(sample_rate), "-ac", str(channels), "-i", "pipe:0",
+        "-c:a", "libopus", "-f", "webm", "pipe:1",
+    ]
+    webm = subprocess.run(encode, input=pcm, capture_output=True, check=True).stdout
+    return pcm, webm
+
+def tempfile_path(webm):
+    # What _stt_self_hosted used to do: save, then the pipeline reads the path
+    # back and decodes it with ffmpeg.
+    with tempfile.NamedTemporaryFile(delete=True, suffix=".webm") as temp_audio:
+        with open(temp_audio.name, "wb") as f:
+            f.write(webm)
+        with open(temp_audio.name, "rb") as f:
+            data = f.read()
+        return decode_container(data, TARGET_RATE)
+
+def measure(fn, iterations):
+    fn()  # warm up
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(0.95 * (len(timings) - 1))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=3.0, help="utterance length")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    pcm, webm = make_fixture(args.seconds)
+    cases = {
+        "tempfile": lambda: tempfile_path(webm),
+        "container": lambda: decode_container(webm, TARGET_RATE),
+        "pcm16": lambda: decode_pcm16(pcm, 48000, 2, TARGET_RATE),
+    }
+    baseline = None
+    print(f"{args.seconds:.1f}s utterance, {len(webm)} bytes WebM/Opus, {len(pcm)} bytes PCM")
+    print(f"{'path':>10} | {'p50 ms':>8} {'p95 ms':>8} | {'vs tempfile':>11}")
+    for name, fn in cases.items():
+        p50, p95 = measure(fn, args.iterations)
+        baseline = baseline or p50
+        print(f"{name:>10} | {p50:>8.2f} {p95:>8.2f} | {baseline / p50:>10.1f}x")
+
+if __name__ == "__main__":
+    main()
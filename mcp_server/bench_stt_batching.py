@@ -0,0 +1,113 @@
+# mcp_server/bench_stt_batching.py
+"""
+CPU benchmark for the STT batch scheduler.
+
+Compares one-request-at-a-time inference on a single model instance (what
+/stt did before) with the BatchScheduler at several concurrency levels.
+
+By default it uses a synthetic decoder-shaped workload: an autoregressive
+loop of matrix products whose cost, like Whisper's decoder on CPU, is
+dominated by streaming the weights and therefore grows slowly with batch
+size. Pass --model to benchmark a real Hugging Face ASR pipeline on
+synthetic audio instead (e.g. --model distil-whisper/distil-small.en).
+
+    python bench_stt_batching.py --concurrency 1 2 4 8 16 --requests 64
+"""
+import argparse
+import statistics
+import threading
+import time
+
+import numpy as np
+
+from batching import BatchScheduler
+
+def synthetic_model(hidden=1024, steps=32, seed=0):
+    rng = np.random.default_rng(seed)
+    weights = rng.standard_normal((hidden, hidden), dtype=np.float32) / np.sqrt(hidden)
+
+    def infer(inputs):
+        state = np.stack(inputs)
+        for _ in range(steps):
+            state = np.tanh(state @ weights)
+        return [row.sum() for row in state]
+
+    def make_input(i):
+        return np.random.default_rng(i).standard_normal(hidden, dtype=np.float32)
+
+    return infer, make_input
+
+def pipeline_model(model_name, seconds=3.0):
+    from transformers import pipeline
+    stt_pipe = pipeline("automatic-speech-recognition", model=model_name, device=-1)
+    sampling_rate = stt_pipe.feature_extractor.sampling_rate
+
+    def infer(inputs):
+        return stt_pipe(inputs, batch_size=len(inputs))
+
+    def make_input(i):
+        audio = np.random.default_rng(i).standard_normal(int(seconds * sampling_rate)).astype(np.float32) * 0.01
+        return {"raw": audio, "sampling_rate": sampling_rate}
+
+    return infer, make_input
+
+def run_load(call, make_input, concurrency, total_requests):
+    latencies = []
+    lock = threading.Lock()
+    per_worker = max(1, total_requests // concurrency)
+
+    def worker(worker_id):
+        for n in range(per_worker):
+            item = make_input(worker_id * per_worker + n)
+            start = time.perf_counter()
+            call(item)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "throughput": len(latencies) / wall,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=64, help="requests per concurrency level")
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=0)
+    parser.add_argument("--model", help="Hugging Face ASR model to load instead of the synthetic workload")
+    args = parser.parse_args()
+
+    infer, make_input = pipeline_model(args.model) if args.model else synthetic_model()
+    infer([make_input(0)])  # warm up
+
+    # Baseline: one model instance, one request at a time
+    model_lock = threading.Lock()
+    def serial_call(item):
+        with model_lock:
+            return infer([item])[0]
+
+    print(f"{'concurrency':>11} | {'serial req/s':>12} {'p50 ms':>8} | {'batched req/s':>13} {'p50 ms':>8} "
+          f"{'avg batch':>9} | {'speedup':>7}")
+    for concurrency in args.concurrency:
+        serial = run_load(serial_call, make_input, concurrency, args.requests)
+        scheduler = BatchScheduler(infer, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+        batched = run_load(scheduler.submit, make_input, concurrency, args.requests)
+        stats = scheduler.stats()
+        scheduler.shutdown()
+        print(f"{concurrency:>11} | {serial['throughput']:>12.1f} {serial['p50_ms']:>8.1f} | "
+              f"{batched['throughput']:>13.1f} {batched['p50_ms']:>8.1f} {stats['avg_batch_size']:>9.2f} | "
+              f"{batched['throughput'] / serial['throughput']:>6.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# mcp_server/bench_tts_streaming.py
+"""
+Time-to-first-byte for /tts versus /tts/stream, using a fake synthesizer
+whose latency grows with the length of the text (like a real TTS model) so
+no model has to be loaded.
+
+- whole:  what /tts does - synthesize the entire answer, then send it
+- stream: stream_pcm - sentence by sentence, with the next sentence
+          synthesized while the current one is being sent
+
+The consumer sleeps for each chunk to model writing to a slow client.
+
+    python bench_tts_streaming.py --ms-per-char 4 --send-ms 20
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+import soundfile as sf
+
+from streaming_tts import split_sentences, stream_pcm
+
+ANSWER = (
+    "I'm sorry to hear your router keeps dropping the connection. "
+    "First, unplug the power cable and wait thirty seconds. "
+    "Plug it back in and give it two minutes to reconnect. "
+    "If the status light stays red, check that the coaxial cable is finger tight. "
+    "Still no luck? Reply and I can schedule a technician visit for you."
+)
+
+def fake_synthesizer(ms_per_char, sample_rate=24000):
+    def synthesize(text):
+        time.sleep(len(text) * ms_per_char / 1000)
+        samples = np.zeros(int(len(text) * 0.06 * sample_rate), dtype=np.float32)
+        buffer = io.BytesIO()
+        sf.write(buffer, samples, sample_rate, format='WAV', subtype='FLOAT')
+        return buffer.getvalue()
+    return synthesize
+
+def consume(chunks, send_ms, start):
+    ttfb = None
+    for _ in chunks:
+        if ttfb is None:
+            ttfb = time.perf_counter() - start
+        time.sleep(send_ms / 1000)
+    return ttfb * 1000, (time.perf_counter() - start) * 1000
+
+def run_whole(synthesize, text, send_ms):
+    start = time.perf_counter()
+    audio = synthesize(text)
+    return consume([audio], send_ms * len(split_sentences(text)), start)
+
+def run_stream(synthesize, text, send_ms, lookahead):
+    start = time.perf_counter()
+    chunks = stream_pcm(synthesize, text, audio_format='pcm', lookahead=lookahead)
+    next(chunks)  # (sample_rate, channels), as /tts/stream does before responding
+    return consume(chunks, send_ms, start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ms-per-char", type=float, default=4.0, help="fake synthesis cost")
+    parser.add_argument("--send-ms", type=float, default=20.0, help="time to write one sentence to the client")
+    parser.add_argument("--lookahead", type=int, default=1)
+    args = parser.parse_args()
+
+    synthesize = fake_synthesizer(args.ms_per_char)
+    print(f"{len(split_sentences(ANSWER))} sentences, {len(ANSWER)} chars")
+    print(f"{'mode':>7} | {'ttfb ms':>8} {'total ms':>9}")
+    for name, run in (
+        ("whole", lambda: run_whole(synthesize, ANSWER, args.send_ms)),
+        ("stream", lambda: run_stream(synthesize, ANSWER, args.send_ms, args.lookahead)),
+    ):
+        ttfb, total = run()
+        print(f"{name:>7} | {ttfb:>8.1f} {total:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# mcp_server/streaming_stt.py
+import numpy as np
+
+class IncrementalTranscriber:
+    """
+    Sliding-window incremental decoding for a non-streaming ASR model.
+
+    Audio for the current utterance is buffered and re-decoded every
+    `step_s` seconds to produce partial hypotheses. The utterance is
+    finalized (is_final) only when `endpoint_silence_ms` of trailing silence
+    follows speech (endpoint detection) or the stream ends. To bound the
+    cost of any single re-decode, a window that reaches `max_window_s`
+    commits its older part: the audio up to a pause in its second half (the
+    quietest frame if there is no `commit_pause_ms` pause) is decoded once,
+    its text becomes a fixed prefix of every later partial and of the final,
+    and the window slides past it. Leading silence is not buffered beyond a
+    short pre-roll, so pauses between utterances cost nothing.
+    """
+    def __init__(self, transcribe_fn, sample_rate=16000, step_s=1.0, max_window_s=8.0,
+                 endpoint_silence_ms=600, energy_threshold=0.01, pre_roll_s=0.3, frame_ms=20,
+                 commit_pause_ms=200):
+        self.transcribe_fn = transcribe_fn
+        self.sample_rate = sample_rate
+        self.step = int(step_s * sample_rate)
+        self.max_window = int(max_window_s * sample_rate)
+        self.endpoint_silence = int(endpoint_silence_ms * sample_rate / 1000)
+        self.energy_threshold = energy_threshold
+        self.pre_roll = int(pre_roll_s * sample_rate)
+        self.frame = int(frame_ms * sample_rate / 1000)
+        self.commit_pause_frames = max(1, commit_pause_ms // frame_ms)
+        self._reset()
+        self.commits = 0
+        self.decodes = 0
+        self.decoded_seconds = 0.0
+
+    def _reset(self):
+        self._chunks = []
+        self._length = 0
+        self._pending = np.zeros(0, dtype=np.float32)  # samples not yet classified
+        self._speech_seen = False
+        self._trailing_silence = 0
+        self._since_decode = 0
+        self._last_partial = ""
+        self._committed = []  # text of audio already slid out of the window
+
+    def _buffer(self):
+        audio = np.concatenate(self._chunks) if len(self._chunks) > 1 else self._chunks[0]
+        self._chunks = [audio]
+        return audio
+
+    def _decode(self, audio):
+        self.decodes += 1
+        self.decoded_seconds += len(audio) / self.sample_rate
+        return self.transcribe_fn(audio).strip()
+
+    def _update_activity(self, samples):
+        # Classify complete frames by RMS energy; keep the remainder for later
+        samples = np.concatenate([self._pending, samples])
+        usable = len(samples) - len(samples) % self.frame
+        self._pending = samples[usable:]
+        if not usable:
+            return
+        frames = samples[:usable].reshape(-1, self.frame)
+        voiced = np.sqrt(np.mean(frames ** 2, axis=1)) >= self.energy_threshold
+        for is_voiced in voiced:
+            if is_voiced:
+                self._speech_seen = True
+                self._trailing_silence = 0
+            else:
+                self._trailing_silence += self.frame
+
+    def _text(self, window_text=""):
+        return " ".join(part for part in self._committed + [window_text] if part)
+
+    def _commit_point(self, audio) -> int:
+        # Where to cut the window: the middle of the latest pause in its
+        # second half, else its quietest frame there (likely between words)
+        first = (len(audio) // 2 + self.frame - 1) // self.frame
+        usable = len(audio) - len(audio) % self.frame
+        frames = audio[first * self.frame:usable].reshape(-1, self.frame)
+        if not len(frames):
+            return len(audio) // 2
+        energy = np.sqrt(np.mean(frames ** 2, axis=1))
+        run = 0
+        for i in range(len(frames) - 1, -1, -1):
+            run = run + 1 if energy[i] < self.energy_threshold else 0
+            if run >= self.commit_pause_frames:
+                return (2 * (first + i) + run) * self.frame // 2
+        return (first + int(np.argmin(energy))) * self.frame + self.frame // 2
+
+    def _commit(self):
+        audio = self._buffer()
+        cut = self._commit_point(audio)
+        text = self._decode(audio[:cut])
+        if text:
+            self._committed.append(text)
+        self.commits += 1
+        window = audio[cut:]
+        self._chunks = [window]
+        self._length = len(window)
+        self._since_decode = 0
+        partial = self._text()
+        if partial and partial != self._last_partial:
+            self._last_partial = partial
+            return [{"text": partial, "is_final": False}]
+        return []
+
+    def _finalize(self):
+        audio = self._buffer()
+        if self._trailing_silence:
+            audio = audio[:max(len(audio) - self._trailing_silence, 0)]
+        text = self._text(self._decode(audio) if len(audio) else "")
+        self._reset()
+        return [{"text": text, "is_final": True}] if text else []
+
+    def feed(self, samples: np.ndarray) -> list:
+        """
+        Adds mono float32 samples and returns any new {"text", "is_final"} results.
+        """
+        if not len(samples):
+            return []
+        self._chunks.append(samples.astype(np.float32, copy=False))
+        self._length += len(samples)
+        self._since_decode += len(samples)
+        self._update_activity(samples)
+
+        if not self._speech_seen:
+            if self._length > self.pre_roll:
+                self._chunks = [self._buffer()[-self.pre_roll:]]
+                self._length = self.pre_roll
+            self._since_decode = 0
+            return []
+        if self._trailing_silence >= self.endpoint_silence:
+            return self._finalize()
+        if self._length >= self.max_window:
+            return self._commit()
+        if self._since_decode >= self.step:
+            self._since_decode = 0
+            text = self._text(self._decode(self._buffer()))
+            if text and text != self._last_partial:
+                self._last_partial = text
+                return [{"text": text, "is_final": False}]
+        return []
+
+    def finish(self) -> list:
+        """
+        Flushes the last utterance when the input stream ends.
+        """
+        if not self._speech_seen or not self._length:
+            self._reset()
+            return []
+        return self._finalize()
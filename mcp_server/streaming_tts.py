@@ -0,0 +1,119 @@
+# mcp_server/streaming_tts.py
+import io
+import queue
+import re
+import struct
+import threading
+
+import soundfile as sf
+
+# Sentence boundary: terminal punctuation (optionally closed by a quote or
+# bracket) followed by whitespace, or a line break.
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|(?<=[.!?]["\')\]])\s+|\n+')
+
+def split_sentences(text: str) -> list:
+    """
+    Splits text into sentences for incremental synthesis.
+    """
+    return [s.strip() for s in _SENTENCE_BOUNDARY.split(text) if s and s.strip()]
+
+def wav_to_pcm16(wav_bytes: bytes):
+    """
+    Decodes a synthesized WAV (any sample format) to interleaved 16-bit
+    little-endian PCM. Returns (pcm_bytes, sample_rate, channels).
+    """
+    audio, sample_rate = sf.read(io.BytesIO(wav_bytes), dtype='int16', always_2d=True)
+    return audio.astype('<i2', copy=False).tobytes(), sample_rate, audio.shape[1]
+
+def join_wavs(wavs: list) -> bytes:
+    """
+    Concatenates synthesized WAV segments into one 16-bit PCM WAV.
+    """
+    if len(wavs) == 1:
+        return wavs[0]
+    decoded = [wav_to_pcm16(wav) for wav in wavs]
+    _, sample_rate, channels = decoded[0]
+    if any(rate != sample_rate or ch != channels for _, rate, ch in decoded):
+        raise ValueError("Cannot join WAV segments with different formats")
+    pcm = b''.join(segment for segment, _, _ in decoded)
+    header = (
+        b'RIFF' + struct.pack('<I', 36 + len(pcm)) + b'WAVE'
+        + b'fmt ' + struct.pack('<IHHIIHH', 16, 1, channels, sample_rate, sample_rate * channels * 2, channels * 2, 16)
+        + b'data' + struct.pack('<I', len(pcm))
+    )
+    return header + pcm
+
+def streaming_wav_header(sample_rate: int, channels: int) -> bytes:
+    """
+    A 16-bit PCM WAV header for a stream of unknown length. The RIFF and data
+    sizes are set to the maximum, which players treat as "read until EOF".
+    """
+    byte_rate = sample_rate * channels * 2
+    return (
+        b'RIFF' + struct.pack('<I', 0xFFFFFFFF) + b'WAVE'
+        + b'fmt ' + struct.pack('<IHHIIHH', 16, 1, channels, sample_rate, byte_rate, channels * 2, 16)
+        + b'data' + struct.pack('<I', 0xFFFFFFFF)
+    )
+
+_DONE = object()
+
+def synthesize_sentences(synthesize_fn, sentences, lookahead=1):
+    """
+    Yields (sentence, audio) in order while a producer thread synthesizes
+    up to `lookahead` sentences ahead, so sentence N+1 is rendered while
+    sentence N is being written to the client. Closing the generator early
+    (e.g. the client hung up) stops the producer after its current sentence.
+    """
+    results = queue.Queue(maxsize=max(1, lookahead))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for sentence in sentences:
+                if stop.is_set() or not put((sentence, synthesize_fn(sentence), None)):
+                    return
+        except Exception as e:
+            put((None, None, e))
+            return
+        put(_DONE)
+
+    producer = threading.Thread(target=produce, name="tts-producer", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = results.get()
+            if item is _DONE:
+                return
+            sentence, audio, error = item
+            if error is not None:
+                raise error
+            yield sentence, audio
+    finally:
+        stop.set()
+
+def stream_pcm(synthesize_fn, text, audio_format='wav', lookahead=1):
+    """
+    Generator of response chunks for /tts/stream. The first chunk is the WAV
+    header (audio_format='wav') or the first sentence's raw PCM; every later
+    chunk is one sentence of 16-bit PCM. Also yields the stream's
+    (sample_rate, channels) first so the caller can set response headers.
+    """
+    segments = synthesize_sentences(synthesize_fn, split_sentences(text), lookahead=lookahead)
+    first = True
+    for _, wav_bytes in segments:
+        pcm, sample_rate, channels = wav_to_pcm16(wav_bytes)
+        if first:
+            first = False
+            yield sample_rate, channels
+            if audio_format == 'wav':
+                yield streaming_wav_header(sample_rate, channels)
+        yield pcm
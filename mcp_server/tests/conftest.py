@@ -0,0 +1,6 @@
+# mcp_server/tests/conftest.py
+import os
+import sys
+
+# The server modules import each other by name from mcp_server/
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
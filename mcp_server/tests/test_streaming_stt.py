@@ -0,0 +1,81 @@
+# mcp_server/tests/test_streaming_stt.py
+import numpy as np
+
+from streaming_stt import IncrementalTranscriber
+
+RATE = 16000
+
+class FakeASR:
+    """
+    "Recognizes" each constant-amplitude burst as one word named after its
+    amplitude: a 0.05 burst is "w5". Records how much audio every decode
+    was given.
+    """
+    def __init__(self):
+        self.decoded = []
+
+    def __call__(self, audio):
+        self.decoded.append(len(audio) / RATE)
+        levels = np.round(np.abs(audio) * 100).astype(int)
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(levels)) + 1])
+        return " ".join(f"w{levels[start]}" for start in starts if len(levels) and levels[start])
+
+def utterance(words, word_s=0.4, gap_s=0.15, long_gap_every=4, long_gap_s=0.3):
+    pieces = []
+    for n, word in enumerate(words):
+        pieces.append(np.full(int(word_s * RATE), word / 100, dtype=np.float32))
+        gap = long_gap_s if (n + 1) % long_gap_every == 0 else gap_s
+        pieces.append(np.zeros(int(gap * RATE), dtype=np.float32))
+    return np.concatenate(pieces)
+
+def feed(transcriber, audio, chunk_s=0.1):
+    step = int(chunk_s * RATE)
+    results = []
+    for start in range(0, len(audio), step):
+        results.extend(transcriber.feed(audio[start:start + step]))
+    return results
+
+def make(asr, **kwargs):
+    return IncrementalTranscriber(asr, sample_rate=RATE, step_s=0.5, max_window_s=3.0,
+                                  endpoint_silence_ms=600, **kwargs)
+
+def test_short_utterance_is_finalized_at_the_endpoint():
+    asr = FakeASR()
+    transcriber = make(asr)
+    results = feed(transcriber, np.concatenate([utterance([3, 4]), np.zeros(RATE, dtype=np.float32)]))
+    assert results[-1] == {"text": "w3 w4", "is_final": True}
+    assert [r for r in results if r["is_final"]] == [results[-1]]
+    assert transcriber.commits == 0
+
+def test_utterance_longer_than_the_window_stays_one_final():
+    asr = FakeASR()
+    transcriber = make(asr)
+    words = list(range(1, 21))  # 20 words, about 11.5 s of speech
+    results = feed(transcriber, np.concatenate([utterance(words), np.zeros(RATE, dtype=np.float32)]))
+    finals = [r for r in results if r["is_final"]]
+    # No final mid-utterance: the client would take it as the end of a turn
+    assert finals == [results[-1]]
+    assert finals[0]["text"] == " ".join(f"w{w}" for w in words)
+    assert transcriber.commits >= 3
+    # No re-decode ever covers more than the window (plus one read)
+    assert max(asr.decoded) <= 3.0 + 0.1
+    # Partials only ever grow the committed prefix
+    partials = [r["text"] for r in results if not r["is_final"]]
+    assert partials and all(finals[0]["text"].startswith(p.rsplit(" ", 1)[0]) for p in partials)
+
+def test_commit_without_a_pause_cuts_at_the_quietest_frame():
+    asr = FakeASR()
+    transcriber = make(asr)
+    # Back-to-back words with no gap at all
+    audio = utterance([5, 6, 7, 8, 9, 10, 11, 12], gap_s=0.0, long_gap_s=0.0)
+    results = feed(transcriber, np.concatenate([audio, np.zeros(RATE, dtype=np.float32)]))
+    assert [r["is_final"] for r in results].count(True) == 1
+    assert transcriber.commits >= 1
+    assert max(asr.decoded) <= 3.0 + 0.1
+
+def test_finish_flushes_committed_text_with_the_rest():
+    asr = FakeASR()
+    transcriber = make(asr)
+    feed(transcriber, utterance(list(range(1, 11))))
+    assert transcriber.commits >= 1
+    assert transcriber.finish() == [{"text": " ".join(f"w{w}" for w in range(1, 11)), "is_final": True}]
@@ -0,0 +1,86 @@
+# mcp_server/tests/test_streaming_tts.py
+import io
+import threading
+import time
+
+import numpy as np
+import pytest
+
+sf = pytest.importorskip("soundfile")
+
+from streaming_tts import split_sentences, stream_pcm, streaming_wav_header
+
+SAMPLE_RATE = 24000
+TEXT = "Open Settings. Tap Wi-Fi! Choose your network? Enter the password."
+SENTENCES = ["Open Settings.", "Tap Wi-Fi!", "Choose your network?", "Enter the password."]
+
+class FakeSynthesizer:
+    """
+    Renders each sentence as a short mono WAV whose samples all equal the
+    order the sentence was synthesized in, after `delay` seconds.
+    """
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sentences = []
+        self.lock = threading.Lock()
+
+    def __call__(self, sentence):
+        time.sleep(self.delay)
+        with self.lock:
+            self.sentences.append(sentence)
+            value = len(self.sentences)
+        buffer = io.BytesIO()
+        sf.write(buffer, np.full(240, value, dtype=np.int16), SAMPLE_RATE, format='WAV', subtype='PCM_16')
+        return buffer.getvalue()
+
+def pcm_value(chunk):
+    samples = np.frombuffer(chunk, dtype='<i2')
+    assert len(samples) == 240 and (samples == samples[0]).all()
+    return int(samples[0])
+
+def test_split_sentences():
+    assert split_sentences(TEXT) == SENTENCES
+    assert split_sentences('He said "Restart." Then wait.\nDone') == ['He said "Restart."', 'Then wait.', 'Done']
+
+def test_wav_stream_yields_header_then_one_chunk_per_sentence_in_order():
+    synthesize = FakeSynthesizer()
+    chunks = list(stream_pcm(synthesize, TEXT, audio_format='wav'))
+    assert chunks[0] == (SAMPLE_RATE, 1)
+    assert chunks[1] == streaming_wav_header(SAMPLE_RATE, 1)
+    assert [pcm_value(chunk) for chunk in chunks[2:]] == [1, 2, 3, 4]
+    assert synthesize.sentences == SENTENCES
+
+def test_pcm_stream_has_no_header():
+    chunks = list(stream_pcm(FakeSynthesizer(), TEXT, audio_format='pcm'))
+    assert chunks[0] == (SAMPLE_RATE, 1)
+    assert [pcm_value(chunk) for chunk in chunks[1:]] == [1, 2, 3, 4]
+
+def test_first_audio_arrives_after_one_sentence_not_the_whole_text():
+    delay = 0.1
+    start = time.perf_counter()
+    chunks = stream_pcm(FakeSynthesizer(delay=delay), TEXT, audio_format='pcm')
+    next(chunks)  # (sample_rate, channels)
+    first = next(chunks)
+    time_to_first_byte = time.perf_counter() - start
+    assert pcm_value(first) == 1
+    assert time_to_first_byte < 2 * delay
+    assert len(list(chunks)) == 3
+    assert time.perf_counter() - start >= len(SENTENCES) * delay
+
+def test_next_sentence_is_synthesized_while_the_current_one_is_sent():
+    delay = 0.1
+    start = time.perf_counter()
+    for _ in stream_pcm(FakeSynthesizer(delay=delay), TEXT, audio_format='pcm', lookahead=1):
+        time.sleep(delay)  # a slow client
+    # Serial synthesis and sending would take 8 * delay
+    assert time.perf_counter() - start < 6.5 * delay
+
+def test_closing_the_stream_stops_synthesis():
+    synthesize = FakeSynthesizer(delay=0.02)
+    chunks = stream_pcm(synthesize, TEXT, audio_format='pcm', lookahead=1)
+    next(chunks)
+    next(chunks)
+    chunks.close()
+    time.sleep(0.2)
+    # The sentence being sent, one queued ahead and at most one in progress
+    assert len(synthesize.sentences) <= 3
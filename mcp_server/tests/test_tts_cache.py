@@ -0,0 +1,41 @@
+# mcp_server/tests/test_tts_cache.py
+from tts_cache import TTSAudioCache, normalize_tts_text, tts_cache_key
+
+def key(text):
+    return tts_cache_key(text, "google", "en-US-Standard-C", "wav")
+
+def test_normalization_collapses_whitespace_but_keeps_case():
+    assert normalize_tts_text("  Dial  *86\n now. ") == "Dial *86 now."
+    assert key("Dial  *86 now.") == key("Dial *86 now.")
+    # "US" is read as letters, "us" as a word
+    assert key("Call US.") != key("Call us.")
+
+def test_disk_tier_survives_restart_and_evicts_lru(tmp_path):
+    cache = TTSAudioCache(memory_max_bytes=4, disk_dir=str(tmp_path), disk_max_bytes=20)
+    cache.put(key("a"), b"0123456789")
+    cache.put(key("b"), b"abcdefghij")
+    assert cache.get(key("a")) == b"0123456789"  # from disk; now most recent
+    cache.put(key("c"), b"ABCDEFGHIJ")
+    assert cache.stats()["disk_entries"] == 2
+
+    reopened = TTSAudioCache(memory_max_bytes=4, disk_dir=str(tmp_path), disk_max_bytes=20)
+    assert reopened.get(key("b")) is None
+    assert reopened.get(key("c")) == b"ABCDEFGHIJ"
+    assert reopened.stats()["disk_hits"] == 1
+
+def test_missing_file_is_forgotten(tmp_path):
+    cache = TTSAudioCache(memory_max_bytes=0, disk_dir=str(tmp_path))
+    cache.put(key("a"), b"audio")
+    cache._remove_files([key("a")])
+    assert cache.get(key("a")) is None
+    assert cache.stats()["disk_entries"] == 0
+
+def test_disk_io_runs_outside_the_lock(tmp_path, monkeypatch):
+    cache = TTSAudioCache(memory_max_bytes=0, disk_dir=str(tmp_path))
+    held = []
+    write_disk, read_disk = cache._write_disk, cache._read_disk
+    monkeypatch.setattr(cache, "_write_disk", lambda *args: held.append(cache._lock.locked()) or write_disk(*args))
+    monkeypatch.setattr(cache, "_read_disk", lambda *args: held.append(cache._lock.locked()) or read_disk(*args))
+    cache.put(key("a"), b"audio")
+    assert cache.get(key("a")) == b"audio"
+    assert held == [False, False]
@@ -0,0 +1,187 @@
+# mcp_server/tts_cache.py
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+def normalize_tts_text(text: str) -> str:
+    """
+    Collapses whitespace so trivially different renderings of the same
+    phrase share a cache entry. Case and punctuation are kept: providers
+    read "US" and "us", or "Hi." and "Hi?", differently.
+    """
+    return re.sub(r'\s+', ' ', text).strip()
+
+def tts_cache_key(text: str, provider: str, voice: str, audio_format: str) -> str:
+    """
+    Content address for one synthesized phrase.
+    """
+    material = "\x1f".join([provider, voice, audio_format, normalize_tts_text(text)])
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+class TTSAudioCache:
+    """
+    Two-tier cache of synthesized audio keyed by tts_cache_key().
+
+    The memory tier is an LRU bounded by total bytes. Entries evicted from it
+    stay in the disk tier: one file per key under `disk_dir`, read back
+    through mmap and bounded by `disk_max_bytes` with LRU eviction. The disk
+    index is rebuilt from the directory on start, so the cache survives
+    restarts. File reads and writes happen outside the lock, so a slow disk
+    never stalls lookups served from memory.
+    """
+    def __init__(self, memory_max_bytes=64 * 1024 * 1024, disk_dir=None, disk_max_bytes=1024 * 1024 * 1024):
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = OrderedDict()  # key -> size, least recently used first
+        self._disk_bytes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    # --- Disk tier ---
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + ".audio")
+
+    def _load_disk_index(self):
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if name.endswith(".audio"):
+                    stat = os.stat(os.path.join(root, name))
+                    entries.append((stat.st_mtime, name[:-len(".audio")], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._remove_files(self._evict_disk())
+
+    def _read_disk(self, key):
+        # Called without the lock
+        try:
+            with open(self._path(key), 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return mapped[:]
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key, audio) -> bool:
+        # Called without the lock
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write TTS cache entry {key}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        return True
+
+    def _evict_disk(self) -> list:
+        # Called with the lock held; returns the keys whose files to remove
+        evicted = []
+        while self._disk_bytes > self.disk_max_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            evicted.append(key)
+        return evicted
+
+    def _remove_files(self, keys):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    # --- Memory tier ---
+
+    def _remember(self, key, audio):
+        if len(audio) > self.memory_max_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    # --- Public API ---
+
+    def get(self, key):
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                self.bytes_saved += len(audio)
+                return audio
+            if key not in self._disk:
+                self.misses += 1
+                return None
+        audio = self._read_disk(key)
+        with self._lock:
+            if audio is None:
+                # Missing or truncated file: forget it
+                self._disk_bytes -= self._disk.pop(key, 0)
+                self.misses += 1
+                return None
+            if key in self._disk:
+                self._disk.move_to_end(key)
+            self._remember(key, audio)
+            self.disk_hits += 1
+            self.bytes_saved += len(audio)
+            return audio
+
+    def put(self, key, audio: bytes):
+        with self._lock:
+            self._remember(key, audio)
+        if not self.disk_dir or not self._write_disk(key, audio):
+            return
+        with self._lock:
+            self._disk_bytes -= self._disk.pop(key, 0)
+            self._disk[key] = len(audio)
+            self._disk_bytes += len(audio)
+            evicted = self._evict_disk()
+        self._remove_files(evicted)
+
+    def get_or_synthesize(self, key, synthesize):
+        """
+        Returns cached audio for `key`, or calls synthesize() and caches the result.
+        """
+        audio = self.get(key)
+        if audio is None:
+            audio = synthesize()
+            self.put(key, audio)
+        return audio
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
@@ -0,0 +1,164 @@
+# scripts/benchmark_dense.py
+"""
+Compares Chroma with the memory-mapped NumPy dense index (float32 and int8)
+on recall@k, latency and resident memory.
+
+The corpus is the knowledge base chunks, embedded with the local hashing
+backend so no API key is needed, plus `--vectors` synthetic clustered
+vectors to reach a realistic index size. Queries are the metadata questions
+and perturbed corpus vectors; recall@k is measured against exact float64
+search. Each engine runs in its own subprocess so its resident memory
+(VmRSS growth after opening the index and querying) is not mixed with the
+others'.
+
+    python scripts/benchmark_dense.py --vectors 50000 --k 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import numpy as np
+
+from chunking import chunk_document
+from config import CHUNK_SIZE, CHUNK_OVERLAP, LOCAL_EMBEDDING_DIM
+from dense_index import DenseIndex, build_dense_index
+from embeddings import HashingEmbeddingBackend
+from ingestion import iter_documents, load_metadata_map
+
+COLLECTION_NAME = "benchmark"
+ENGINES = ("chroma", "float32", "int8")
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def build_corpus(vectors, num_queries, seed):
+    backend = HashingEmbeddingBackend()
+    ids, texts = [], []
+    for doc_id, _, content in iter_documents():
+        for i, chunk_text in enumerate(chunk_document(content, CHUNK_SIZE, CHUNK_OVERLAP)):
+            ids.append(f"{doc_id}_chunk_{i}")
+            texts.append(chunk_text)
+    corpus = np.asarray(backend.embed_documents(texts), dtype=np.float32).reshape(len(texts), LOCAL_EMBEDDING_DIM)
+
+    rng = np.random.default_rng(seed)
+    if vectors:
+        centers = rng.standard_normal((256, LOCAL_EMBEDDING_DIM)).astype(np.float32)
+        synthetic = centers[rng.integers(0, len(centers), vectors)] \
+            + 0.5 * rng.standard_normal((vectors, LOCAL_EMBEDDING_DIM)).astype(np.float32)
+        corpus = np.vstack([corpus, synthetic])
+        ids += [f"synthetic_{i}" for i in range(vectors)]
+    corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+
+    questions = [q for meta in load_metadata_map().values() for q in meta.get("questions", [])]
+    queries = [backend.embed_query(q) for q in questions]
+    picks = rng.integers(0, len(corpus), max(num_queries - len(queries), 0))
+    queries = np.vstack([np.asarray(queries, dtype=np.float32).reshape(-1, LOCAL_EMBEDDING_DIM),
+                         corpus[picks] + 0.3 * rng.standard_normal((len(picks), LOCAL_EMBEDDING_DIM)) / np.sqrt(LOCAL_EMBEDDING_DIM)])
+    return ids, corpus, queries.astype(np.float32)
+
+def build_chroma(path, ids, corpus):
+    import chromadb
+    client = chromadb.PersistentClient(path=path)
+    collection = client.create_collection(name=COLLECTION_NAME)
+    batch = 5000
+    for start in range(0, len(ids), batch):
+        collection.add(ids=ids[start:start + batch], embeddings=corpus[start:start + batch].tolist())
+
+def run_worker(engine, directory, k, batch_size):
+    queries = np.load(os.path.join(directory, "queries.npy"))
+    with open(os.path.join(directory, "truth.json")) as f:
+        truth = json.load(f)
+    baseline = rss_mb()
+    start = time.perf_counter()
+    if engine == "chroma":
+        import chromadb
+        index = chromadb.PersistentClient(path=os.path.join(directory, "chroma")).get_collection(COLLECTION_NAME)
+    else:
+        index = DenseIndex(os.path.join(directory, engine))
+    open_ms = (time.perf_counter() - start) * 1000
+
+    latencies, found = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = index.query(query_embeddings=[query.tolist()], n_results=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(result["ids"][0])
+    start = time.perf_counter()
+    for offset in range(0, len(queries), batch_size):
+        index.query(query_embeddings=queries[offset:offset + batch_size].tolist(), n_results=k)
+    batched_s = time.perf_counter() - start
+
+    recall = np.mean([len(set(ids) & set(expected)) / len(expected) for ids, expected in zip(found, truth)])
+    latencies.sort()
+    print(json.dumps({
+        "recall": float(recall),
+        "open_ms": open_ms,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+        "batched_qps": len(queries) / batched_s,
+        "rss_mb": rss_mb() - baseline,
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=20000, help="synthetic vectors added to the corpus")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32, help="queries per call in the batched run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--worker", choices=ENGINES, help=argparse.SUPPRESS)
+    parser.add_argument("--dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.dir, args.k, args.batch_size)
+        return
+
+    ids, corpus, queries = build_corpus(args.vectors, args.queries, args.seed)
+    print(f"{len(ids)} vectors x {corpus.shape[1]} dims, {len(queries)} queries, k={args.k}")
+    exact = corpus.astype(np.float64) @ queries.astype(np.float64).T
+    exact_top = np.argsort(-exact, axis=0)[:args.k].T
+    truth = [[ids[row] for row in rows] for rows in exact_top]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        np.save(os.path.join(tmp, "queries.npy"), queries)
+        with open(os.path.join(tmp, "truth.json"), "w") as f:
+            json.dump(truth, f)
+        builds = {}
+        start = time.perf_counter()
+        build_chroma(os.path.join(tmp, "chroma"), ids, corpus)
+        builds["chroma"] = time.perf_counter() - start
+        for dtype in ("float32", "int8"):
+            start = time.perf_counter()
+            build_dense_index(((i, v, None) for i, v in zip(ids, corpus)), os.path.join(tmp, dtype), dtype=dtype)
+            builds[dtype] = time.perf_counter() - start
+
+        print(f"{'engine':<8} {'build s':>8} {'open ms':>8} {'recall@' + str(args.k):>10} {'p50 ms':>8} "
+              f"{'p95 ms':>8} {'batch q/s':>10} {'RSS MB':>8}")
+        for engine in ENGINES:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", engine, "--dir", tmp,
+                 "--k", str(args.k), "--batch-size", str(args.batch_size)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            stats = json.loads(output.strip().splitlines()[-1])
+            print(f"{engine:<8} {builds[engine]:>8.2f} {stats['open_ms']:>8.1f} {stats['recall']:>10.3f} "
+                  f"{stats['p50_ms']:>8.3f} {stats['p95_ms']:>8.3f} {stats['batched_qps']:>10.0f} "
+                  f"{stats['rss_mb']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# scripts/benchmark_sparse.py
+"""
+Compares the Whoosh and BM25 sparse engines on the knowledge base.
+
+Both indices are built in a temporary directory from the chunks of
+knowledge_base/documents, optionally padded with `--distractors` synthetic
+chunks to see how latency grows with the corpus. Distractors are mostly
+made-up Zipf-distributed words with some KB words mixed in, so query terms
+get long posting lists without the distractors matching as well as the
+real documents. Each metadata question is a query whose relevant chunks
+are those of the document it belongs to; recall@k is the share of queries
+with a relevant chunk in the top k.
+
+"whoosh" is the serving configuration (QueryParser's default AND grouping,
+so every query term must match); "whoosh-or" ORs the terms like BM25 does,
+separating the effect of the query semantics from the scoring speed.
+
+    python scripts/benchmark_sparse.py --distractors 20000 --k 10
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from whoosh.fields import Schema, TEXT, ID
+from whoosh.index import create_in
+from whoosh.qparser import AndGroup, OrGroup, QueryParser
+
+from bm25_index import BM25Index, build_bm25_index
+from chunking import chunk_document
+from config import CHUNK_SIZE, CHUNK_OVERLAP
+from ingestion import iter_documents, load_metadata_map
+
+def load_chunks(distractors, seed):
+    chunks = []
+    for doc_id, _, content in iter_documents():
+        for i, chunk_text in enumerate(chunk_document(content, CHUNK_SIZE, CHUNK_OVERLAP)):
+            chunks.append((f"{doc_id}_chunk_{i}", chunk_text))
+    kb_words = " ".join(text for _, text in chunks).split()
+    rng = random.Random(seed)
+    synthetic = [f"term{i}" for i in range(50000)]
+    zipf = [1.0 / (rank + 1) for rank in range(len(synthetic))]
+    for i in range(distractors):
+        length = rng.randint(CHUNK_SIZE // 4, CHUNK_SIZE)
+        words = rng.choices(synthetic, weights=zipf, k=length)
+        for position in rng.sample(range(length), length // 10):
+            words[position] = rng.choice(kb_words)
+        chunks.append((f"distractor_{i}_chunk_0", " ".join(words)))
+    return chunks
+
+def load_queries():
+    queries = []
+    for doc_id, meta in load_metadata_map().items():
+        for question in meta.get("questions", []):
+            queries.append((question, doc_id))
+    return queries
+
+def build_whoosh(chunks, path):
+    schema = Schema(id=ID(stored=True, unique=True), content=TEXT(stored=True))
+    ix = create_in(path, schema)
+    writer = ix.writer()
+    for chunk_id, text in chunks:
+        writer.add_document(id=chunk_id, content=text)
+    writer.commit()
+    return ix
+
+def whoosh_search(ix, parser):
+    searcher = ix.searcher()
+
+    def search(query, k):
+        hits = searcher.search(parser.parse(query), limit=k)
+        return [{"id": hit['id'], "score": hit.score} for hit in hits]
+    return search, searcher
+
+def evaluate(search, queries, k, repeats):
+    hits = 0
+    latencies = []
+    results = {}
+    for query, doc_id in queries:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            ranked = search(query, k)
+            latencies.append((time.perf_counter() - start) * 1000)
+        results[query] = [hit["id"] for hit in ranked]
+        if any(chunk_id.rsplit("_chunk_", 1)[0] == doc_id for chunk_id in results[query]):
+            hits += 1
+    latencies.sort()
+    return {
+        "recall": hits / len(queries),
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+    }, results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--distractors", type=int, default=0, help="synthetic chunks added to the corpus")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=20, help="timed runs per query")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.distractors, args.seed)
+    queries = load_queries()
+    if not queries:
+        parser.error("no metadata questions to use as queries")
+    print(f"{len(chunks)} chunks, {len(queries)} queries, k={args.k}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        whoosh_path = os.path.join(tmp, "whoosh")
+        os.makedirs(whoosh_path)
+        start = time.perf_counter()
+        ix = build_whoosh(chunks, whoosh_path)
+        whoosh_build_s = time.perf_counter() - start
+        start = time.perf_counter()
+        build_bm25_index(((i, text, None) for i, text in chunks), os.path.join(tmp, "bm25"))
+        bm25_build_s = time.perf_counter() - start
+
+        rows = []
+        for name, group in (("whoosh", AndGroup), ("whoosh-or", OrGroup)):
+            query_parser = QueryParser("content", ix.schema, group=group)
+            search, searcher = whoosh_search(ix, query_parser)
+            try:
+                rows.append((name, whoosh_build_s) + evaluate(search, queries, args.k, args.repeats))
+            finally:
+                searcher.close()
+        bm25 = BM25Index(os.path.join(tmp, "bm25"))
+        rows.append(("bm25", bm25_build_s) + evaluate(bm25.search, queries, args.k, args.repeats))
+
+    bm25_results = rows[-1][3]
+    print(f"{'engine':<10} {'build s':>8} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'p95 ms':>8} {'overlap':>8}")
+    for name, build_s, stats, results in rows:
+        # Share of this engine's top k that BM25 also returned
+        overlap = sum(
+            len(set(results[q]) & set(bm25_results[q])) / len(results[q]) for q, _ in queries if results[q]
+        ) / len(queries)
+        print(f"{name:<10} {build_s:>8.2f} {stats['recall']:>10.3f} {stats['p50_ms']:>8.3f} "
+              f"{stats['p95_ms']:>8.3f} {overlap:>8.3f}")
+    print(f"BM25 speedup at p50: {rows[0][2]['p50_ms'] / rows[-1][2]['p50_ms']:.1f}x over whoosh, "
+          f"{rows[1][2]['p50_ms'] / rows[-1][2]['p50_ms']:.1f}x over whoosh-or")
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,9 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 's
 from ingestion import run_ingestion
 
 if __name__ == "__main__":
+    # Pass --full to drop the existing indices instead of updating them incrementally
+    full_rebuild = "--full" in sys.argv[1:]
     print("Initializing Knowledge Base...")
     print("This will process documents, create embeddings, and build search indices.")
-    run_ingestion()
+    run_ingestion(full_rebuild=full_rebuild)
     print("Knowledge Base initialization complete.")
@@ -0,0 +1,166 @@
+# telecom_agent/src/answer_cache.py
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from config import (
+    ANSWER_CACHE_SIZE, ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_NEAR_MISS_MARGIN
+)
+from embeddings import normalize_query
+from kb_version import kb_version_order
+
+class SemanticAnswerCache:
+    """
+    Caches final answers keyed by query embedding. A new query reuses a
+    cached answer when its cosine similarity to a cached query reaches the
+    threshold and both name the same devices, so "reset my Pixel 2" never
+    reuses the answer for "reset my Galaxy S20". Embeddings live in a
+    preallocated matrix so a lookup is one matrix-vector product. All
+    entries belong to the newest KB version seen and are dropped when a
+    newer one arrives. Requests still running on an older snapshot during a
+    hot-swap neither read nor write the cache, so they cannot wipe or
+    pollute it. A query embedding of a different width (the embedding
+    model changed) also starts the cache over.
+    """
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE, threshold=ANSWER_CACHE_THRESHOLD,
+                 near_miss_margin=ANSWER_CACHE_NEAR_MISS_MARGIN):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.near_miss_margin = near_miss_margin
+        self._lock = threading.Lock()
+        self._kb_version = None
+        self._matrix = None
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._slots = OrderedDict()  # normalized query -> slot, in LRU order
+        self._entries = [None] * max_entries
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._hits = 0
+        self._misses = 0
+        self._near_misses = 0
+        self._device_mismatches = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._stale_requests = 0
+        self._hit_similarity_total = 0.0
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _reset(self):
+        if self._slots:
+            self._invalidations += 1
+        self._valid[:] = False
+        self._slots.clear()
+        self._entries = [None] * self.max_entries
+        self._free = list(range(self.max_entries - 1, -1, -1))
+
+    def _check_version(self, kb_version) -> bool:
+        """
+        Returns False for a request tagged with an older KB version than the
+        cache holds; a newer version resets the cache.
+        """
+        if kb_version == self._kb_version:
+            return True
+        if self._kb_version is not None and kb_version_order(kb_version) < kb_version_order(self._kb_version):
+            self._stale_requests += 1
+            return False
+        self._reset()
+        self._kb_version = kb_version
+        return True
+
+    def lookup(self, query_vector, kb_version: str, devices: tuple = ()):
+        """
+        Returns (entry, similarity) for the closest cached query above the
+        threshold whose device scope equals `devices`, or
+        (None, best_similarity) on a miss.
+        """
+        query = self._unit(query_vector)
+        with self._lock:
+            if not self._check_version(kb_version) or not self._slots or self._matrix is None \
+                    or self._matrix.shape[1] != query.shape[0]:
+                self._misses += 1
+                return None, 0.0
+            similarities = self._matrix @ query
+            similarities[~self._valid] = -1.0
+            similarity = float(similarities.max())
+            candidates = np.flatnonzero(similarities >= self.threshold)
+            for slot in candidates[np.argsort(-similarities[candidates], kind="stable")]:
+                entry = self._entries[slot]
+                if entry["devices"] != devices:
+                    continue
+                similarity = float(similarities[slot])
+                self._slots.move_to_end(entry["key"])
+                self._hits += 1
+                self._hit_similarity_total += similarity
+                return entry, similarity
+            if len(candidates):
+                self._device_mismatches += 1
+            self._misses += 1
+            if similarity >= self.threshold - self.near_miss_margin:
+                self._near_misses += 1
+            return None, similarity
+
+    def store(self, query: str, query_vector, response_text: str, doc_ids: list, kb_version: str,
+              devices: tuple = ()):
+        vector = self._unit(query_vector)
+        key = normalize_query(query)
+        with self._lock:
+            if not self._check_version(kb_version):
+                return
+            if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+                self._reset()
+                self._matrix = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            if key in self._slots:
+                slot = self._slots[key]
+                self._slots.move_to_end(key)
+            elif self._free:
+                slot = self._free.pop()
+                self._slots[key] = slot
+            else:
+                _, slot = self._slots.popitem(last=False)
+                self._evictions += 1
+                self._slots[key] = slot
+            self._matrix[slot] = vector
+            self._valid[slot] = True
+            self._entries[slot] = {
+                "key": key,
+                "response_text": response_text,
+                "retrieved_doc_ids": list(doc_ids),
+                "devices": tuple(devices),
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._slots),
+                "kb_version": self._kb_version,
+                "threshold": self.threshold,
+                "hits": self._hits,
+                "misses": self._misses,
+                "near_misses": self._near_misses,
+                "device_mismatches": self._device_mismatches,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "stale_requests": self._stale_requests,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "avg_hit_similarity": round(self._hit_similarity_total / self._hits, 4) if self._hits else 0.0,
+            }
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """
+    Returns the process-wide semantic answer cache.
+    """
+    global _answer_cache
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                _answer_cache = SemanticAnswerCache()
+    return _answer_cache
@@ -0,0 +1,133 @@
+# telecom_agent/src/bm25_index.py
+import json
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+from index_files import new_generation, current_directory, publish_generation, write_fields, load_fields, where_mask
+
+# Same defaults as Whoosh's BM25F scorer, so the two engines rank alike
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"\w+")
+# Whoosh's StandardAnalyzer stop list
+_STOP_WORDS = frozenset([
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "for", "from", "have",
+    "if", "in", "is", "it", "may", "not", "of", "on", "or", "tbd", "that", "the",
+    "this", "to", "us", "we", "when", "will", "with", "yet", "you", "your",
+])
+
+def tokenize(text: str) -> list:
+    """
+    Lowercased word tokens without stop words or single characters, close
+    to what Whoosh's StandardAnalyzer indexes.
+    """
+    return [token for token in _TOKEN_RE.findall(text.lower())
+            if len(token) > 1 and token not in _STOP_WORDS]
+
+def build_bm25_index(chunks, index_path: str, filter_fields=()) -> str:
+    """
+    Builds the postings for an iterable of (chunk_id, text, metadata) and
+    writes them as a new generation under `index_path`, keeping the
+    `filter_fields` metadata for where filters. Postings are stored CSR
+    style, grouped by term:
+      indptr[t]:indptr[t + 1]  slice of doc_ids / term_freqs for term t
+      doc_lengths[d]           token count of chunk d
+    plus vocab.json (term -> t) and ids.json (d -> chunk id).
+    """
+    ids = []
+    doc_lengths = []
+    postings = {}  # term -> ([doc], [tf])
+    fields = {name: [] for name in filter_fields}
+    for chunk_id, text, metadata in chunks:
+        doc = len(ids)
+        ids.append(chunk_id)
+        for name, column in fields.items():
+            column.append((metadata or {}).get(name))
+        tokens = tokenize(text)
+        doc_lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            docs, tfs = postings.setdefault(term, ([], []))
+            docs.append(doc)
+            tfs.append(tf)
+
+    vocab = {term: t for t, term in enumerate(sorted(postings))}
+    indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    for term, t in vocab.items():
+        indptr[t + 1] = len(postings[term][0])
+    np.cumsum(indptr, out=indptr)
+    doc_ids = np.empty(indptr[-1], dtype=np.int32)
+    term_freqs = np.empty(indptr[-1], dtype=np.float32)
+    for term, t in vocab.items():
+        docs, tfs = postings[term]
+        doc_ids[indptr[t]:indptr[t + 1]] = docs
+        term_freqs[indptr[t]:indptr[t + 1]] = tfs
+
+    generation, directory = new_generation(index_path)
+    np.save(os.path.join(directory, "indptr.npy"), indptr)
+    np.save(os.path.join(directory, "doc_ids.npy"), doc_ids)
+    np.save(os.path.join(directory, "term_freqs.npy"), term_freqs)
+    np.save(os.path.join(directory, "doc_lengths.npy"), np.asarray(doc_lengths, dtype=np.float32))
+    with open(os.path.join(directory, "vocab.json"), 'w') as f:
+        json.dump(vocab, f)
+    with open(os.path.join(directory, "ids.json"), 'w') as f:
+        json.dump(ids, f)
+    write_fields(directory, fields)
+
+    publish_generation(index_path, generation)
+    return generation
+
+class BM25Index:
+    """
+    Read-only BM25 index over memory-mapped postings. A query gathers the
+    posting slices of its terms and scores them in a few NumPy operations;
+    nothing is interpreted per posting, and only the pages of the terms a
+    query touches are read from disk.
+    """
+    def __init__(self, index_path: str, k1=BM25_K1, b=BM25_B):
+        directory = current_directory(index_path)
+        self.generation = os.path.basename(directory)
+        self.k1 = k1
+        self.indptr = np.load(os.path.join(directory, "indptr.npy"), mmap_mode='r')
+        self.doc_ids = np.load(os.path.join(directory, "doc_ids.npy"), mmap_mode='r')
+        self.term_freqs = np.load(os.path.join(directory, "term_freqs.npy"), mmap_mode='r')
+        doc_lengths = np.load(os.path.join(directory, "doc_lengths.npy"))
+        with open(os.path.join(directory, "vocab.json"), 'r') as f:
+            self.vocab = json.load(f)
+        with open(os.path.join(directory, "ids.json"), 'r') as f:
+            self.ids = json.load(f)
+        self.num_docs = len(self.ids)
+        self.fields = load_fields(directory)
+        avg_length = float(doc_lengths.mean()) if self.num_docs else 0.0
+        # Per-document part of the BM25 denominator, computed once per load
+        self._length_norm = (k1 * (1 - b + b * doc_lengths / avg_length)).astype(np.float32) \
+            if avg_length else np.full(self.num_docs, k1, dtype=np.float32)
+
+    def search(self, query: str, n_results=10, where=None) -> list:
+        """
+        Returns the top `n_results` chunks as [{"id", "score"}], best first,
+        among the chunks matching the `where` metadata filter if one is given.
+        """
+        terms = [self.vocab[term] for term in set(tokenize(query)) if term in self.vocab]
+        if not terms or not self.num_docs:
+            return []
+        starts = self.indptr[terms]
+        ends = self.indptr[np.asarray(terms) + 1]
+        lengths = ends - starts
+        idf = np.log(1 + (self.num_docs - lengths + 0.5) / (lengths + 0.5)).astype(np.float32)
+        docs = np.concatenate([self.doc_ids[s:e] for s, e in zip(starts, ends)])
+        tfs = np.concatenate([self.term_freqs[s:e] for s, e in zip(starts, ends)])
+        weights = np.repeat(idf, lengths) * tfs * (self.k1 + 1) / (tfs + self._length_norm[docs])
+        scores = np.bincount(docs, weights=weights, minlength=self.num_docs)
+        mask = where_mask(self.fields, where, self.num_docs)
+        if mask is not None:
+            scores[~mask] = 0.0
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > n_results:
+            candidates = candidates[np.argpartition(-scores[candidates], n_results - 1)[:n_results]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [{"id": self.ids[d], "score": float(scores[d])} for d in candidates]
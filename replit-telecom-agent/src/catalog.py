@@ -0,0 +1,276 @@
+# telecom_agent/src/catalog.py
+import bisect
+import csv
+import json
+import os
+import re
+import threading
+
+from config import SKU_CATALOG_PATH, KB_METADATA_PATH
+
+# CSV columns that hold identifiers, with how each is spoken in an answer
+IDENTIFIER_FIELDS = {
+    "deviceSku": "device SKU",
+    "simSku": "SIM SKU",
+    "prepaidSku": "prepaid SKU",
+    "cpoSku": "certified pre-owned SKU",
+    "cpoPrepaidSku": "certified pre-owned prepaid SKU",
+    "visionSku": "Vision SKU",
+    "upcCode": "UPC code",
+}
+
+# Words that show the caller wants a catalog fact rather than troubleshooting
+_FIELD_KEYWORDS = [
+    (re.compile(r"\bcpo\b|certified pre.?owned|refurbished"), "cpoSku"),
+    (re.compile(r"\bprepaid\b"), "prepaidSku"),
+    (re.compile(r"\bsim\b|\bsim card\b"), "simSku"),
+    (re.compile(r"\bupc\b|\bbarcode\b"), "upcCode"),
+    (re.compile(r"\bvision\b"), "visionSku"),
+    (re.compile(r"\burl\b|\blink\b|\bproduct page\b|\bweb ?page\b"), "url"),
+    (re.compile(r"\bsku\b|\bpart number\b|\bmodel number\b|\bitem number\b"), "deviceSku"),
+]
+
+# The fast path only answers lookups ("what SIM does the Pixel 2 use?",
+# "SMG988UZKV"). Anything that sounds like a problem ("sim card not detected
+# on pixel 2", "my SMG988UZKV keeps dropping calls") goes through RAG even
+# when it names a device or SKU.
+_LOOKUP_RE = re.compile(
+    r"\b(what|what's|whats|which|whose|look ?up|find|tell me|give me|show me|identify|list)\b"
+)
+_TROUBLESHOOTING_RE = re.compile(
+    r"\bnot (detected|recognized|working|showing|connecting|reading)\b"
+    r"|\b(won't|wont|can't|cant|cannot|doesn't|doesnt|isn't|isnt|unable)\b"
+    r"|\b(drop|drops|dropping|dropped|keeps|stuck|frozen|freez\w*|crash\w*|slow|broken|dead)\b"
+    r"|\b(fix|repair|troubleshoot\w*|problem|issue|error|fail\w*|help|reset|restart|reboot)\b"
+    r"|\bno (service|signal|sim)\b|\bhow (do|can|to|should)\b|\bwhy\b"
+)
+# A query this short that names an identifier or model is a lookup by itself
+_MAX_BARE_LOOKUP_WORDS = 6
+
+# Candidate identifiers: alphanumeric tokens (dashes allowed) with at least one digit
+_IDENTIFIER_RE = re.compile(r"\b[A-Za-z0-9][A-Za-z0-9-]{4,}[A-Za-z0-9]\b")
+_MIN_PREFIX_LEN = 6
+_MAX_LISTED = 5
+
+def normalize_identifier(value: str) -> str:
+    return re.sub(r"[^A-Z0-9]", "", value.upper())
+
+def normalize_model_name(name: str) -> str:
+    name = name.lower().replace("+", " plus ")
+    return re.sub(r"[^a-z0-9]+", " ", name).strip()
+
+def _is_identifier_candidate(token: str) -> bool:
+    if not any(c.isdigit() for c in token):
+        return False
+    if token.isdigit():
+        # Bare numbers are only trusted when they look like a UPC
+        return len(token) >= 11
+    return any(c.isalpha() for c in token)
+
+def _present(value) -> bool:
+    return bool(value) and value != "N/A"
+
+class CatalogIndex:
+    """
+    In-memory index over the SKU catalog CSV and the SKU lists in the KB
+    metadata. Supports exact identifier lookup, prefix lookup (via a sorted
+    key list and bisect) and normalized model-name lookup, all without
+    touching retrieval or the LLM.
+    """
+    def __init__(self, records=(), kb_metadata=()):
+        self.records = list(records)
+        self.kb_metadata = list(kb_metadata)
+        self._by_identifier = {}
+        self._by_model = {}
+        self._kb_by_sku = {}
+        self._display = {}
+        for record in self.records:
+            for field in IDENTIFIER_FIELDS:
+                value = record.get(field, "")
+                if _present(value):
+                    key = normalize_identifier(value)
+                    self._display.setdefault(key, value)
+                    self._by_identifier.setdefault(key, []).append((field, record))
+            model_key = normalize_model_name(record.get("model", ""))
+            if model_key:
+                self._by_model.setdefault(model_key, []).append(record)
+        for meta in self.kb_metadata:
+            for sku in meta.get("SKUs", []):
+                key = normalize_identifier(sku)
+                self._display.setdefault(key, sku)
+                self._kb_by_sku.setdefault(key, []).append(meta)
+        self._sorted_keys = sorted(set(self._by_identifier) | set(self._kb_by_sku))
+        self._max_model_tokens = max((len(m.split()) for m in self._by_model), default=0)
+
+    @classmethod
+    def from_files(cls, csv_path=SKU_CATALOG_PATH, metadata_path=KB_METADATA_PATH):
+        records = []
+        if os.path.exists(csv_path):
+            with open(csv_path, newline='') as f:
+                records = list(csv.DictReader(f))
+        else:
+            print(f"SKU catalog not found at {csv_path}; catalog lookups are disabled.")
+        kb_metadata = []
+        if os.path.isdir(metadata_path):
+            for fname in os.listdir(metadata_path):
+                if fname.endswith(".jsonl"):
+                    with open(os.path.join(metadata_path, fname), 'r') as f:
+                        kb_metadata.extend(json.loads(line) for line in f if line.strip())
+        return cls(records, kb_metadata)
+
+    # --- Lookups ---
+
+    def lookup_exact(self, identifier: str) -> list:
+        """
+        Returns [(field, record)] for catalog rows carrying this identifier.
+        """
+        return list(self._by_identifier.get(normalize_identifier(identifier), []))
+
+    def lookup_kb(self, identifier: str) -> list:
+        """
+        Returns the KB metadata entries that list this SKU.
+        """
+        return list(self._kb_by_sku.get(normalize_identifier(identifier), []))
+
+    def lookup_prefix(self, prefix: str, limit=10) -> list:
+        """
+        Returns up to `limit` indexed identifiers starting with `prefix`.
+        """
+        key = normalize_identifier(prefix)
+        start = bisect.bisect_left(self._sorted_keys, key)
+        matches = []
+        for candidate in self._sorted_keys[start:start + limit]:
+            if not candidate.startswith(key):
+                break
+            matches.append(candidate)
+        return matches
+
+    def lookup_model(self, name: str) -> list:
+        return list(self._by_model.get(normalize_model_name(name), []))
+
+    def find_model_in_text(self, text: str):
+        """
+        Returns the longest catalog model name mentioned in `text`, or None.
+        """
+        tokens = normalize_model_name(text).split()
+        for n in range(min(self._max_model_tokens, len(tokens)), 0, -1):
+            for i in range(len(tokens) - n + 1):
+                candidate = " ".join(tokens[i:i + n])
+                if candidate in self._by_model and (n > 1 or any(c.isdigit() for c in candidate)):
+                    return candidate
+        return None
+
+    # --- Query answering ---
+
+    def answer(self, query: str):
+        """
+        Answers identifier and model-SKU lookups straight from the index.
+        Returns {"response_text", "retrieved_doc_ids"} or None when the
+        query should go through RAG instead, which includes every
+        troubleshooting question, whatever device or SKU it names.
+        """
+        lowered = query.lower()
+        if not self._is_lookup(lowered):
+            return None
+        requested_field = None
+        for pattern, field in _FIELD_KEYWORDS:
+            if pattern.search(lowered):
+                requested_field = field
+                break
+
+        for token in _IDENTIFIER_RE.findall(query):
+            if not _is_identifier_candidate(token):
+                continue
+            matches = self.lookup_exact(token)
+            if matches:
+                return self._answer_identifier(token, matches, requested_field)
+            kb_matches = self.lookup_kb(token)
+            if kb_matches:
+                devices = sorted({meta.get("device", "") for meta in kb_matches if meta.get("device")})
+                return {
+                    "response_text": f"{token.upper()} is a SKU for the {' or '.join(devices)}.",
+                    "retrieved_doc_ids": [meta["id"] for meta in kb_matches],
+                }
+            if len(normalize_identifier(token)) >= _MIN_PREFIX_LEN:
+                prefixed = self.lookup_prefix(token, limit=_MAX_LISTED + 1)
+                if prefixed:
+                    return self._answer_prefix(token, prefixed)
+
+        # A model name alone is not a lookup ("what is the galaxy s20"): a
+        # catalog field has to be asked for as well
+        if requested_field:
+            model_key = self.find_model_in_text(query)
+            if model_key:
+                return self._answer_model(self._by_model[model_key], requested_field)
+        return None
+
+    @staticmethod
+    def _is_lookup(lowered: str) -> bool:
+        """
+        True when the query asks for a catalog fact and does not describe a
+        problem.
+        """
+        if _TROUBLESHOOTING_RE.search(lowered):
+            return False
+        return bool(_LOOKUP_RE.search(lowered)) or len(lowered.split()) <= _MAX_BARE_LOOKUP_WORDS
+
+    def _answer_identifier(self, token, matches, requested_field):
+        field, record = matches[0]
+        label = IDENTIFIER_FIELDS[field]
+        if field != "deviceSku" and len(matches) > 1:
+            models = sorted({r["model"] for _, r in matches})
+            listed = ", ".join(models[:_MAX_LISTED])
+            more = f" and {len(models) - _MAX_LISTED} more" if len(models) > _MAX_LISTED else ""
+            text = f"{token.upper()} is the {label} for {len(models)} models, including {listed}{more}."
+        else:
+            text = f"{token.upper()} is the {label} for the {record['model']}."
+            if requested_field and requested_field != field:
+                text += " " + self._describe_field(record, requested_field)
+            elif field == "deviceSku":
+                text += " " + self._describe_field(record, "simSku")
+        return {"response_text": text, "retrieved_doc_ids": []}
+
+    def _answer_prefix(self, token, prefixed):
+        listed = [self._display[key] for key in prefixed[:_MAX_LISTED]]
+        more = " among others" if len(prefixed) > _MAX_LISTED else ""
+        return {
+            "response_text": (
+                f"I couldn't find {token.upper()} exactly, but matching SKUs include "
+                f"{', '.join(listed)}{more}. Which one do you mean?"
+            ),
+            "retrieved_doc_ids": [],
+        }
+
+    def _answer_model(self, records, requested_field):
+        record = records[0]
+        return {
+            "response_text": self._describe_field(record, requested_field),
+            "retrieved_doc_ids": [],
+        }
+
+    def _describe_field(self, record, field):
+        model = record["model"]
+        value = record.get(field, "")
+        if field == "url":
+            return f"You can find the {model} product page at {value}." if _present(value) \
+                else f"I don't have a product page for the {model}."
+        label = IDENTIFIER_FIELDS[field]
+        if not _present(value):
+            return f"There is no {label} listed for the {model}."
+        if field == "simSku":
+            return f"The {model} uses SIM {value}."
+        return f"The {label} for the {model} is {value}."
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_catalog() -> CatalogIndex:
+    """
+    Returns the process-wide catalog index, building it on first use.
+    """
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = CatalogIndex.from_files()
+    return _catalog
@@ -0,0 +1,91 @@
+# telecom_agent/src/chunking.py
+import math
+import re
+
+# Sentence ends, but not the "1." that numbers a step
+_SENTENCE_RE = re.compile(r"(?<=[^\d\s][.!?])\s+")
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (about four characters per token for English), cheap
+    enough to run on every candidate sentence.
+    """
+    return math.ceil(len(text) / _CHARS_PER_TOKEN) if text else 0
+
+def split_sentences(text: str) -> list:
+    """
+    Splits text into sentences, with whitespace collapsed.
+    """
+    return [s for s in _SENTENCE_RE.split(" ".join(text.split())) if s]
+
+def _split_long_sentence(sentence: str, token_limit: int):
+    # A "sentence" longer than a whole chunk (a SKU list) is cut between words
+    if estimate_tokens(sentence) <= token_limit:
+        yield sentence
+        return
+    piece = []
+    length = 0
+    for word in sentence.split():
+        if piece and length + 1 + len(word) > token_limit * _CHARS_PER_TOKEN:
+            yield " ".join(piece)
+            piece, length = [], 0
+        length += len(word) + (1 if piece else 0)
+        piece.append(word)
+    if piece:
+        yield " ".join(piece)
+
+def _paragraph_units(text: str, token_limit: int):
+    """
+    Yields each paragraph as a list of (separator, sentence) units, where the
+    separator ("\\n\\n", "\\n" or " ") is what preceded the sentence.
+    """
+    for paragraph in _PARAGRAPH_RE.split(text):
+        units = []
+        for line in paragraph.splitlines():
+            separator = "\n" if units else "\n\n"
+            for sentence in split_sentences(line):
+                for piece in _split_long_sentence(sentence, token_limit):
+                    units.append((separator, piece))
+                    separator = " "
+        if units:
+            yield units
+
+def _render(units) -> str:
+    return "".join(separator + sentence for separator, sentence in units).strip()
+
+def chunk_document(text: str, token_limit: int, overlap_tokens: int) -> list:
+    """
+    Splits a document into chunks of at most `token_limit` estimated tokens
+    that end on sentence boundaries, and on paragraph boundaries whenever the
+    next paragraph would not fit. A chunk that has to end inside a paragraph
+    repeats its last sentences (up to `overlap_tokens`) at the start of the
+    next one; line and paragraph breaks are kept.
+    """
+    chunks = []
+    current = []
+    used = 0
+    for paragraph in _paragraph_units(text, token_limit):
+        paragraph_tokens = sum(estimate_tokens(sentence) for _, sentence in paragraph)
+        if current and used + paragraph_tokens > token_limit:
+            chunks.append(_render(current))
+            current, used = [], 0
+        for unit in paragraph:
+            tokens = estimate_tokens(unit[1])
+            if current and used + tokens > token_limit:
+                chunks.append(_render(current))
+                tail = []
+                tail_tokens = 0
+                for previous in reversed(current):
+                    previous_tokens = estimate_tokens(previous[1])
+                    if tail_tokens + previous_tokens > overlap_tokens or tail_tokens + previous_tokens + tokens > token_limit:
+                        break
+                    tail.insert(0, previous)
+                    tail_tokens += previous_tokens
+                current, used = tail, tail_tokens
+            current.append(unit)
+            used += tokens
+    if current:
+        chunks.append(_render(current))
+    return chunks
@@ -15,14 +15,104 @@ MCP_AUTH_TOKEN = os.environ.get('MCP_AUTH_TOKEN')
 # --- Knowledge Base and Indexing Configuration ---
 KB_DOCUMENTS_PATH = "knowledge_base/documents"
 KB_METADATA_PATH = "knowledge_base/metadata"
+# Device / SIM / UPC catalog used to answer exact SKU lookups without RAG
+SKU_CATALOG_PATH = os.environ.get('SKU_CATALOG_PATH', '../results_skus.csv')
 CHROMA_DB_PATH = "knowledge_base/embeddings"
 WHOOSH_INDEX_PATH = "knowledge_base/indices"
+# Memory-mapped BM25 postings, rebuilt by run_ingestion alongside the Whoosh index
+BM25_INDEX_PATH = "knowledge_base/bm25"
+# Memory-mapped embedding matrix, rebuilt by run_ingestion from the Chroma collection
+DENSE_INDEX_PATH = "knowledge_base/dense"
+# Written by run_ingestion after every rebuild so long-lived readers can hot-swap
+KB_VERSION_FILE = "knowledge_base/kb_version"
+# Which Chroma collection and Whoosh index directory are live. A full rebuild
+# writes a new pair next to the serving one and switches this pointer.
+KB_GENERATION_FILE = "knowledge_base/kb_generation.json"
+# Content hashes of every ingested document and chunk, used for incremental ingestion
+KB_MANIFEST_PATH = "knowledge_base/manifest.json"
+# Which documents' chunks were folded into near-duplicates held by other documents
+KB_DUPLICATES_PATH = "knowledge_base/duplicates.json"
+# How often (seconds) the retrieval engine checks KB_VERSION_FILE for a rebuild
+KB_VERSION_CHECK_INTERVAL = float(os.environ.get('KB_VERSION_CHECK_INTERVAL', 2.0))
 
 # --- RAG and Model Configuration ---
 EMBEDDING_MODEL = "models/text-embedding-004"
+# 'gemini' calls the Embeddings API; 'local' uses a deterministic hashing
+# embedder that needs no network. Changing it requires re-running ingestion.
+EMBEDDING_BACKEND = os.environ.get('EMBEDDING_BACKEND', 'gemini')
+LOCAL_EMBEDDING_DIM = 768
 GENERATIVE_MODEL = "gemini-1.5-flash"
+# Stream model tokens to the caller phrase by phrase instead of waiting for the full answer
+STREAMING_GENERATION = os.environ.get('STREAMING_GENERATION', 'true').lower() == 'true'
+# Minimum phrase length before a comma/semicolon/colon is used as a TTS break
+TTS_CLAUSE_MIN_CHARS = 40
 RRF_K = 20
+# Estimated prompt tokens for the retrieved articles and for the conversation history
+CONTEXT_TOKEN_BUDGET = int(os.environ.get('CONTEXT_TOKEN_BUDGET', 1200))
+HISTORY_TOKEN_BUDGET = int(os.environ.get('HISTORY_TOKEN_BUDGET', 300))
+# Most recent user/agent turns kept verbatim; older ones are reduced to the caller's questions
+HISTORY_RECENT_TURNS = int(os.environ.get('HISTORY_RECENT_TURNS', 2))
+# Sparse retrieval leg: 'whoosh' (query parser + searcher) or 'bm25' (vectorized NumPy scoring)
+SPARSE_ENGINE = os.environ.get('SPARSE_ENGINE', 'whoosh')
+# Dense retrieval leg: 'chroma' (collection.query) or 'numpy' (exact search over DENSE_INDEX_PATH).
+# numpy is faster and exact up to roughly 10k chunks; beyond that Chroma's HNSW graph wins on latency.
+DENSE_ENGINE = os.environ.get('DENSE_ENGINE', 'chroma')
+# 'float32' or 'int8' (4x smaller, slightly approximate scores); applied by the next ingestion run
+DENSE_INDEX_DTYPE = os.environ.get('DENSE_INDEX_DTYPE', 'float32')
+# Deadline (seconds) for each hybrid retrieval leg before falling back to the other leg
+RETRIEVAL_LEG_TIMEOUT = float(os.environ.get('RETRIEVAL_LEG_TIMEOUT', 1.5))
+# Extra wait (seconds) for a late leg when neither met its deadline; after it the query gets no context
+RETRIEVAL_LATE_LEG_TIMEOUT = float(os.environ.get('RETRIEVAL_LATE_LEG_TIMEOUT', 1.0))
+RETRIEVAL_WORKERS = int(os.environ.get('RETRIEVAL_WORKERS', 8))
+# Restrict retrieval to the KB devices a query names (e.g. only Pixel 2 articles)
+DEVICE_FILTER_ENABLED = os.environ.get('DEVICE_FILTER_ENABLED', 'true').lower() == 'true'
+
+# --- Query Embedding Cache ---
+QUERY_EMBEDDING_CACHE_SIZE = int(os.environ.get('QUERY_EMBEDDING_CACHE_SIZE', 2048))
+QUERY_EMBEDDING_CACHE_TTL = float(os.environ.get('QUERY_EMBEDDING_CACHE_TTL', 24 * 3600))
+# Optional SQLite file that keeps query vectors across restarts
+QUERY_EMBEDDING_CACHE_PATH = os.environ.get('QUERY_EMBEDDING_CACHE_PATH')
+# Rows kept in that file; expired rows are purged and the oldest evicted above this
+QUERY_EMBEDDING_CACHE_DISK_MAX_ROWS = int(os.environ.get('QUERY_EMBEDDING_CACHE_DISK_MAX_ROWS', 100000))
+
+# --- Ingestion Pipeline Configuration ---
+INGEST_BATCH_SIZE = int(os.environ.get('INGEST_BATCH_SIZE', 100)) # chunks per embedding request
+INGEST_MAX_CONCURRENCY = int(os.environ.get('INGEST_MAX_CONCURRENCY', 4)) # embedding requests in flight
+INGEST_MAX_RETRIES = int(os.environ.get('INGEST_MAX_RETRIES', 5))
+INGEST_RETRY_BACKOFF = float(os.environ.get('INGEST_RETRY_BACKOFF', 1.0)) # seconds, doubled per retry
+
+# --- Semantic Answer Cache ---
+ANSWER_CACHE_ENABLED = os.environ.get('ANSWER_CACHE_ENABLED', 'true').lower() == 'true'
+ANSWER_CACHE_SIZE = int(os.environ.get('ANSWER_CACHE_SIZE', 512))
+# Cosine similarity a query must reach to reuse a cached answer
+ANSWER_CACHE_THRESHOLD = float(os.environ.get('ANSWER_CACHE_THRESHOLD', 0.92))
+# Misses within this margin below the threshold are counted as near misses for tuning
+ANSWER_CACHE_NEAR_MISS_MARGIN = float(os.environ.get('ANSWER_CACHE_NEAR_MISS_MARGIN', 0.05))
+
+# --- Conversation Session Store ---
+# 'memory' keeps sessions in this process; 'redis' shares them between agent workers
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'memory')
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+SESSION_IDLE_TTL = int(os.environ.get('SESSION_IDLE_TTL', 30 * 60)) # seconds
+MAX_SESSIONS = int(os.environ.get('MAX_SESSIONS', 10000))
+
+# --- Speculative Retrieval ---
+# Retrieval starts on stable interim transcripts; the final transcript reuses
+# the results when it names the same devices and reaches SPECULATION_SIMILARITY
+# word-level similarity. A newer interim below that similarity re-speculates.
+SPECULATION_SIMILARITY = float(os.environ.get('SPECULATION_SIMILARITY', 0.85))
+SPECULATION_TTL = float(os.environ.get('SPECULATION_TTL', 15)) # seconds
+SPECULATION_MAX_SESSIONS = int(os.environ.get('SPECULATION_MAX_SESSIONS', 1000))
 
 # --- Chunking Configuration ---
-CHUNK_SIZE = 768
-CHUNK_OVERLAP = 100
+# Sizes are estimated tokens (about four characters each). Chunks end on
+# sentence boundaries, and on paragraph boundaries where they can.
+CHUNK_SIZE = 512
+CHUNK_OVERLAP = 64
+# Processes that read and chunk documents during ingestion
+INGEST_CHUNK_WORKERS = int(os.environ.get('INGEST_CHUNK_WORKERS', os.cpu_count() or 1))
+# Chunks whose estimated shingle Jaccard similarity reaches the threshold are
+# embedded and indexed once, for the first document that has them
+CHUNK_DEDUP_ENABLED = os.environ.get('CHUNK_DEDUP_ENABLED', 'true').lower() == 'true'
+CHUNK_DEDUP_THRESHOLD = float(os.environ.get('CHUNK_DEDUP_THRESHOLD', 0.85))
+MINHASH_PERMUTATIONS = 128
@@ -1,34 +1,30 @@
 # telecom_agent/src/context.py
-from collections import deque
+from session_store import create_session_backend
 
-# A simple in-memory context manager for demonstration purposes.
-# In a production system, this would be backed by a persistent store like Redis or a database.
-conversation_contexts = {}
+# Conversation history lives in a pluggable session store: in-process by
+# default, or Redis (SESSION_BACKEND=redis) so several agent workers share it.
+# Idle sessions expire after SESSION_IDLE_TTL and the in-memory store keeps at
+# most MAX_SESSIONS, evicting the least recently used.
 
 MAX_HISTORY_LEN = 10 # Max number of user/agent turns to remember
 
-def get_context(session_id: str) -> list:
+session_store = create_session_backend(MAX_HISTORY_LEN)
+
+def get_context(session_id: str) -> tuple:
     """
     Retrieves the conversation history for a given session.
+    The returned tuple is immutable, so it is shared rather than copied.
     """
-    if session_id not in conversation_contexts:
-        # Use a deque for efficient appends and pops from both ends
-        conversation_contexts[session_id] = deque(maxlen=MAX_HISTORY_LEN)
-    return list(conversation_contexts[session_id]) # Return a copy
+    return session_store.get_history(session_id)
 
 def add_to_context(session_id: str, user_query: str, agent_response: str):
     """
     Adds a new user query and agent response to the conversation history.
     """
-    if session_id not in conversation_contexts:
-        conversation_contexts[session_id] = deque(maxlen=MAX_HISTORY_LEN)
-    
-    conversation_contexts[session_id].append(f"User: {user_query}")
-    conversation_contexts[session_id].append(f"Agent: {agent_response}")
+    session_store.append_turn(session_id, user_query, agent_response)
 
 def clear_context(session_id: str):
     """
     Clears the history for a session.
     """
-    if session_id in conversation_contexts:
-        conversation_contexts[session_id].clear()
+    session_store.clear(session_id)
@@ -0,0 +1,212 @@
+# telecom_agent/src/context_builder.py
+import math
+import re
+import threading
+from collections import Counter
+
+from bm25_index import tokenize
+from chunking import estimate_tokens, split_sentences
+from config import CONTEXT_TOKEN_BUDGET, HISTORY_TOKEN_BUDGET, HISTORY_RECENT_TURNS
+
+_NUMBERED_RE = re.compile(r"^\d+[.)]\s")
+_BULLET_RE = re.compile(r"^[*\-\u2022]\s")
+_OLDER_QUESTION_WORDS = 25
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def split_units(text: str) -> list:
+    """
+    Splits a chunk into selectable units: sentences, except that a numbered
+    procedure (from its first step to its last, with any notes in between)
+    and a run of bullets each stay together, so instructions are never
+    returned with steps missing.
+    """
+    sentences = split_sentences(text)
+    numbered = [i for i, sentence in enumerate(sentences) if _NUMBERED_RE.match(sentence)]
+    first_step, last_step = (numbered[0], numbered[-1]) if numbered else (-1, -1)
+    units = []
+    i = 0
+    while i < len(sentences):
+        if i == first_step:
+            end = last_step + 1
+        else:
+            end = i + 1
+            while _BULLET_RE.match(sentences[i]) and end < len(sentences) and _BULLET_RE.match(sentences[end]):
+                end += 1
+        units.append(" ".join(sentences[i:end]))
+        i = end
+    return units
+
+class ContextBuilder:
+    """
+    Assembles the knowledge base and history sections of the generation
+    prompt within a token budget.
+
+    Chunks are taken in RRF rank order, each getting a share of the budget
+    that favours higher ranks (whatever a chunk leaves unused passes on to
+    the next). Units already seen - the CHUNK_OVERLAP words neighbouring
+    chunks share, or the same boilerplate in two articles - are dropped. A
+    chunk that fits its share after that is kept whole; a longer one keeps
+    its units that best match the query lexically, in their original order,
+    or its opening units when none does. A chunk is only left out once the
+    budget is spent, and never the top-ranked one. Older history turns are
+    reduced to the caller's questions and the oldest are dropped to fit
+    the history budget.
+    """
+    def __init__(self, token_budget=CONTEXT_TOKEN_BUDGET, history_budget=HISTORY_TOKEN_BUDGET,
+                 recent_turns=HISTORY_RECENT_TURNS):
+        self.token_budget = token_budget
+        self.history_budget = history_budget
+        self.recent_turns = recent_turns
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "tokens_before": 0, "tokens_after": 0,
+                       "duplicate_units": 0, "trimmed_chunks": 0, "dropped_chunks": 0}
+
+    def _score_units(self, query_terms, units):
+        # IDF over the candidate units themselves: a term every unit repeats
+        # (the device name) counts for less than the one that asks the question
+        unit_terms = [set(tokenize(unit)) for unit in units]
+        document_freq = Counter(term for terms in unit_terms for term in terms & query_terms)
+        n = len(units)
+        return [
+            sum(math.log(1 + n / document_freq[term]) for term in terms & query_terms) / math.sqrt(len(terms) or 1)
+            for terms in unit_terms
+        ]
+
+    def build_articles(self, query: str, chunk_ids: list, chunks: list):
+        """
+        Returns (text, report) for the retrieved chunks, given in rank order.
+        """
+        query_terms = set(tokenize(query))
+        seen = set()
+        seen_by_source = {}
+        candidates = []
+        duplicates = 0
+        for chunk_id, chunk in zip(chunk_ids, chunks):
+            source = chunk_id.rsplit("_chunk_", 1)[0]
+            previous = seen_by_source.get(source, "")
+            units = []
+            for unit in split_units(chunk or ""):
+                key = _normalize(unit)
+                # A window edge cuts sentences, so the overlap shows up as
+                # fragments of text an earlier chunk of the document had
+                if key in seen or (previous and key in previous):
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                units.append(unit)
+            seen_by_source[source] = previous + " " + _normalize(chunk or "")
+            candidates.append(units)
+
+        weights = [1.0 / (rank + 1) for rank in range(len(candidates))]
+        remaining = self.token_budget
+        sections = []
+        trimmed = dropped = 0
+        all_units = [unit for units in candidates for unit in units]
+        scores = dict(zip(all_units, self._score_units(query_terms, all_units))) if all_units else {}
+        for i, units in enumerate(candidates):
+            if not units:
+                # Everything in it was already in an earlier chunk
+                continue
+            share = remaining * weights[i] / sum(weights[i:])
+            cost = sum(estimate_tokens(unit) for unit in units)
+            if cost <= share:
+                selected = units
+            else:
+                trimmed += 1
+                # Retrieval already judged the chunk relevant, so lexical
+                # scores only pick what to keep; a chunk without a query term
+                # ("set up wifi" against "tap Wi-Fi") keeps its opening units
+                rank = {unit: (scores.get(unit, 0), -position) for position, unit in enumerate(units)}
+                chosen = set()
+                used = 0
+                for unit in sorted(units, key=rank.get, reverse=True):
+                    unit_cost = estimate_tokens(unit)
+                    if used + unit_cost <= share:
+                        chosen.add(unit)
+                        used += unit_cost
+                best = max(units, key=rank.get)
+                if not chosen and estimate_tokens(best) <= remaining:
+                    # The chunk's best unit alone exceeds the share (a long
+                    # procedure); take it if the overall budget still allows
+                    chosen.add(best)
+                selected = [unit for unit in units if unit in chosen]
+                if not selected and i == 0:
+                    # The top-ranked chunk is never left out: cut its best
+                    # unit to the whole budget
+                    selected = [best[:self.token_budget * 4].rsplit(" ", 1)[0] + " ..."]
+                if not selected:
+                    dropped += 1
+                    continue
+            section = "\n".join(selected)
+            remaining -= estimate_tokens(section)
+            sections.append(section)
+
+        report = {"duplicate_units": duplicates, "trimmed_chunks": trimmed, "dropped_chunks": dropped}
+        return "\n\n".join(sections), report
+
+    def build_history(self, history) -> str:
+        """
+        Renders "User: ..." / "Agent: ..." history lines for the prompt. The
+        last `recent_turns` turns are kept verbatim, older ones only as the
+        caller's (shortened) questions; the oldest lines go first when the
+        history budget is exceeded.
+        """
+        lines = list(history or ())
+        cutoff = max(len(lines) - 2 * self.recent_turns, 0)
+        rendered = []
+        for i, line in enumerate(lines):
+            if i >= cutoff:
+                rendered.append(line)
+            elif line.startswith("User: "):
+                words = line[len("User: "):].split()
+                question = " ".join(words[:_OLDER_QUESTION_WORDS]) + (" ..." if len(words) > _OLDER_QUESTION_WORDS else "")
+                rendered.append(f"Earlier, the caller asked: {question}")
+        while rendered and sum(estimate_tokens(line) for line in rendered) > self.history_budget:
+            if len(rendered) == 1:
+                # A single oversized turn is cut to the budget rather than lost
+                rendered[0] = rendered[0][:self.history_budget * 4].rsplit(" ", 1)[0] + " ..."
+                break
+            rendered.pop(0)
+        return "\n".join(rendered)
+
+    def build(self, query: str, history, chunk_ids: list, chunks: list) -> dict:
+        """
+        Returns {"articles", "history", "report"}, where report compares the
+        estimated prompt tokens of this context with pasting every chunk and
+        the full history.
+        """
+        articles, report = self.build_articles(query, chunk_ids, chunks)
+        history_text = self.build_history(history)
+        before = sum(estimate_tokens(chunk or "") for chunk in chunks) + estimate_tokens("\n".join(history or ()))
+        after = estimate_tokens(articles) + estimate_tokens(history_text)
+        report.update({"tokens_before": before, "tokens_after": after, "tokens_saved": max(before - after, 0)})
+        with self._lock:
+            self._stats["requests"] += 1
+            for key in ("tokens_before", "tokens_after", "duplicate_units", "trimmed_chunks", "dropped_chunks"):
+                self._stats[key] += report[key]
+        return {"articles": articles, "history": history_text, "report": report}
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["token_budget"] = self.token_budget
+        stats["tokens_saved"] = max(stats["tokens_before"] - stats["tokens_after"], 0)
+        stats["saved_ratio"] = round(stats["tokens_saved"] / stats["tokens_before"], 3) if stats["tokens_before"] else 0.0
+        stats["avg_tokens_after"] = round(stats["tokens_after"] / stats["requests"], 1) if stats["requests"] else 0.0
+        return stats
+
+_builder = None
+_builder_lock = threading.Lock()
+
+def get_context_builder() -> ContextBuilder:
+    """
+    Returns the process-wide context builder.
+    """
+    global _builder
+    if _builder is None:
+        with _builder_lock:
+            if _builder is None:
+                _builder = ContextBuilder()
+    return _builder
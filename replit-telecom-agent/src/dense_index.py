@@ -0,0 +1,115 @@
+# telecom_agent/src/dense_index.py
+import json
+import os
+
+import numpy as np
+
+from index_files import new_generation, current_directory, publish_generation, write_fields, load_fields, where_mask
+
+# Rows scored per matrix product when the index is int8. Each block is
+# widened to float32 before the product; small blocks keep that copy in
+# cache, so the scan reads a quarter of the bytes of a float32 index.
+_INT8_BLOCK_ROWS = 256
+
+def build_dense_index(items, index_path: str, dtype='float32', filter_fields=()) -> str:
+    """
+    Writes an iterable of (chunk_id, embedding, metadata) as a new generation
+    under `index_path`: the L2-normalized embeddings as one row-major matrix
+    (vectors.npy), ids.json (row -> chunk id) and the `filter_fields`
+    metadata for where filters. With dtype='int8' each row
+    is quantized symmetrically and its scale stored in scales.npy, cutting
+    the matrix to a quarter of its float32 size.
+    """
+    if dtype not in ('float32', 'int8'):
+        raise ValueError(f"Unsupported dense index dtype: {dtype}")
+    ids = []
+    rows = []
+    fields = {name: [] for name in filter_fields}
+    for chunk_id, embedding, metadata in items:
+        ids.append(chunk_id)
+        rows.append(np.asarray(embedding, dtype=np.float32))
+        for name, column in fields.items():
+            column.append((metadata or {}).get(name))
+    vectors = np.vstack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1.0, norms)
+
+    generation, directory = new_generation(index_path)
+    if dtype == 'int8':
+        scales = np.abs(vectors).max(axis=1) / 127.0 if len(vectors) else np.zeros(0, dtype=np.float32)
+        scales = np.where(scales == 0, 1.0, scales).astype(np.float32)
+        quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+        np.save(os.path.join(directory, "vectors.npy"), quantized)
+        np.save(os.path.join(directory, "scales.npy"), scales)
+    else:
+        np.save(os.path.join(directory, "vectors.npy"), vectors.astype(np.float32))
+    with open(os.path.join(directory, "ids.json"), 'w') as f:
+        json.dump(ids, f)
+    write_fields(directory, fields)
+    publish_generation(index_path, generation)
+    return generation
+
+class DenseIndex:
+    """
+    Exact cosine-similarity search over a memory-mapped embedding matrix.
+    A batch of queries is scored with one matrix product and the top k of
+    each is picked with argpartition. query() has the same signature and
+    result shape as Chroma's collection.query, so the retrieval engine can
+    use either interchangeably; distances are cosine distances.
+    """
+    def __init__(self, index_path: str):
+        directory = current_directory(index_path)
+        self.generation = os.path.basename(directory)
+        self.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode='r')
+        scales_path = os.path.join(directory, "scales.npy")
+        self.scales = np.load(scales_path) if os.path.exists(scales_path) else None
+        with open(os.path.join(directory, "ids.json"), 'r') as f:
+            self.ids = json.load(f)
+        self.fields = load_fields(directory)
+
+    @property
+    def dtype(self) -> str:
+        return 'int8' if self.scales is not None else 'float32'
+
+    def _similarities(self, queries, rows=None):
+        # (rows, queries) cosine similarities; a filter only scores its rows
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        if self.scales is None:
+            return vectors @ queries.T
+        similarities = np.empty((len(vectors), len(queries)), dtype=np.float32)
+        for start in range(0, len(vectors), _INT8_BLOCK_ROWS):
+            block = vectors[start:start + _INT8_BLOCK_ROWS]
+            similarities[start:start + len(block)] = block.astype(np.float32) @ queries.T
+        scales = self.scales if rows is None else self.scales[rows]
+        return similarities * scales[:, None]
+
+    def query(self, query_embeddings, n_results=10, where=None) -> dict:
+        """
+        Returns {"ids": [[...]], "distances": [[...]]} with one list per query,
+        nearest first, among the rows matching the `where` metadata filter.
+        """
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1.0, norms)
+        mask = where_mask(self.fields, where, len(self.ids))
+        rows = np.flatnonzero(mask) if mask is not None else None
+        candidates = len(self.ids) if rows is None else len(rows)
+        k = min(n_results, candidates)
+        if k == 0:
+            return {"ids": [[] for _ in queries], "distances": [[] for _ in queries]}
+
+        similarities = self._similarities(queries, rows)
+        if k < candidates:
+            top = np.argpartition(-similarities, k - 1, axis=0)[:k]
+        else:
+            top = np.broadcast_to(np.arange(candidates)[:, None], similarities.shape)
+        top_scores = np.take_along_axis(similarities, top, axis=0)
+        order = np.argsort(-top_scores, axis=0, kind='stable')
+        top = np.take_along_axis(top, order, axis=0)
+        top_scores = np.take_along_axis(top_scores, order, axis=0)
+        if rows is not None:
+            top = rows[top]
+        return {
+            "ids": [[self.ids[row] for row in top[:, q]] for q in range(len(queries))],
+            "distances": [(1.0 - top_scores[:, q]).tolist() for q in range(len(queries))],
+        }
@@ -0,0 +1,214 @@
+# telecom_agent/src/device_matcher.py
+import json
+import os
+import threading
+from collections import deque
+
+from catalog import get_catalog, normalize_model_name
+from config import KB_DUPLICATES_PATH
+from retrieval_engine import get_engine
+
+# Leading words dropped to get the name callers actually say ("Galaxy A01"
+# for "Samsung Galaxy A01"); the catalog mostly lists models without them.
+_BRANDS = frozenset([
+    "apple", "google", "samsung", "motorola", "lg", "nokia", "blackberry", "htc",
+    "sony", "orbic", "tcl", "kyocera", "sonim", "alcatel", "zte", "verizon",
+])
+
+def _distinctive(name: str) -> bool:
+    # Same rule as CatalogIndex.find_model_in_text: one bare word such as
+    # "pixel" or "galaxy" names a family, not a device
+    return len(name.split()) > 1 or any(c.isdigit() for c in name)
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher: finds every occurrence of every pattern in a
+    single pass over the text, however many patterns there are.
+    """
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]
+        for pattern in patterns:
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._outputs.append([])
+                state = next_state
+            self._outputs[state].append(pattern)
+        # Breadth-first, so a state's failure link is final before its
+        # children's; the root's children fail back to the root.
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, child in self._goto[state].items():
+                pending.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+
+    def iter_matches(self, text: str):
+        """
+        Yields (start, end, pattern) for every occurrence, in order of `end`.
+        """
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for pattern in self._outputs[state]:
+                yield position + 1 - len(pattern), position + 1, pattern
+
+class DeviceMatcher:
+    """
+    Recognizes device names in a query and turns them into retrieval
+    filters. Patterns are the KB metadata `device` values (with and without
+    the brand) and the catalog model names. Only KB devices can become a
+    filter: a catalog model the KB has no article for ("Pixel 2 XL" when the
+    KB only covers "Google Pixel 2") falls back to the longest KB device
+    named inside it, and otherwise leaves the query unfiltered.
+
+    `device_aliases` ({device: [devices]}) widens a filter to the devices
+    whose articles hold chunks that ingestion kept in place of the device's
+    own near-duplicates.
+    """
+    def __init__(self, kb_devices=(), model_names=(), device_aliases=None):
+        self._kb_devices = {}  # normalized alias -> KB device value
+        for device in kb_devices:
+            name = normalize_model_name(device)
+            words = name.split()
+            aliases = [name]
+            if len(words) > 1 and words[0] in _BRANDS:
+                aliases.append(" ".join(words[1:]))
+            for alias in aliases:
+                if _distinctive(alias):
+                    self._kb_devices.setdefault(alias, device)
+        patterns = set(self._kb_devices)
+        patterns.update(name for name in map(normalize_model_name, model_names) if _distinctive(name))
+        # Spaces around every pattern keep matches on word boundaries
+        self._automaton = AhoCorasick(f" {pattern} " for pattern in patterns)
+        self.devices = sorted(set(self._kb_devices.values()))
+        self._aliases = {device: list(aliases) for device, aliases in (device_aliases or {}).items()}
+        self.kb_version = None  # the KB version whose duplicates the aliases reflect
+        self._lock = threading.Lock()
+        self._stats = {"queries": 0, "filtered": 0, "uncovered_devices": 0}
+
+    @classmethod
+    def from_catalog(cls, catalog=None):
+        catalog = catalog or get_catalog()
+        device_of = {meta.get("id"): meta["device"] for meta in catalog.kb_metadata if meta.get("device")}
+        duplicate_sources = {}
+        if os.path.exists(KB_DUPLICATES_PATH):
+            with open(KB_DUPLICATES_PATH, 'r') as f:
+                duplicate_sources = json.load(f)
+        device_aliases = {}
+        for doc_id, holders in duplicate_sources.items():
+            for holder in holders:
+                device, alias = device_of.get(doc_id), device_of.get(holder)
+                if device and alias and alias != device and alias not in device_aliases.setdefault(device, []):
+                    device_aliases[device].append(alias)
+        return cls(
+            kb_devices=list(device_of.values()),
+            model_names=[record.get("model", "") for record in catalog.records],
+            device_aliases=device_aliases,
+        )
+
+    def match(self, text: str) -> dict:
+        """
+        Returns {"devices": [KB device values], "uncovered": [names]} for the
+        devices mentioned in `text`, where "uncovered" are recognized models
+        with no KB article.
+        """
+        normalized = f" {normalize_model_name(text)} "
+        matches = [(start, end, pattern.strip()) for start, end, pattern in self._automaton.iter_matches(normalized)]
+        # Longest non-overlapping mentions win ("galaxy s20 ultra 5g" over "galaxy s20")
+        selected = []
+        for start, end, name in sorted(matches, key=lambda m: (m[0] - m[1], m[0])):
+            # Adjacent matches share their boundary space
+            if all(end <= s + 1 or start >= e - 1 for s, e, _ in selected):
+                selected.append((start, end, name))
+        devices, uncovered = [], []
+        for start, end, name in sorted(selected):
+            device = self._kb_devices.get(name)
+            if device is None:
+                inner = [n for s, e, n in matches if s >= start and e <= end and n in self._kb_devices]
+                if inner:
+                    device = self._kb_devices[max(inner, key=len)]
+            if device is None:
+                uncovered.append(name)
+            elif device not in devices:
+                devices.append(device)
+        return {"devices": devices, "uncovered": uncovered}
+
+    def where_for(self, text: str):
+        """
+        Returns a metadata filter restricting retrieval to the KB devices
+        named in `text` and their aliases, e.g.
+        {"device": {"$in": ["Google Pixel 2"]}}, or None when the query
+        names none.
+        """
+        found = self.match(text)
+        with self._lock:
+            self._stats["queries"] += 1
+            if found["devices"]:
+                self._stats["filtered"] += 1
+            elif found["uncovered"]:
+                self._stats["uncovered_devices"] += 1
+        if not found["devices"]:
+            return None
+        return {"device": {"$in": self._with_aliases(found["devices"])}}
+
+    def device_scope(self, text: str) -> tuple:
+        """
+        The sorted device values where_for(text) filters on, or () when
+        `text` names no KB device. Unlike where_for, it is not counted in
+        the stats.
+        """
+        return tuple(sorted(self._with_aliases(self.match(text)["devices"])))
+
+    def _with_aliases(self, found_devices: list) -> list:
+        devices = list(found_devices)
+        for device in found_devices:
+            devices.extend(alias for alias in self._aliases.get(device, ()) if alias not in devices)
+        return devices
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["filter_rate"] = round(stats["filtered"] / stats["queries"], 3) if stats["queries"] else 0.0
+        stats["kb_devices"] = len(self.devices)
+        stats["kb_version"] = self.kb_version
+        return stats
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+def get_device_matcher() -> DeviceMatcher:
+    """
+    Returns the process-wide device matcher for the KB version being served,
+    rebuilding it when a re-ingestion changes the version: deduplication
+    rewrites KB_DUPLICATES_PATH, and with it the device aliases. Callers
+    should ask for it per query rather than keep the instance.
+    """
+    global _matcher
+    version = get_engine().current_version()
+    matcher = _matcher
+    if matcher is None or matcher.kb_version != version:
+        with _matcher_lock:
+            if _matcher is None or _matcher.kb_version != version:
+                rebuilt = DeviceMatcher.from_catalog()
+                rebuilt.kb_version = version
+                if _matcher is not None:
+                    # Keep /stats cumulative across rebuilds
+                    with _matcher._lock:
+                        rebuilt._stats.update(_matcher._stats)
+                _matcher = rebuilt
+            matcher = _matcher
+    return matcher
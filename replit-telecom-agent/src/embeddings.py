@@ -0,0 +1,304 @@
+# telecom_agent/src/embeddings.py
+import hashlib
+import math
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+
+import google.generativeai as genai
+
+from config import (
+    GOOGLE_API_KEY, EMBEDDING_MODEL, EMBEDDING_BACKEND, LOCAL_EMBEDDING_DIM,
+    QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL, QUERY_EMBEDDING_CACHE_PATH,
+    QUERY_EMBEDDING_CACHE_DISK_MAX_ROWS
+)
+
+if GOOGLE_API_KEY:
+    genai.configure(api_key=GOOGLE_API_KEY)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+def normalize_query(query: str) -> str:
+    """
+    Canonicalizes a query so trivially different phrasings share a cache
+    entry: unicode folding, lowercasing, collapsed whitespace and no
+    trailing punctuation ("My WiFi keeps dropping!" -> "my wifi keeps dropping").
+    """
+    text = unicodedata.normalize("NFKC", query).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" .,!?;:")
+
+# --- Embedding Backends ---
+
+class EmbeddingBackend:
+    """
+    Interface for anything that turns text into vectors. Queries and
+    documents are embedded separately because some models use different
+    task types for each.
+    """
+    name = "base"
+
+    def embed_query(self, text: str) -> list:
+        raise NotImplementedError
+
+    def embed_documents(self, texts: list) -> list:
+        raise NotImplementedError
+
+class GeminiEmbeddingBackend(EmbeddingBackend):
+    name = "gemini"
+
+    def __init__(self, model=EMBEDDING_MODEL):
+        self.model = model
+        self.name = f"gemini:{model}"
+
+    def embed_query(self, text: str) -> list:
+        return genai.embed_content(
+            model=self.model,
+            content=text,
+            task_type="retrieval_query"
+        )['embedding']
+
+    def embed_documents(self, texts: list) -> list:
+        return genai.embed_content(
+            model=self.model,
+            content=texts,
+            task_type="retrieval_document"
+        )['embedding']
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    Deterministic, dependency-free embedder based on feature hashing of
+    unigrams and bigrams. It is much weaker than a learned model but lets the
+    whole retrieval path run offline and gives stable vectors across runs.
+    """
+    def __init__(self, dimension=LOCAL_EMBEDDING_DIM):
+        self.dimension = dimension
+        self.name = f"local-hashing:{dimension}"
+
+    def _features(self, text):
+        tokens = _TOKEN_RE.findall(normalize_query(text))
+        yield from tokens
+        for first, second in zip(tokens, tokens[1:]):
+            yield f"{first} {second}"
+
+    def _embed(self, text):
+        vector = [0.0] * self.dimension
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimension
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[bucket] += sign
+        norm = math.sqrt(sum(v * v for v in vector))
+        if norm:
+            vector = [v / norm for v in vector]
+        return vector
+
+    def embed_query(self, text: str) -> list:
+        return self._embed(text)
+
+    def embed_documents(self, texts: list) -> list:
+        return [self._embed(text) for text in texts]
+
+def create_embedding_backend(name=EMBEDDING_BACKEND) -> EmbeddingBackend:
+    if name == 'gemini':
+        return GeminiEmbeddingBackend()
+    elif name == 'local':
+        return HashingEmbeddingBackend()
+    else:
+        raise ValueError(f"Invalid EMBEDDING_BACKEND: {name}")
+
+# --- Query Embedding Cache ---
+
+class _DiskTier:
+    """
+    SQLite-backed second tier so query vectors survive restarts. It is
+    bounded like the memory tier: expired rows are purged and the oldest
+    rows above `max_rows` evicted, on open and every `_PRUNE_EVERY` writes.
+    """
+    _PRUNE_EVERY = 100
+
+    def __init__(self, path, ttl, max_rows):
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings "
+            "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS query_embeddings_created ON query_embeddings (created)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.prune()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector, created FROM query_embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        vector = array('f')
+        vector.frombytes(row[0])
+        return vector.tolist()
+
+    def put(self, key, vector):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (key, vector, created) VALUES (?, ?, ?)",
+                (key, array('f', vector).tobytes(), time.time())
+            )
+            self._conn.commit()
+            self._writes += 1
+            due = self._writes % self._PRUNE_EVERY == 0
+        if due:
+            self.prune()
+
+    def prune(self):
+        """
+        Deletes expired rows, then the oldest rows beyond max_rows.
+        """
+        with self._lock:
+            expired = self._conn.execute(
+                "DELETE FROM query_embeddings WHERE created < ?", (time.time() - self.ttl,)
+            ).rowcount
+            evicted = self._conn.execute(
+                "DELETE FROM query_embeddings WHERE key IN "
+                "(SELECT key FROM query_embeddings ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,)
+            ).rowcount
+            self._conn.commit()
+            self.expirations += expired
+            self.evictions += evicted
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU + TTL cache of query vectors in front of an EmbeddingBackend,
+    with an optional on-disk tier. Keys include the backend name so switching
+    backends never returns vectors from a different embedding space.
+    """
+    def __init__(self, backend: EmbeddingBackend, max_entries=QUERY_EMBEDDING_CACHE_SIZE,
+                 ttl_seconds=QUERY_EMBEDDING_CACHE_TTL, disk_path=QUERY_EMBEDDING_CACHE_PATH,
+                 disk_max_rows=QUERY_EMBEDDING_CACHE_DISK_MAX_ROWS):
+        self.backend = backend
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = _DiskTier(disk_path, ttl_seconds, disk_max_rows) if disk_path else None
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def _key(self, normalized):
+        return f"{self.backend.name}:{normalized}"
+
+    def _get_memory(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            vector, expires_at = entry
+            if time.monotonic() > expires_at:
+                del self._entries[key]
+                self._expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return vector
+
+    def _put_memory(self, key, vector):
+        with self._lock:
+            self._entries[key] = (vector, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def embed_query(self, query: str) -> list:
+        normalized = normalize_query(query)
+        key = self._key(normalized)
+        vector = self._get_memory(key)
+        if vector is not None:
+            return vector
+        if self._disk is not None:
+            vector = self._disk.get(key)
+            if vector is not None:
+                with self._lock:
+                    self._disk_hits += 1
+                self._put_memory(key, vector)
+                return vector
+        with self._lock:
+            self._misses += 1
+        vector = self.backend.embed_query(normalized)
+        self._put_memory(key, vector)
+        if self._disk is not None:
+            self._disk.put(key, vector)
+        return vector
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._disk_hits + self._misses
+            stats = {
+                "backend": self.backend.name,
+                "size": len(self._entries),
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "hit_rate": round((self._hits + self._disk_hits) / lookups, 4) if lookups else 0.0,
+            }
+        if self._disk is not None:
+            stats.update({"disk_size": len(self._disk), "disk_evictions": self._disk.evictions,
+                          "disk_expirations": self._disk.expirations})
+        return stats
+
+_backend = None
+_query_embedder = None
+_init_lock = threading.Lock()
+
+def get_embedding_backend() -> EmbeddingBackend:
+    """
+    Returns the configured embedding backend, shared by ingestion and retrieval.
+    """
+    global _backend
+    if _backend is None:
+        with _init_lock:
+            if _backend is None:
+                _backend = create_embedding_backend()
+    return _backend
+
+def get_query_embedder() -> QueryEmbeddingCache:
+    """
+    Returns the process-wide cached query embedder.
+    """
+    global _query_embedder
+    if _query_embedder is None:
+        backend = get_embedding_backend()
+        with _init_lock:
+            if _query_embedder is None:
+                _query_embedder = QueryEmbeddingCache(backend)
+    return _query_embedder
+
+def set_embedding_backend(backend: EmbeddingBackend):
+    """
+    Replaces the process-wide backend (and drops the query cache), e.g. to
+    run the RAG path offline with HashingEmbeddingBackend.
+    """
+    global _backend, _query_embedder
+    with _init_lock:
+        _backend = backend
+        _query_embedder = None
@@ -0,0 +1,186 @@
+# telecom_agent/src/hybrid_retriever.py
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import RETRIEVAL_LEG_TIMEOUT, RETRIEVAL_LATE_LEG_TIMEOUT, RETRIEVAL_WORKERS, DEVICE_FILTER_ENABLED
+from device_matcher import get_device_matcher
+from retrieval_engine import get_engine
+from embeddings import get_query_embedder
+
+class HybridRetriever:
+    """
+    Runs the dense leg (query embedding + vector search) and the sparse leg
+    (keyword search) concurrently instead of one after the other. Each leg
+    has a deadline; a leg that misses it is dropped and the query is answered
+    from the other leg alone; if neither made it, the first to land within
+    a further late_leg_timeout is used, and otherwise the query gets no
+    context, so retrieval never takes longer than the two combined. When the
+    query names KB devices, both legs are
+    restricted to those devices' chunks.
+    """
+    def __init__(self, engine=None, embedder=None, leg_timeout=RETRIEVAL_LEG_TIMEOUT,
+                 max_workers=RETRIEVAL_WORKERS, device_matcher=None, device_filter=DEVICE_FILTER_ENABLED,
+                 late_leg_timeout=RETRIEVAL_LATE_LEG_TIMEOUT):
+        self.engine = engine or get_engine()
+        self.embedder = embedder or get_query_embedder()
+        # None means the process-wide matcher, looked up per query so it
+        # follows KB re-ingestion
+        self.device_matcher = device_matcher
+        self.device_filter = device_filter
+        self.leg_timeout = leg_timeout
+        self.late_leg_timeout = late_leg_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="retrieval")
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._queries = 0
+        self._fallbacks = {"dense": 0, "sparse": 0}
+        self._errors = {"dense": 0, "sparse": 0}
+        self._empty_results = 0
+        self._latency_ms = []
+
+    def _device_matcher(self):
+        if not self.device_filter:
+            return None
+        return self.device_matcher or get_device_matcher()
+
+    def _dense_leg(self, query, n_results, snapshot, where):
+        query_embedding = self.embedder.embed_query(query)
+        return self.engine.query_dense(query_embedding, n_results, snapshot=snapshot, where=where)
+
+    def _sparse_leg(self, query, n_results, snapshot, where):
+        return self.engine.search_sparse(query, n_results, snapshot=snapshot, where=where)
+
+    def _submit_legs(self, query, n_results, where):
+        # Both legs share one pinned snapshot. The pin is released from the
+        # executor side once both legs finish, so a leg that outlives its
+        # deadline never searches an index that has been closed under it.
+        snapshot = self.engine.pin()
+        remaining = [2]
+        lock = threading.Lock()
+
+        def _on_leg_done(_):
+            with lock:
+                remaining[0] -= 1
+                done = remaining[0] == 0
+            if done:
+                self.engine.release(snapshot)
+
+        legs = {
+            "dense": self._executor.submit(self._dense_leg, query, n_results, snapshot, where),
+            "sparse": self._executor.submit(self._sparse_leg, query, n_results, snapshot, where),
+        }
+        for future in legs.values():
+            future.add_done_callback(_on_leg_done)
+        return legs
+
+    async def aretrieve(self, query: str, n_results=10) -> dict:
+        """
+        Returns {"dense": [ids], "sparse": [{"id", "score"}]}, the shape
+        reciprocal_rank_fusion expects. A leg that timed out or failed
+        contributes an empty list.
+        """
+        start = time.perf_counter()
+        matcher = self._device_matcher()
+        where = matcher.where_for(query) if matcher else None
+        legs = self._submit_legs(query, n_results, where)
+        waiters = {asyncio.wrap_future(future): name for name, future in legs.items()}
+        done, pending = await asyncio.wait(waiters, timeout=self.leg_timeout)
+        results = {"dense": [], "sparse": []}
+        failed = []
+        for waiter in done:
+            name = waiters[waiter]
+            if waiter.exception() is not None:
+                print(f"Hybrid retrieval {name} leg failed: {waiter.exception()}")
+                failed.append(name)
+            else:
+                results[name] = waiter.result()
+        if not pending and len(failed) == len(waiters):
+            raise next(iter(done)).exception()
+        if pending and len(failed) == len(done):
+            # Nothing usable arrived in time; take whichever late leg lands
+            # first rather than answering with no context at all, but only
+            # within a bounded grace period.
+            late_done, pending = await asyncio.wait(pending, timeout=self.late_leg_timeout,
+                                                    return_when=asyncio.FIRST_COMPLETED)
+            for waiter in late_done:
+                name = waiters[waiter]
+                if waiter.exception() is not None:
+                    raise waiter.exception()
+                results[name] = waiter.result()
+        for waiter in pending:
+            name = waiters[waiter]
+            print(f"Hybrid retrieval {name} leg missed its {self.leg_timeout}s deadline")
+            # Consume the eventual result so asyncio does not warn about it
+            waiter.add_done_callback(lambda f: f.exception())
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self._queries += 1
+            for waiter in pending:
+                self._fallbacks[waiters[waiter]] += 1
+            for name in failed:
+                self._errors[name] += 1
+            if not results["dense"] and not results["sparse"] and len(pending) == len(waiters):
+                self._empty_results += 1
+            self._latency_ms.append(elapsed_ms)
+            if len(self._latency_ms) > 1000:
+                del self._latency_ms[:500]
+        return results
+
+    def _get_loop(self):
+        if self._loop is None:
+            with self._loop_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="retrieval-loop", daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def submit(self, query: str, n_results=10):
+        """
+        Starts retrieval on the background event loop and returns a
+        concurrent.futures.Future for its results, without blocking.
+        """
+        return asyncio.run_coroutine_threadsafe(self.aretrieve(query, n_results), self._get_loop())
+
+    def retrieve(self, query: str, n_results=10) -> dict:
+        """
+        Synchronous wrapper for the Flask app. The coroutine runs on a
+        dedicated background event loop so request threads never need one.
+        """
+        return self.submit(query, n_results).result()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            latencies = sorted(self._latency_ms)
+            def percentile(p):
+                if not latencies:
+                    return 0.0
+                return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+            return {
+                "queries": self._queries,
+                "leg_timeout_s": self.leg_timeout,
+                "late_leg_timeout_s": self.late_leg_timeout,
+                "deadline_fallbacks": dict(self._fallbacks),
+                "no_leg_in_time": self._empty_results,
+                "leg_errors": dict(self._errors),
+                "p50_ms": percentile(0.50),
+                "p95_ms": percentile(0.95),
+                "device_filter": self._device_matcher().stats() if self.device_filter else None,
+            }
+
+_retriever = None
+_retriever_lock = threading.Lock()
+
+def get_hybrid_retriever() -> HybridRetriever:
+    """
+    Returns the process-wide hybrid retriever.
+    """
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = HybridRetriever()
+    return _retriever
@@ -0,0 +1,113 @@
+# telecom_agent/src/index_files.py
+import json
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+
+# Array-backed indices (BM25 postings, the NumPy dense matrix) are rebuilt
+# whole rather than updated in place. Each build is written to a fresh
+# generation directory and published by atomically replacing a CURRENT
+# pointer, so a reader never opens a half-written index.
+
+def new_generation(index_path: str):
+    """
+    Creates an empty generation directory; returns (generation, directory).
+    """
+    generation = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+    directory = os.path.join(index_path, generation)
+    os.makedirs(directory)
+    return generation, directory
+
+def read_current(index_path: str):
+    try:
+        with open(os.path.join(index_path, "CURRENT"), 'r') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def current_directory(index_path: str) -> str:
+    """
+    Returns the directory of the published generation.
+    """
+    generation = read_current(index_path)
+    if generation is None:
+        raise FileNotFoundError(f"No index found in {index_path}")
+    return os.path.join(index_path, generation)
+
+def publish_generation(index_path: str, generation: str):
+    """
+    Points CURRENT at `generation` and removes older generations, keeping
+    the one it replaced for readers that still have it mapped.
+    """
+    current_path = os.path.join(index_path, "CURRENT")
+    previous = read_current(index_path)
+    tmp_path = f"{current_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(generation)
+    os.replace(tmp_path, current_path)
+    for name in os.listdir(index_path):
+        stale = os.path.join(index_path, name)
+        if os.path.isdir(stale) and name not in (generation, previous):
+            shutil.rmtree(stale, ignore_errors=True)
+
+def index_exists(index_path: str) -> bool:
+    generation = read_current(index_path)
+    return generation is not None and os.path.isdir(os.path.join(index_path, generation))
+
+# --- Metadata filters ---
+# Array indices keep a few scalar metadata fields per row (fields.json) so
+# queries can be restricted with the same `where` filters Chroma takes.
+
+def write_fields(directory: str, fields: dict):
+    """
+    Stores {field: [value per row]}; missing values are None.
+    """
+    with open(os.path.join(directory, "fields.json"), 'w') as f:
+        json.dump(fields, f)
+
+def load_fields(directory: str) -> dict:
+    """
+    Returns {field: (codes, lookup)}: one int32 code per row and the
+    value -> code mapping; rows without a value have code -1.
+    """
+    path = os.path.join(directory, "fields.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        raw = json.load(f)
+    fields = {}
+    for name, column in raw.items():
+        values = sorted({value for value in column if value is not None}, key=str)
+        lookup = {value: code for code, value in enumerate(values)}
+        codes = np.array([lookup.get(value, -1) if value is not None else -1 for value in column], dtype=np.int32)
+        fields[name] = (codes, lookup)
+    return fields
+
+def where_mask(fields: dict, where: dict, num_rows: int):
+    """
+    Evaluates a Chroma-style filter - {"field": value}, {"field": {"$eq": value}}
+    or {"field": {"$in": [values]}}, several fields ANDed - to a boolean row
+    mask. Returns None when `where` is empty.
+    """
+    if not where:
+        return None
+    mask = np.ones(num_rows, dtype=bool)
+    for name, condition in where.items():
+        if isinstance(condition, dict):
+            if set(condition) == {"$eq"}:
+                wanted = [condition["$eq"]]
+            elif set(condition) == {"$in"}:
+                wanted = list(condition["$in"])
+            else:
+                raise ValueError(f"Unsupported filter on {name}: {condition}")
+        else:
+            wanted = [condition]
+        if name not in fields:
+            raise ValueError(f"Index has no '{name}' field to filter on")
+        codes, lookup = fields[name]
+        wanted_codes = [lookup[value] for value in wanted if value in lookup]
+        mask &= np.isin(codes, wanted_codes)
+    return mask
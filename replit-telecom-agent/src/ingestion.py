@@ -1,55 +1,66 @@
 # telecom_agent/src/ingestion.py
 import os
 import json
-import google.generativeai as genai
+import hashlib
+import random
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 import chromadb
-from whoosh.index import create_in, open_dir
+import numpy as np
+from whoosh.index import create_in, open_dir, exists_in
 from whoosh.fields import Schema, TEXT, ID
-from whoosh.qparser import QueryParser
 
+from bm25_index import BM25Index, build_bm25_index
+from chunking import chunk_document
+from dense_index import DenseIndex, build_dense_index
+from index_files import index_exists
+from kb_version import (
+    bump_kb_version, new_kb_generation, read_kb_generation, read_previous_kb_generation,
+    publish_kb_generation, whoosh_directory
+)
+from near_duplicates import MinHasher, find_near_duplicates
+from embeddings import get_embedding_backend
 from config import (
-    GOOGLE_API_KEY, KB_DOCUMENTS_PATH, KB_METADATA_PATH,
-    CHROMA_DB_PATH, WHOOSH_INDEX_PATH, EMBEDDING_MODEL,
-    CHUNK_SIZE, CHUNK_OVERLAP
+    GOOGLE_API_KEY, KB_DOCUMENTS_PATH, KB_METADATA_PATH, KB_MANIFEST_PATH, KB_DUPLICATES_PATH,
+    CHROMA_DB_PATH, WHOOSH_INDEX_PATH, BM25_INDEX_PATH, DENSE_INDEX_PATH, DENSE_INDEX_DTYPE,
+    EMBEDDING_BACKEND,
+    CHUNK_SIZE, CHUNK_OVERLAP, INGEST_CHUNK_WORKERS, CHUNK_DEDUP_ENABLED, CHUNK_DEDUP_THRESHOLD,
+    MINHASH_PERMUTATIONS, INGEST_BATCH_SIZE, INGEST_MAX_CONCURRENCY,
+    INGEST_MAX_RETRIES, INGEST_RETRY_BACKOFF
 )
 
-# Configure the generative AI model
-if GOOGLE_API_KEY:
-    genai.configure(api_key=GOOGLE_API_KEY)
+# Chunk metadata the sparse and array indices keep for retrieval filters
+FILTER_FIELDS = ("device", "topic")
+# Bump when chunk_document or the near-duplicate rules change how documents
+# are cut, so the manifest settings force a rebuild
+CHUNKER_VERSION = 2
+
+_minhasher = MinHasher(MINHASH_PERMUTATIONS)
 
-def intelligent_chunker(text, chunk_size, overlap):
-    # This is a simplified chunker; a real implementation might use NLP libraries
-    # to better preserve sentence boundaries.
-    words = text.split()
-    chunks = []
-    for i in range(0, len(words), chunk_size - overlap):
-        chunks.append(" ".join(words[i:i + chunk_size]))
-    return chunks
+def _content_hash(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
 
-def run_ingestion():
+def _chunk_metadata(parent_meta: dict, filename: str) -> dict:
     """
-    Full pipeline to ingest documents: parse, chunk, embed, and index.
+    Copies a document's metadata onto one of its chunks. Chroma only accepts
+    scalar metadata values, so list fields (SKUs, keywords...) are joined.
     """
-    if not GOOGLE_API_KEY:
-        print("ERROR: GOOGLE_API_KEY not found. Please set it in Replit Secrets.")
-        return
-        
-    # 1. Setup Clients
-    chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-    collection_name = "telecom_kb"
-    # Delete collection if it exists to ensure a fresh start
-    if any(collection.name == collection_name for collection in chroma_client.list_collections()):
-        chroma_client.delete_collection(name=collection_name)
-    collection = chroma_client.create_collection(name=collection_name)
-
-    # 2. Setup Whoosh index
-    if not os.path.exists(WHOOSH_INDEX_PATH):
-        os.makedirs(WHOOSH_INDEX_PATH)
-    schema = Schema(id=ID(stored=True, unique=True), content=TEXT(stored=True))
-    ix = create_in(WHOOSH_INDEX_PATH, schema)
-    writer = ix.writer()
+    chunk_meta = {}
+    for key, value in parent_meta.items():
+        if isinstance(value, list):
+            value = ", ".join(str(v) for v in value)
+        elif value is None:
+            continue
+        chunk_meta[key] = value
+    chunk_meta['source'] = filename
+    return chunk_meta
 
-    # 3. Load Metadata
+def load_metadata_map() -> dict:
     metadata_map = {}
     for fname in os.listdir(KB_METADATA_PATH):
         if fname.endswith(".jsonl"):
@@ -57,48 +68,486 @@ def run_ingestion():
                 for line in f:
                     meta = json.loads(line)
                     # --- FIX: Changed 'doc_id' to 'id' to match sample data ---
-                    doc_id = meta.get('id') 
+                    doc_id = meta.get('id')
                     if doc_id:
                         metadata_map[doc_id] = meta
+    return metadata_map
+
+def _manifest_settings() -> dict:
+    # Any change here invalidates every stored chunk hash
+    return {
+        "embedding_backend": get_embedding_backend().name,
+        "chunker_version": CHUNKER_VERSION,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "dedup_threshold": CHUNK_DEDUP_THRESHOLD if CHUNK_DEDUP_ENABLED else None,
+    }
+
+def load_manifest() -> dict:
+    if not os.path.exists(KB_MANIFEST_PATH):
+        return {"settings": {}, "documents": {}}
+    with open(KB_MANIFEST_PATH, 'r') as f:
+        return json.load(f)
+
+def save_manifest(manifest: dict):
+    tmp_path = f"{KB_MANIFEST_PATH}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, KB_MANIFEST_PATH)
 
-    # 4. Process and Embed Documents
-    all_chunks = []
-    doc_ids = []
-    chunk_metadatas = []
+def _list_documents() -> list:
+    return sorted(f for f in os.listdir(KB_DOCUMENTS_PATH) if f.endswith('.txt'))
 
-    file_list = [f for f in os.listdir(KB_DOCUMENTS_PATH) if f.endswith('.txt')]
+def _read_document(filename: str) -> str:
+    with open(os.path.join(KB_DOCUMENTS_PATH, filename), 'r') as f:
+        return f.read()
+
+def iter_documents():
+    """
+    Yields (doc_id, filename, content) one document at a time.
+    """
+    for filename in _list_documents():
+        yield os.path.splitext(filename)[0], filename, _read_document(filename)
+
+def _scan_document(task) -> dict:
+    # Runs in the chunking process pool: chunks one document and returns
+    # only what deduplication and diffing need, not the chunk text
+    filename, meta_json = task
+    content = _read_document(filename)
+    chunks = chunk_document(content, CHUNK_SIZE, CHUNK_OVERLAP)
+    signatures = _minhasher.signatures(chunks) if CHUNK_DEDUP_ENABLED else None
+    return {
+        "doc_id": os.path.splitext(filename)[0],
+        "filename": filename,
+        "hash": _content_hash(content, meta_json),
+        "chunk_hashes": [_content_hash(chunk_text) for chunk_text in chunks],
+        # Hash values are below 2**31, so half the width holds them exactly
+        "signatures": signatures.astype(np.uint32) if signatures is not None else None,
+    }
+
+def scan_documents(metadata_map: dict) -> list:
+    """
+    First pass over the knowledge base: chunks every document across
+    INGEST_CHUNK_WORKERS processes and returns one dict per document, in
+    file order, with its doc_id, filename, content hash, chunk hashes and
+    the chunks' MinHash signatures. Chunk text is not kept; the indexing
+    pass reads and chunks again only the documents it has to embed.
+    """
+    file_list = _list_documents()
     print(f"Found {len(file_list)} documents to process.")
+    tasks = [
+        (filename, json.dumps(metadata_map.get(os.path.splitext(filename)[0], {}), sort_keys=True))
+        for filename in file_list
+    ]
+    start = time.perf_counter()
+    if INGEST_CHUNK_WORKERS > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=INGEST_CHUNK_WORKERS) as executor:
+            chunksize = max(1, len(tasks) // (INGEST_CHUNK_WORKERS * 4))
+            documents = list(executor.map(_scan_document, tasks, chunksize=chunksize))
+    else:
+        documents = [_scan_document(task) for task in tasks]
+    num_chunks = sum(len(document["chunk_hashes"]) for document in documents)
+    print(f"Chunked {len(documents)} documents into {num_chunks} chunks in {time.perf_counter() - start:.1f}s.")
+    return documents
+
+def find_duplicate_chunks(documents: list) -> dict:
+    """
+    Maps each near-duplicate chunk, as (doc_id, chunk index), to the chunk
+    that is kept in its place: the first one, in document order, with an
+    estimated Jaccard similarity of at least CHUNK_DEDUP_THRESHOLD. The
+    documents' signatures are released once matched.
+    """
+    signatures = [document.pop("signatures", None) for document in documents]
+    if not CHUNK_DEDUP_ENABLED:
+        return {}
+    keys = [(document["doc_id"], i) for document in documents for i in range(len(document["chunk_hashes"]))]
+    if not keys:
+        return {}
+    signatures = np.vstack(signatures)
+    duplicates = {
+        keys[i]: keys[original]
+        for i, original in enumerate(find_near_duplicates(signatures, CHUNK_DEDUP_THRESHOLD))
+        if original >= 0
+    }
+    print(f"Skipping {len(duplicates)} near-duplicate chunks of {len(keys)}.")
+    return duplicates
 
-    for filename in file_list:
-        doc_id = os.path.splitext(filename)[0]
-        with open(os.path.join(KB_DOCUMENTS_PATH, filename), 'r') as f:
-            content = f.read()
-        
-        chunks = intelligent_chunker(content, CHUNK_SIZE, CHUNK_OVERLAP)
-        
-        for i, chunk_text in enumerate(chunks):
+def save_duplicate_sources(duplicates: dict):
+    """
+    Writes {doc_id: [doc_ids holding its near-duplicate chunks]} to
+    KB_DUPLICATES_PATH, so retrieval filters on a document's device can
+    also reach the chunks standing in for its own.
+    """
+    holders = {}
+    for (doc_id, _), (original_doc_id, _) in duplicates.items():
+        if original_doc_id != doc_id:
+            holders.setdefault(doc_id, set()).add(original_doc_id)
+    tmp_path = f"{KB_DUPLICATES_PATH}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({doc_id: sorted(holders[doc_id]) for doc_id in sorted(holders)}, f)
+    os.replace(tmp_path, KB_DUPLICATES_PATH)
+
+def iter_document_work(manifest: dict, metadata_map: dict, documents: list, duplicates: dict):
+    """
+    Diffs each scanned document against the manifest and yields the work
+    needed to bring the indices up to date for it, as a dict with:
+    - "embed": new chunks or chunks whose text changed
+    - "update_metadata": chunks whose text is unchanged but metadata changed
+    - "delete": chunks that no longer exist
+    - "entry": the manifest entry describing the document once done
+    Near-duplicate chunks are left out; the chunk kept in their place lists
+    their documents in its "duplicate_sources" metadata. Documents that
+    disappeared from disk are yielded last with only deletes. A document is
+    only read and chunked again when it has chunks to embed, one at a time,
+    so memory stays bounded by the batches in flight.
+    """
+    # Snapshot: the running ingestion rewrites manifest entries as it goes
+    previous_docs = dict(manifest.get("documents", {}))
+    seen = set()
+    duplicate_sources = {}
+    for (doc_id, _), original in duplicates.items():
+        if original[0] != doc_id:
+            duplicate_sources.setdefault(original, set()).add(doc_id)
+
+    for document in documents:
+        doc_id = document["doc_id"]
+        seen.add(doc_id)
+        previous = previous_docs.get(doc_id)
+        work = {"doc_id": doc_id, "embed": [], "update_metadata": [], "delete": []}
+        previous_chunks = previous.get("chunks", {}) if previous else {}
+        doc_meta = _chunk_metadata(metadata_map.get(doc_id, {}), document["filename"])
+        chunk_entries = {}
+        for i, chunk_hash in enumerate(document["chunk_hashes"]):
+            if (doc_id, i) in duplicates:
+                continue
+            # Always set: Chroma's update merges metadata, so a key left out
+            # would keep its stale value
+            sources = sorted(duplicate_sources.get((doc_id, i), ()))
+            chunk_meta = dict(doc_meta, duplicate_sources=", ".join(sources))
+            meta_hash = _content_hash(json.dumps(chunk_meta, sort_keys=True))
             chunk_id = f"{doc_id}_chunk_{i}"
-            doc_ids.append(chunk_id)
-            all_chunks.append(chunk_text)
-            
-            parent_meta = metadata_map.get(doc_id, {})
-            current_meta = parent_meta.copy()
-            current_meta['source'] = filename
-            chunk_metadatas.append(current_meta)
-            writer.add_document(id=chunk_id, content=chunk_text)
-
-    # 5. Generate Embeddings
-    print(f"Generating embeddings for {len(all_chunks)} chunks...")
-    embeddings = genai.embed_documents(model=EMBEDDING_MODEL, content=all_chunks)
-
-    # 6. Add to ChromaDB
-    collection.add(
-        ids=doc_ids,
-        embeddings=embeddings['embedding'],
-        documents=all_chunks,
-        metadatas=chunk_metadatas
-    )
+            entry = {"text": chunk_hash, "meta": meta_hash}
+            chunk_entries[chunk_id] = entry
+            old_entry = previous_chunks.get(chunk_id)
+            if old_entry is None or old_entry["text"] != entry["text"]:
+                work["embed"].append((i, chunk_id, chunk_meta, entry))
+            elif old_entry["meta"] != meta_hash:
+                work["update_metadata"].append((chunk_id, chunk_meta))
+        if work["embed"]:
+            chunks = chunk_document(_read_document(document["filename"]), CHUNK_SIZE, CHUNK_OVERLAP)
+            if [_content_hash(chunk_text) for chunk_text in chunks] != document["chunk_hashes"]:
+                print(f"{document['filename']} changed during ingestion; the next run will pick it up.")
+                continue
+            work["embed"] = [(chunk_id, chunks[i], chunk_meta, entry) for i, chunk_id, chunk_meta, entry in work["embed"]]
+        work["delete"] = [cid for cid in previous_chunks if cid not in chunk_entries]
+        work["entry"] = {"hash": document["hash"], "chunks": chunk_entries}
+        # An unchanged document can still gain or lose chunks when another
+        # document's near-duplicates change, so the chunks decide, not the hash
+        if previous and previous.get("hash") == document["hash"] and not (
+                work["embed"] or work["update_metadata"] or work["delete"]):
+            continue
+        yield work
+
+    for doc_id, previous in previous_docs.items():
+        if doc_id not in seen:
+            yield {
+                "doc_id": doc_id, "embed": [], "update_metadata": [],
+                "delete": list(previous.get("chunks", {})), "entry": None,
+            }
+
+def _embed_with_retry(texts: list) -> list:
+    """
+    Embeds one batch, retrying transient failures with exponential backoff
+    and jitter so a single flaky request does not fail the whole run.
+    """
+    backend = get_embedding_backend()
+    for attempt in range(INGEST_MAX_RETRIES + 1):
+        try:
+            return backend.embed_documents(texts)
+        except Exception as e:
+            if attempt == INGEST_MAX_RETRIES:
+                raise
+            delay = INGEST_RETRY_BACKOFF * (2 ** attempt) * (1 + random.random() / 2)
+            print(f"Embedding batch failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+class _IngestionRun:
+    """
+    Streams document work through batched, concurrent embedding. Each batch
+    is written to Chroma and Whoosh as soon as its embeddings arrive, and the
+    manifest is checkpointed after every batch, so an interrupted run resumes
+    without re-embedding what was already written.
+    """
+    def __init__(self, manifest, collection, ix):
+        self.manifest = manifest
+        self.collection = collection
+        self.ix = ix
+        self._pending_chunks = {}
+        self._open_work = {}
+        self.embedded = 0
+        self.changed = False
+
+    def _start_document(self, work):
+        doc_id = work["doc_id"]
+        documents = self.manifest["documents"]
+        # Until the document completes, its entry keeps the old hash so a
+        # resumed run diffs it again, but records chunks as they are written.
+        if work["entry"] is not None:
+            previous = documents.get(doc_id, {"hash": None, "chunks": {}})
+            documents[doc_id] = {"hash": previous["hash"], "chunks": dict(previous["chunks"])}
+        self._pending_chunks[doc_id] = len(work["embed"])
+        self._open_work[doc_id] = work
+        if not work["embed"]:
+            self._finish_document(doc_id)
+
+    def _finish_document(self, doc_id):
+        work = self._open_work.pop(doc_id)
+        del self._pending_chunks[doc_id]
+        if work["update_metadata"]:
+            self.collection.update(
+                ids=[chunk_id for chunk_id, _ in work["update_metadata"]],
+                metadatas=[chunk_meta for _, chunk_meta in work["update_metadata"]]
+            )
+        if work["delete"]:
+            self.collection.delete(ids=work["delete"])
+            writer = self.ix.writer()
+            for chunk_id in work["delete"]:
+                writer.delete_by_term('id', chunk_id)
+            writer.commit()
+        if work["entry"] is None:
+            self.manifest["documents"].pop(doc_id, None)
+        else:
+            self.manifest["documents"][doc_id] = work["entry"]
+        self.changed = True
+
+    def _write_batch(self, batch, embeddings):
+        self.collection.upsert(
+            ids=[chunk_id for _, chunk_id, _, _, _ in batch],
+            embeddings=embeddings,
+            documents=[chunk_text for _, _, chunk_text, _, _ in batch],
+            metadatas=[chunk_meta for _, _, _, chunk_meta, _ in batch]
+        )
+        writer = self.ix.writer()
+        for _, chunk_id, chunk_text, chunk_meta, _ in batch:
+            writer.update_document(id=chunk_id, content=chunk_text, **_whoosh_filter_fields(chunk_meta))
+        writer.commit()
 
-    # 7. Commit changes to Whoosh
+        completed = []
+        for doc_id, chunk_id, _, _, entry in batch:
+            self.manifest["documents"][doc_id]["chunks"][chunk_id] = entry
+            self._pending_chunks[doc_id] -= 1
+            if self._pending_chunks[doc_id] == 0:
+                completed.append(doc_id)
+        for doc_id in completed:
+            self._finish_document(doc_id)
+        self.embedded += len(batch)
+        self.changed = True
+        save_manifest(self.manifest)
+
+    def _iter_batches(self, work_iter):
+        batch = []
+        for work in work_iter:
+            self._start_document(work)
+            for chunk_id, chunk_text, chunk_meta, entry in work["embed"]:
+                batch.append((work["doc_id"], chunk_id, chunk_text, chunk_meta, entry))
+                if len(batch) == INGEST_BATCH_SIZE:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def run(self, work_iter):
+        start = time.perf_counter()
+        batches = self._iter_batches(work_iter)
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=INGEST_MAX_CONCURRENCY) as executor:
+            try:
+                exhausted = False
+                while in_flight or not exhausted:
+                    # Only pull more work from disk while there is room in
+                    # flight, which bounds memory to a few batches.
+                    while not exhausted and len(in_flight) < INGEST_MAX_CONCURRENCY:
+                        batch = next(batches, None)
+                        if batch is None:
+                            exhausted = True
+                        else:
+                            texts = [chunk_text for _, _, chunk_text, _, _ in batch]
+                            in_flight[executor.submit(_embed_with_retry, texts)] = batch
+                    if not in_flight:
+                        break
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        batch = in_flight.pop(future)
+                        self._write_batch(batch, future.result())
+                    elapsed = time.perf_counter() - start
+                    print(f"Embedded {self.embedded} chunks ({self.embedded / elapsed:.1f} chunks/s)")
+            except BaseException:
+                for future in in_flight:
+                    future.cancel()
+                save_manifest(self.manifest)
+                print("Ingestion interrupted; progress was checkpointed and the next run will resume.")
+                raise
+        save_manifest(self.manifest)
+        elapsed = time.perf_counter() - start
+        rate = self.embedded / elapsed if elapsed > 0 else 0.0
+        print(f"Embedded {self.embedded} chunks in {elapsed:.1f}s ({rate:.1f} chunks/s).")
+        return {"chunks_embedded": self.embedded, "seconds": elapsed, "chunks_per_second": rate}
+
+def _whoosh_filter_fields(chunk_meta: dict) -> dict:
+    return {name: str(chunk_meta[name]) for name in FILTER_FIELDS if chunk_meta.get(name) is not None}
+
+def _iter_collection(collection, field, page_size=1000):
+    """
+    Yields (chunk_id, value, metadata) for every chunk in the collection, a
+    page at a time, where `field` is "documents" or "embeddings".
+    """
+    offset = 0
+    while True:
+        page = collection.get(include=[field, "metadatas"], limit=page_size, offset=offset)
+        if not page['ids']:
+            return
+        yield from zip(page['ids'], page[field], page['metadatas'])
+        offset += len(page['ids'])
+
+def _open_whoosh_index(generation: dict, collection):
+    """
+    Returns (ix, generation): the generation's Whoosh index, and the
+    generation to write to. An index that predates the filter fields is
+    re-indexed into a new Whoosh directory, so the live one keeps serving.
+    """
+    directory = whoosh_directory(generation)
+    if exists_in(directory):
+        ix = open_dir(directory)
+        if all(name in ix.schema for name in FILTER_FIELDS):
+            return ix, generation
+        print("Sparse index predates the filter fields; re-indexing it from the vector DB.")
+        generation = dict(generation, whoosh=new_kb_generation()["whoosh"])
+        directory = whoosh_directory(generation)
+    os.makedirs(directory, exist_ok=True)
+    schema = Schema(id=ID(stored=True, unique=True), content=TEXT(stored=True),
+                    **{name: ID() for name in FILTER_FIELDS})
+    ix = create_in(directory, schema)
+    # Chunks already in the collection (none on a full rebuild) need no re-embedding
+    writer = ix.writer()
+    for chunk_id, chunk_text, chunk_meta in _iter_collection(collection, "documents"):
+        writer.add_document(id=chunk_id, content=chunk_text, **_whoosh_filter_fields(chunk_meta or {}))
     writer.commit()
+    return ix, generation
+
+def _drop_generation(chroma_client, generation: dict, keep: list):
+    """
+    Deletes a retired generation's collection and Whoosh index, except what
+    a generation in `keep` still uses.
+    """
+    if generation is None:
+        return
+    kept = [g for g in keep if g is not None]
+    if all(g["collection"] != generation["collection"] for g in kept):
+        if any(c.name == generation["collection"] for c in chroma_client.list_collections()):
+            chroma_client.delete_collection(name=generation["collection"])
+    if all(g["whoosh"] != generation["whoosh"] for g in kept):
+        directory = whoosh_directory(generation)
+        if generation["whoosh"] is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+        elif os.path.isdir(directory):
+            # A pre-generation index lives in the root, next to the generation directories
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if os.path.isfile(path):
+                    os.remove(path)
+
+def rebuild_bm25_index(collection):
+    """
+    Rebuilds the BM25 postings from every chunk in the collection. The
+    postings are compact arrays, so unlike Whoosh they are not updated in
+    place; a full rebuild is cheap next to embedding.
+    """
+    start = time.perf_counter()
+    generation = build_bm25_index(_iter_collection(collection, "documents"), BM25_INDEX_PATH,
+                                  filter_fields=FILTER_FIELDS)
+    print(f"Built BM25 index {generation} in {time.perf_counter() - start:.1f}s.")
+
+def rebuild_dense_index(collection):
+    """
+    Copies every stored embedding into the memory-mapped dense index.
+    """
+    start = time.perf_counter()
+    generation = build_dense_index(_iter_collection(collection, "embeddings"), DENSE_INDEX_PATH,
+                                   dtype=DENSE_INDEX_DTYPE, filter_fields=FILTER_FIELDS)
+    print(f"Built {DENSE_INDEX_DTYPE} dense index {generation} in {time.perf_counter() - start:.1f}s.")
+
+def _array_indices_current() -> bool:
+    if not index_exists(BM25_INDEX_PATH) or not index_exists(DENSE_INDEX_PATH):
+        return False
+    dense = DenseIndex(DENSE_INDEX_PATH)
+    bm25 = BM25Index(BM25_INDEX_PATH)
+    return dense.dtype == DENSE_INDEX_DTYPE and all(
+        name in index.fields for index in (dense, bm25) for name in FILTER_FIELDS
+    )
+
+def run_ingestion(full_rebuild=False):
+    """
+    Pipeline to ingest documents: parse, chunk, embed, and index.
+    Documents are chunked in parallel and near-duplicate chunks dropped
+    before anything is embedded. By default only chunks whose content hash
+    changed since the last run are re-embedded, and the serving collection
+    and index are updated in place, batch by batch. full_rebuild (also
+    forced by changed embedding or chunking settings) builds a new
+    collection and Whoosh index next to the serving ones and switches to
+    them once complete, so queries are never left without an index.
+    """
+    if EMBEDDING_BACKEND == 'gemini' and not GOOGLE_API_KEY:
+        print("ERROR: GOOGLE_API_KEY not found. Please set it in Replit Secrets.")
+        return
+
+    manifest = load_manifest()
+    if manifest.get("settings") != _manifest_settings():
+        if manifest.get("documents"):
+            print("Embedding or chunking settings changed; performing a full rebuild.")
+        full_rebuild = True
+
+    # 1. Chunk every document and find near-duplicate chunks, before any
+    # client threads exist to be forked into the chunking processes. Only
+    # hashes and signatures are kept; chunk text is streamed in step 4.
+    metadata_map = load_metadata_map()
+    documents = scan_documents(metadata_map)
+    duplicates = find_duplicate_chunks(documents)
+
+    # 2. Pick the generation to write: the live one, an unpublished build an
+    # interrupted run left behind (the manifest describes it), or a new one
+    chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+    live = read_kb_generation()
+    target = manifest.get("generation") or live
+    if full_rebuild:
+        if target != live:
+            _drop_generation(chroma_client, target, keep=[live, read_previous_kb_generation()])
+        target = new_kb_generation()
+        manifest = {"settings": {}, "documents": {}}
+        print(f"Building collection {target['collection']} while {live['collection']} keeps serving.")
+    elif target != live:
+        print(f"Resuming the unfinished build of {target['collection']}.")
+    collection = chroma_client.get_or_create_collection(name=target["collection"])
+
+    # 3. Setup Whoosh index
+    ix, target = _open_whoosh_index(target, collection)
+
+    # 4. Stream documents through diffing, batched embedding and indexing
+    manifest["settings"] = _manifest_settings()
+    manifest["generation"] = target
+    ingestion_run = _IngestionRun(manifest, collection, ix)
+    ingestion_run.run(iter_document_work(manifest, metadata_map, documents, duplicates))
+    save_duplicate_sources(duplicates)
+
+    if not ingestion_run.changed and target == live and _array_indices_current():
+        print("Knowledge base is already up to date.")
+        return
+    rebuild_bm25_index(collection)
+    rebuild_dense_index(collection)
+    # Switch to the new generation, if any, and signal running agents to
+    # hot-swap to the updated indices
+    retired = publish_kb_generation(target)
+    bump_kb_version()
+    # The generation just replaced stays until the next switch, for agents
+    # still finishing queries on it
+    _drop_generation(chroma_client, retired, keep=[target, live])
     print("Ingestion complete. Vector DB and sparse index are ready.")
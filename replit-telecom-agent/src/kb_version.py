@@ -0,0 +1,99 @@
+# telecom_agent/src/kb_version.py
+import json
+import os
+import time
+import uuid
+
+from config import KB_VERSION_FILE, KB_GENERATION_FILE, WHOOSH_INDEX_PATH
+
+COLLECTION_NAME = "telecom_kb"
+# Where indices lived before generations: the fixed collection name and the
+# Whoosh index directly in WHOOSH_INDEX_PATH
+LEGACY_GENERATION = {"collection": COLLECTION_NAME, "whoosh": None}
+
+def read_kb_version() -> str:
+    """
+    Returns the current knowledge base version token, or an empty string
+    if the knowledge base has never been ingested.
+    """
+    try:
+        with open(KB_VERSION_FILE, 'r') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+def bump_kb_version() -> str:
+    """
+    Records that the indices were rebuilt. The file is replaced atomically so
+    readers never observe a partially written token.
+    """
+    version = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+    directory = os.path.dirname(KB_VERSION_FILE)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    tmp_path = f"{KB_VERSION_FILE}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, KB_VERSION_FILE)
+    return version
+
+def kb_version_order(version: str) -> tuple:
+    """
+    Sort key for version tokens: bump_kb_version tokens start with the time
+    they were written, so a later bump sorts after an earlier one. Tokens
+    without that prefix (including "", never ingested) sort first, by text.
+    """
+    stamp, _, _ = (version or "").partition("-")
+    return (int(stamp), version) if stamp.isdigit() else (0, version or "")
+
+# --- Index generations ---
+# Incremental ingestion updates the live collection and Whoosh index in place.
+# A full rebuild instead fills a new generation (collection + Whoosh
+# directory) while the old one keeps serving, then publishes it and bumps
+# the KB version so readers swap over.
+
+def new_kb_generation() -> dict:
+    token = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+    return {"collection": f"{COLLECTION_NAME}_{token}", "whoosh": token}
+
+def read_kb_generation() -> dict:
+    """
+    Returns the live generation, {"collection", "whoosh"}.
+    """
+    try:
+        with open(KB_GENERATION_FILE, 'r') as f:
+            pointer = json.load(f)
+    except FileNotFoundError:
+        return dict(LEGACY_GENERATION)
+    return {"collection": pointer["collection"], "whoosh": pointer["whoosh"]}
+
+def read_previous_kb_generation():
+    try:
+        with open(KB_GENERATION_FILE, 'r') as f:
+            return json.load(f).get("previous")
+    except FileNotFoundError:
+        return None
+
+def whoosh_directory(generation: dict, root=WHOOSH_INDEX_PATH) -> str:
+    return root if generation["whoosh"] is None else os.path.join(root, generation["whoosh"])
+
+def publish_kb_generation(generation: dict):
+    """
+    Makes `generation` live. The generation it replaces is kept as
+    "previous" for readers that still have it open; the one before that is
+    returned so the caller can delete it (None if there is nothing to drop).
+    """
+    live = read_kb_generation()
+    if live == generation:
+        return None
+    retired = read_previous_kb_generation()
+    directory = os.path.dirname(KB_GENERATION_FILE)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    tmp_path = f"{KB_GENERATION_FILE}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({**generation, "previous": live}, f)
+    os.replace(tmp_path, KB_GENERATION_FILE)
+    if retired in (None, live, generation):
+        return None
+    return retired
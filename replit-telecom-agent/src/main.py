@@ -1,38 +1,60 @@
 # telecom_agent/src/main.py
 import os
 import json
-from flask import Flask, request, jsonify, Response
-from config import GOOGLE_API_KEY
+from flask import Flask, request, jsonify, Response, stream_with_context
+from config import GOOGLE_API_KEY, STREAMING_GENERATION
 # Renamed import to avoid function name conflicts
 from rag_pipeline import agent_pipeline as run_agent_pipeline
-from context import get_context, add_to_context
+from rag_pipeline import agent_pipeline_stream as run_agent_pipeline_stream
+from context import get_context, add_to_context, session_store
+from context_builder import get_context_builder
 from speech_enhancer import filter_for_tts
+from retrieval_engine import get_engine
+from embeddings import get_query_embedder
+from hybrid_retriever import get_hybrid_retriever
+from answer_cache import get_answer_cache
+from speculation import get_speculator
 
 app = Flask(__name__)
 
-def stream_processor():
+def stream_processor(session_id: str):
     """
     Receives a stream of STT results, processes them, and yields
     agent response chunks.
     """
-    session_id = "streaming_session" 
-    full_transcript = []
-
     for line in request.stream:
         if line:
             stt_result = json.loads(line.decode('utf-8'))
-            transcript_chunk = stt_result.get("text", "")
+            transcript = stt_result.get("text", "")
             
-            if transcript_chunk:
-                full_transcript.append(transcript_chunk)
+            if transcript:
+                if not stt_result.get("is_final", True):
+                    # Interim hypotheses are revisions of the same utterance, not
+                    # pieces of it: they only warm up retrieval for the final one.
+                    get_speculator().speculate(session_id, transcript)
+                    continue
+
+                final_query = transcript
+                print(f"Processing Query: {final_query}")
                 
-                if stt_result.get("is_final", True): 
-                    final_query = "".join(full_transcript)
-                    print(f"Processing Query: {final_query}")
-                    
-                    history = get_context(session_id)
+                history = get_context(session_id)
+                retrieval_results = get_speculator().take(session_id, final_query)
+
+                if STREAMING_GENERATION:
+                    def record_answer(response_text, query=final_query):
+                        add_to_context(session_id, query, response_text)
+
+                    pipeline_result = run_agent_pipeline_stream(
+                        final_query, history, on_complete=record_answer,
+                        retrieval_results=retrieval_results
+                    )
+                    print(f"Retrieved docs for query: {pipeline_result['retrieved_doc_ids']}")
+                    # Phrases are already TTS-filtered and arrive while the model is generating
+                    for phrase in pipeline_result["phrases"]:
+                        yield json.dumps({"text_chunk": phrase + " "}) + "\n"
+                else:
                     # The pipeline now returns a dictionary
-                    pipeline_result = run_agent_pipeline(final_query, history)
+                    pipeline_result = run_agent_pipeline(final_query, history, retrieval_results)
                     response_text = pipeline_result["response_text"]
                     retrieved_docs = pipeline_result["retrieved_doc_ids"]
 
@@ -40,17 +62,30 @@ def stream_processor():
                     print(f"Retrieved docs for query: {retrieved_docs}")
 
                     add_to_context(session_id, final_query, response_text)
-                    
+
                     clean_response = filter_for_tts(response_text)
-                    
+
                     for word in clean_response.split():
                         yield json.dumps({"text_chunk": word + " "}) + "\n"
-                    
-                    full_transcript = []
+
+@app.route('/speculate', methods=['POST'])
+def speculate_handler():
+    """
+    Starts retrieval for a stable interim transcript so the final one can
+    reuse it. Fire-and-forget: returns before retrieval finishes.
+    """
+    data = request.json
+    if not data or not data.get('text'):
+        return jsonify({"error": "Text not provided"}), 400
+    session_id = request.headers.get('X-Session-ID') or data.get('session_id', 'streaming_session')
+    started = get_speculator().speculate(session_id, data['text'])
+    return jsonify({"started": started}), 202
 
 @app.route('/stream', methods=['POST'])
 def agent_stream_handler():
-    return Response(stream_processor(), mimetype='application/json')
+    # The WebRTC server sends one session ID per caller connection
+    session_id = request.headers.get('X-Session-ID') or request.args.get('session_id', 'streaming_session')
+    return Response(stream_with_context(stream_processor(session_id)), mimetype='application/json')
 
 # --- New Test Endpoint ---
 @app.route('/test-rag', methods=['POST'])
@@ -74,6 +109,21 @@ def test_rag_handler():
         print(f"Error in /test-rag handler: {e}")
         return jsonify({"error": "An internal error occurred"}), 500
 
+@app.route('/stats', methods=['GET'])
+def stats_handler():
+    """
+    Reports runtime statistics for the retrieval path.
+    """
+    return jsonify({
+        "retrieval_engine": get_engine().stats(),
+        "query_embedding_cache": get_query_embedder().stats(),
+        "hybrid_retrieval": get_hybrid_retriever().stats(),
+        "answer_cache": get_answer_cache().stats(),
+        "sessions": session_store.stats(),
+        "speculative_retrieval": get_speculator().stats(),
+        "prompt_context": get_context_builder().stats(),
+    })
+
 if __name__ == '__main__':
     # Ensure the telecom_agent runs on port 8080 as per the README
     app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 8080)))
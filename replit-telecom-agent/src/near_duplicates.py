@@ -0,0 +1,81 @@
+# telecom_agent/src/near_duplicates.py
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+")
+# Hashes are (a * x + b) mod a 31-bit prime, so a * x never overflows uint64
+_PRIME = np.uint64((1 << 31) - 1)
+SHINGLE_WORDS = 3
+_SHINGLE_BASE = 1000003
+# 16 bands of 8 rows: texts become candidates from a Jaccard similarity of
+# about (1/16)^(1/8) = 0.71, below any useful threshold, and candidates are
+# then checked against the threshold itself.
+LSH_BANDS = 16
+
+def shingles(text: str, size: int = SHINGLE_WORDS) -> np.ndarray:
+    """
+    Hashes of the distinct overlapping `size`-word windows of `text`. Words
+    are hashed with crc32 rather than hash() so signatures agree across
+    processes, and combined into window hashes with NumPy.
+    """
+    words = _WORD_RE.findall(text.lower())
+    hashes = np.fromiter((zlib.crc32(word.encode("utf-8")) for word in words), dtype=np.uint64, count=len(words))
+    if not words:
+        return np.zeros(1, dtype=np.uint64)
+    hashes %= _PRIME
+    # A text shorter than a window is one shingle
+    size = min(size, len(words))
+    windows = hashes[:len(hashes) - size + 1].copy()
+    for offset in range(1, size):
+        windows = (windows * np.uint64(_SHINGLE_BASE) + hashes[offset:len(hashes) - size + 1 + offset]) % _PRIME
+    return np.unique(windows)
+
+class MinHasher:
+    """
+    MinHash signatures: the share of positions two signatures agree on
+    estimates the Jaccard similarity of the texts' shingle sets. The
+    permutations come from a fixed seed, so signatures computed in different
+    processes or runs are comparable.
+    """
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        if num_perm % LSH_BANDS:
+            raise ValueError(f"num_perm must be a multiple of {LSH_BANDS}")
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = rng.integers(1, int(_PRIME), num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingles(text)
+        return ((np.outer(hashes, self._a) + self._b) % _PRIME).min(axis=0)
+
+    def signatures(self, texts) -> np.ndarray:
+        rows = [self.signature(text) for text in texts]
+        return np.vstack(rows) if rows else np.empty((0, self.num_perm), dtype=np.uint64)
+
+def find_near_duplicates(signatures: np.ndarray, threshold: float) -> list:
+    """
+    Returns, for each signature row, the index of the earlier row it
+    near-duplicates (estimated Jaccard similarity >= threshold), or -1 for
+    rows kept as originals. Rows are only ever matched to originals, so
+    duplicates do not chain.
+    """
+    rows_per_band = signatures.shape[1] // LSH_BANDS if len(signatures) else 0
+    buckets = [defaultdict(list) for _ in range(LSH_BANDS)]
+    original_of = []
+    for i, signature in enumerate(signatures):
+        keys = [signature[band * rows_per_band:(band + 1) * rows_per_band].tobytes() for band in range(LSH_BANDS)]
+        candidates = {j for band, key in enumerate(keys) for j in buckets[band].get(key, ())}
+        best, best_similarity = -1, threshold
+        for j in sorted(candidates):
+            similarity = float(np.mean(signatures[j] == signature))
+            if similarity >= best_similarity and (best < 0 or similarity > best_similarity):
+                best, best_similarity = j, similarity
+        original_of.append(best)
+        if best < 0:
+            for band, key in enumerate(keys):
+                buckets[band][key].append(i)
+    return original_of
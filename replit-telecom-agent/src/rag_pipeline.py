@@ -1,41 +1,36 @@
 # telecom_agent/src/rag_pipeline.py
 import google.generativeai as genai
-import chromadb
-from whoosh.index import open_dir
-from whoosh.qparser import QueryParser
 
 from config import (
-    GOOGLE_API_KEY, CHROMA_DB_PATH, WHOOSH_INDEX_PATH,
-    EMBEDDING_MODEL, GENERATIVE_MODEL, RRF_K
+    GOOGLE_API_KEY, GENERATIVE_MODEL, RRF_K, TTS_CLAUSE_MIN_CHARS, ANSWER_CACHE_ENABLED
 )
+from speech_enhancer import PhraseStreamer
+from catalog import get_catalog
+from context_builder import get_context_builder
+from answer_cache import get_answer_cache
+from embeddings import get_query_embedder
+from device_matcher import get_device_matcher
+from retrieval_engine import get_engine
+from hybrid_retriever import get_hybrid_retriever
 
 # --- Initialize clients ---
 if GOOGLE_API_KEY:
     genai.configure(api_key=GOOGLE_API_KEY)
 
 def get_db_clients():
-    chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-    collection = chroma_client.get_collection(name="telecom_kb")
-    ix = open_dir(WHOOSH_INDEX_PATH)
-    return collection, ix
+    """
+    Returns the warm collection and Whoosh index held by the retrieval engine.
+    Prefer the engine's query methods, which pin a single KB version per query.
+    """
+    with get_engine().acquire() as snapshot:
+        return snapshot.collection, snapshot.ix
 
 def retrieve(query: str, n_results=10) -> dict:
-    collection, ix = get_db_clients()
-    query_embedding = genai.embed_content(
-        model=EMBEDDING_MODEL,
-        content=query,
-        task_type="retrieval_query"
-    )['embedding']
-    dense_results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=n_results,
-    )
-    with ix.searcher() as searcher:
-        query_parser = QueryParser("content", ix.schema)
-        parsed_query = query_parser.parse(query)
-        sparse_results = searcher.search(parsed_query, limit=n_results)
-        sparse_docs = [{"id": hit['id'], "score": hit.score} for hit in sparse_results]
-    return {"dense": dense_results['ids'][0], "sparse": sparse_docs}
+    """
+    Hybrid retrieval with the dense and sparse legs running concurrently.
+    Async callers can use get_hybrid_retriever().aretrieve directly.
+    """
+    return get_hybrid_retriever().retrieve(query, n_results)
 
 def reciprocal_rank_fusion(retrieval_results: dict, k=60) -> list:
     fused_scores = {}
@@ -50,13 +45,16 @@ def reciprocal_rank_fusion(retrieval_results: dict, k=60) -> list:
         fused_scores[doc_id] += 1 / (k + rank)
     return sorted(fused_scores.keys(), key=lambda id: fused_scores[id], reverse=True)
 
-def generate_response(query: str, context: list, reranked_ids: list) -> str:
-    collection, _ = get_db_clients()
-    top_docs_content = []
-    if reranked_ids:
-        retrieved_docs = collection.get(ids=reranked_ids, include=["documents"])
-        top_docs_content = retrieved_docs.get('documents', [])
-    context_str = "\n".join(top_docs_content)
+def assemble_prompt(query: str, context: list, reranked_ids: list):
+    """
+    Returns (prompt, report): the articles are fetched in rank order and cut
+    to the context token budget, and the history to the history budget.
+    The report compares the prompt tokens with pasting everything in.
+    """
+    top_docs_content = get_engine().get_documents(reranked_ids)
+    built = get_context_builder().build(query, context, reranked_ids, top_docs_content)
+    context_str = built["articles"]
+    history_str = built["history"]
     prompt_template = f"""
     You are a helpful and friendly telecom support agent. Your role is to assist users with network and device troubleshooting.
     Use the following retrieved knowledge base articles to answer the user's question.
@@ -64,7 +62,7 @@ def generate_response(query: str, context: list, reranked_ids: list) -> str:
     Do not mention the knowledge base or the articles in your response. Just answer the question directly.
 
     Previous conversation:
-    {context}
+    {history_str}
     
     Knowledge Base Articles:
     ---
@@ -75,26 +73,142 @@ def generate_response(query: str, context: list, reranked_ids: list) -> str:
 
     Your Answer:
     """
+    report = built["report"]
+    print(f"Prompt context: {report['tokens_after']} tokens instead of {report['tokens_before']} "
+          f"({report['tokens_saved']} saved)")
+    return prompt_template, report
+
+def build_prompt(query: str, context: list, reranked_ids: list) -> str:
+    return assemble_prompt(query, context, reranked_ids)[0]
+
+def generate_response(query: str, context: list, reranked_ids: list, prompt=None) -> str:
+    prompt_template = prompt or build_prompt(query, context, reranked_ids)
     model = genai.GenerativeModel(GENERATIVE_MODEL)
     response = model.generate_content(prompt_template)
     return response.text
 
-def agent_pipeline(query: str, conversation_history: list):
+def generate_response_stream(query: str, context: list, reranked_ids: list, model=None, prompt=None):
+    """
+    Yields the answer as raw text deltas while the model is still generating.
+    `model` is anything with a generate_content(prompt, stream=True) method
+    whose chunks expose `.text`; it defaults to the configured Gemini model.
+    """
+    prompt_template = prompt or build_prompt(query, context, reranked_ids)
+    if model is None:
+        model = genai.GenerativeModel(GENERATIVE_MODEL)
+    for chunk in model.generate_content(prompt_template, stream=True):
+        try:
+            text = chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. safety metadata) raise on .text
+            continue
+        if text:
+            yield text
+
+def lookup_cached_answer(query: str, conversation_history=None):
+    """
+    Checks the semantic answer cache. Returns (cached_result, cache_key);
+    cached_result is None on a miss, and cache_key is what store_cached_answer
+    needs afterwards (None when the cache is disabled, or for follow-up
+    questions, whose answers depend on the conversation so far).
+    """
+    if not ANSWER_CACHE_ENABLED or conversation_history:
+        return None, None
+    # The query embedding cache makes this free for the retrieval that follows
+    query_vector = get_query_embedder().embed_query(query)
+    kb_version = get_engine().current_version()
+    devices = get_device_matcher().device_scope(query)
+    entry, similarity = get_answer_cache().lookup(query_vector, kb_version, devices)
+    cache_key = (query, query_vector, kb_version, devices)
+    if entry is None:
+        return None, cache_key
+    print(f"Answer cache hit (similarity {similarity:.3f})")
+    return {
+        "response_text": entry["response_text"],
+        "retrieved_doc_ids": entry["retrieved_doc_ids"]
+    }, cache_key
+
+def store_cached_answer(cache_key, response_text: str, reranked_ids: list):
+    if cache_key is None or not response_text:
+        return
+    query, query_vector, kb_version, devices = cache_key
+    get_answer_cache().store(query, query_vector, response_text, reranked_ids, kb_version, devices)
+
+def agent_pipeline(query: str, conversation_history: list, retrieval_results=None):
     """
     The main pipeline for the agentic RAG system.
     Returns the response and the IDs of the documents used for context.
+    `retrieval_results` may carry results already retrieved speculatively.
     """
+    # 0. Exact SKU / UPC / model lookups are answered from the catalog index
+    catalog_result = get_catalog().answer(query)
+    if catalog_result is not None:
+        return catalog_result
+
+    # 0b. Repeated support questions are served from the semantic answer cache
+    cached_result, cache_key = lookup_cached_answer(query, conversation_history)
+    if cached_result is not None:
+        return cached_result
+
     # 1. Hybrid Retrieval
-    retrieval_results = retrieve(query)
+    if retrieval_results is None:
+        retrieval_results = retrieve(query)
     
     # 2. Fusion/Reranking
     reranked_ids = reciprocal_rank_fusion(retrieval_results, k=RRF_K)[:5]
     
-    # 3. Generate Response
-    response_text = generate_response(query, conversation_history, reranked_ids)
+    # 3. Generate Response from a token-budgeted prompt
+    prompt, prompt_report = assemble_prompt(query, conversation_history, reranked_ids)
+    response_text = generate_response(query, conversation_history, reranked_ids, prompt=prompt)
+    store_cached_answer(cache_key, response_text, reranked_ids)
     
     # Return a dictionary with diagnostics
     return {
         "response_text": response_text,
-        "retrieved_doc_ids": reranked_ids
+        "retrieved_doc_ids": reranked_ids,
+        "prompt_tokens": prompt_report
+    }
+
+def agent_pipeline_stream(query: str, conversation_history: list, on_complete=None, model=None,
+                          retrieval_results=None):
+    """
+    Streaming variant of agent_pipeline. Retrieval runs up front (unless
+    `retrieval_results` were retrieved speculatively), then the returned
+    "phrases" generator yields speakable, TTS-filtered phrases as soon as the
+    model completes each one. Once the answer has finished,
+    on_complete(response_text) is called with the full unfiltered text.
+    """
+    cache_key = None
+    prompt_report = None
+    precomputed = get_catalog().answer(query)
+    if precomputed is None:
+        precomputed, cache_key = lookup_cached_answer(query, conversation_history)
+    if precomputed is not None:
+        reranked_ids = precomputed["retrieved_doc_ids"]
+        text_deltas = iter([precomputed["response_text"]])
+    else:
+        if retrieval_results is None:
+            retrieval_results = retrieve(query)
+        reranked_ids = reciprocal_rank_fusion(retrieval_results, k=RRF_K)[:5]
+        prompt, prompt_report = assemble_prompt(query, conversation_history, reranked_ids)
+        text_deltas = generate_response_stream(query, conversation_history, reranked_ids, model=model,
+                                               prompt=prompt)
+
+    def phrases():
+        streamer = PhraseStreamer(min_clause_chars=TTS_CLAUSE_MIN_CHARS)
+        parts = []
+        for text_delta in text_deltas:
+            parts.append(text_delta)
+            yield from streamer.feed(text_delta)
+        yield from streamer.flush()
+        response_text = "".join(parts)
+        if precomputed is None:
+            store_cached_answer(cache_key, response_text, reranked_ids)
+        if on_complete is not None:
+            on_complete(response_text)
+
+    return {
+        "phrases": phrases(),
+        "retrieved_doc_ids": reranked_ids,
+        "prompt_tokens": prompt_report
     }
@@ -0,0 +1,314 @@
+# telecom_agent/src/retrieval_engine.py
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import chromadb
+from chromadb.api.client import SharedSystemClient
+from whoosh.index import open_dir
+from whoosh.qparser import QueryParser
+from whoosh.query import And, Or, Term
+
+from bm25_index import BM25Index
+from dense_index import DenseIndex
+from config import (
+    CHROMA_DB_PATH, WHOOSH_INDEX_PATH, BM25_INDEX_PATH, DENSE_INDEX_PATH,
+    SPARSE_ENGINE, DENSE_ENGINE, KB_VERSION_CHECK_INTERVAL
+)
+from kb_version import read_kb_version, read_kb_generation, whoosh_directory
+
+class IndexSnapshot:
+    """
+    One generation of open index handles: the Chroma collection, optionally
+    the memory-mapped dense index that stands in for it on queries, and the
+    sparse index - either the Whoosh index with a pool of reusable Whoosh
+    searchers, or the memory-mapped BM25 index. Snapshots are reference
+    counted so a retired generation is only closed once in-flight queries
+    have finished with it. Closing also stops the snapshot's own Chroma
+    system, which holds the SQLite connection and the HNSW segments.
+    """
+    def __init__(self, version, collection, ix=None, bm25=None, dense=None, chroma_system=None):
+        self.version = version
+        self.collection = collection
+        self.chroma_system = chroma_system
+        # Anything with collection.query's signature
+        self.dense = dense if dense is not None else collection
+        self.ix = ix
+        self.bm25 = bm25
+        self.query_parser = QueryParser("content", ix.schema) if ix is not None else None
+        self._searchers = queue.LifoQueue()
+        self._refs = 0
+        self._retired = False
+        self._closed = False
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def searcher(self):
+        """
+        Borrows a Whoosh searcher from the pool. Searchers are not shared
+        between threads, so concurrent queries each get their own.
+        """
+        try:
+            searcher = self._searchers.get_nowait()
+        except queue.Empty:
+            searcher = self.ix.searcher()
+        try:
+            yield searcher
+        finally:
+            self._searchers.put(searcher)
+
+    def _incref(self):
+        with self._lock:
+            self._refs += 1
+
+    def _decref(self):
+        with self._lock:
+            self._refs -= 1
+            should_close = self._retired and self._refs == 0
+        if should_close:
+            self.close()
+
+    def retire(self):
+        with self._lock:
+            self._retired = True
+            should_close = self._refs == 0
+        if should_close:
+            self.close()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        while True:
+            try:
+                self._searchers.get_nowait().close()
+            except queue.Empty:
+                break
+        if self.chroma_system is not None:
+            self.chroma_system.stop()
+
+def _whoosh_filter(where):
+    # Translates the {"field": value | {"$eq": value} | {"$in": [...]}} filters
+    # the array indices and Chroma take into a Whoosh filter query
+    if not where:
+        return None
+    clauses = []
+    for name, condition in where.items():
+        if isinstance(condition, dict):
+            values = condition.get("$in", [condition.get("$eq")])
+        else:
+            values = [condition]
+        clauses.append(Or([Term(name, str(value)) for value in values]))
+    return clauses[0] if len(clauses) == 1 else And(clauses)
+
+class RetrievalEngine:
+    """
+    Process-wide holder of warm index handles. The indices are opened once
+    and reused for every query; when run_ingestion bumps the KB version the
+    engine opens the new indices alongside the old ones and swaps them in
+    without blocking queries that are already running.
+    """
+    def __init__(self, chroma_path=CHROMA_DB_PATH, whoosh_path=WHOOSH_INDEX_PATH,
+                 check_interval=KB_VERSION_CHECK_INTERVAL, sparse_engine=SPARSE_ENGINE,
+                 bm25_path=BM25_INDEX_PATH, dense_engine=DENSE_ENGINE, dense_path=DENSE_INDEX_PATH):
+        if sparse_engine not in ('whoosh', 'bm25'):
+            raise ValueError(f"Unknown sparse engine: {sparse_engine}")
+        if dense_engine not in ('chroma', 'numpy'):
+            raise ValueError(f"Unknown dense engine: {dense_engine}")
+        self.chroma_path = chroma_path
+        self.whoosh_path = whoosh_path
+        self.sparse_engine = sparse_engine
+        self.bm25_path = bm25_path
+        self.dense_engine = dense_engine
+        self.dense_path = dense_path
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._swap_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._last_check = 0.0
+        self._opens = 0
+        self._open_ms_total = 0.0
+        self._acquisitions = 0
+
+    def _open_snapshot(self, version):
+        # Mirrors the per-call open that get_db_clients used to do, so the
+        # measured time is the cost each query paid before this engine existed.
+        if self._snapshot is not None:
+            # Chroma caches one system per path; drop it so the new generation
+            # loads what another process (run_ingestion) wrote. Clearing the
+            # cache does not stop the old system: the retiring snapshot owns
+            # it and stops it once released.
+            SharedSystemClient.clear_system_cache()
+        start = time.perf_counter()
+        generation = read_kb_generation()
+        chroma_client = chromadb.PersistentClient(path=self.chroma_path)
+        # Looked up through the cache, so take it before the next swap clears it
+        chroma_system = chroma_client._system
+        collection = chroma_client.get_collection(name=generation["collection"])
+        dense = DenseIndex(self.dense_path) if self.dense_engine == 'numpy' else None
+        if self.sparse_engine == 'bm25':
+            snapshot = IndexSnapshot(version, collection, bm25=BM25Index(self.bm25_path), dense=dense,
+                                     chroma_system=chroma_system)
+        else:
+            snapshot = IndexSnapshot(version, collection, ix=open_dir(whoosh_directory(generation, self.whoosh_path)),
+                                     dense=dense, chroma_system=chroma_system)
+            with snapshot.searcher():
+                pass
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self._opens += 1
+            self._open_ms_total += elapsed_ms
+        return snapshot
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._last_check < self.check_interval:
+            return
+        # Only one thread checks and opens; the others keep using the current
+        # snapshot instead of waiting, unless there is nothing to serve yet.
+        if not self._refresh_lock.acquire(blocking=self._snapshot is None):
+            return
+        try:
+            if self._snapshot is not None and now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+            version = read_kb_version()
+            if self._snapshot is not None and version == self._snapshot.version:
+                return
+            try:
+                new_snapshot = self._open_snapshot(version)
+            except Exception as e:
+                if self._snapshot is None:
+                    raise
+                # A rebuild may still be in progress; keep serving the old generation.
+                print(f"Failed to open KB version {version}, keeping current indices: {e}")
+                return
+            with self._swap_lock:
+                old_snapshot, self._snapshot = self._snapshot, new_snapshot
+            if old_snapshot is not None:
+                print(f"Retrieval engine swapped to KB version {version}")
+                old_snapshot.retire()
+        finally:
+            self._refresh_lock.release()
+
+    def pin(self) -> IndexSnapshot:
+        """
+        Returns the current IndexSnapshot and keeps it open until release()
+        is called. Use acquire() unless the pin has to outlive a single block,
+        e.g. when index work is handed off to other threads.
+        """
+        self._maybe_refresh()
+        with self._swap_lock:
+            snapshot = self._snapshot
+            snapshot._incref()
+        with self._stats_lock:
+            self._acquisitions += 1
+        return snapshot
+
+    def current_version(self) -> str:
+        """
+        Returns the KB version queries are currently served from.
+        """
+        self._maybe_refresh()
+        return self._snapshot.version
+
+    def release(self, snapshot: IndexSnapshot):
+        snapshot._decref()
+
+    @contextmanager
+    def acquire(self):
+        """
+        Yields the current IndexSnapshot, pinned for the duration of the block.
+        """
+        snapshot = self.pin()
+        try:
+            yield snapshot
+        finally:
+            self.release(snapshot)
+
+    @contextmanager
+    def _pinned(self, snapshot=None):
+        # Lets callers run several index operations for one query against a
+        # single acquisition (and a single KB version).
+        if snapshot is not None:
+            yield snapshot
+        else:
+            with self.acquire() as acquired:
+                yield acquired
+
+    def query_dense(self, query_embedding, n_results=10, snapshot=None, where=None) -> list:
+        return self.query_dense_batch([query_embedding], n_results, snapshot, where)[0]
+
+    def query_dense_batch(self, query_embeddings, n_results=10, snapshot=None, where=None) -> list:
+        """
+        Dense search for several query vectors at once; returns one id list
+        per query. `where` is a Chroma metadata filter.
+        """
+        kwargs = {"where": where} if where else {}
+        with self._pinned(snapshot) as pinned:
+            results = pinned.dense.query(
+                query_embeddings=list(query_embeddings),
+                n_results=n_results,
+                **kwargs
+            )
+        return results['ids']
+
+    def search_sparse(self, query: str, n_results=10, snapshot=None, where=None) -> list:
+        with self._pinned(snapshot) as pinned:
+            if pinned.bm25 is not None:
+                return pinned.bm25.search(query, n_results, where=where)
+            parsed_query = pinned.query_parser.parse(query)
+            with pinned.searcher() as searcher:
+                hits = searcher.search(parsed_query, limit=n_results, filter=_whoosh_filter(where))
+                return [{"id": hit['id'], "score": hit.score} for hit in hits]
+
+    def get_documents(self, ids: list, snapshot=None) -> list:
+        """
+        Returns the chunk texts in the order of `ids` (Chroma returns them in
+        storage order), with None for ids that no longer exist.
+        """
+        if not ids:
+            return []
+        with self._pinned(snapshot) as pinned:
+            retrieved_docs = pinned.collection.get(ids=ids, include=["documents"])
+        by_id = dict(zip(retrieved_docs.get('ids', []), retrieved_docs.get('documents', [])))
+        return [by_id.get(doc_id) for doc_id in ids]
+
+    def stats(self) -> dict:
+        """
+        Reports how much index-open time the warm handles avoided. Every
+        acquisition stands in for one get_db_clients() call, which used to
+        pay a full reopen.
+        """
+        with self._stats_lock:
+            avg_open_ms = self._open_ms_total / self._opens if self._opens else 0.0
+            saved_ms = self._acquisitions * avg_open_ms - self._open_ms_total
+            return {
+                "kb_version": self._snapshot.version if self._snapshot else None,
+                "sparse_engine": self.sparse_engine,
+                "dense_engine": self.dense_engine,
+                "index_opens": self._opens,
+                "avg_open_ms": round(avg_open_ms, 3),
+                "acquisitions": self._acquisitions,
+                "saved_ms_total": round(max(saved_ms, 0.0), 3),
+                "saved_ms_per_acquisition": round(
+                    max(saved_ms, 0.0) / self._acquisitions if self._acquisitions else 0.0, 3
+                ),
+            }
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine() -> RetrievalEngine:
+    """
+    Returns the process-wide retrieval engine, creating it on first use.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = RetrievalEngine()
+    return _engine
@@ -0,0 +1,160 @@
+# telecom_agent/src/session_store.py
+import threading
+import time
+from collections import OrderedDict, deque
+
+from config import (
+    SESSION_BACKEND, REDIS_URL, SESSION_IDLE_TTL, MAX_SESSIONS
+)
+
+class SessionBackend:
+    """
+    Interface for conversation history storage. History is a tuple of
+    "User: ..." / "Agent: ..." lines, oldest first.
+    """
+    def get_history(self, session_id: str) -> tuple:
+        raise NotImplementedError
+
+    def append_turn(self, session_id: str, user_query: str, agent_response: str):
+        raise NotImplementedError
+
+    def clear(self, session_id: str):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+class _Session:
+    __slots__ = ("lines", "history", "last_access")
+
+    def __init__(self, max_lines):
+        self.lines = deque(maxlen=max_lines)
+        self.history = ()  # snapshot of lines, None until rebuilt after an append
+        self.last_access = time.monotonic()
+
+class InMemorySessionBackend(SessionBackend):
+    """
+    Process-local store with idle-TTL expiry and an LRU cap on the number of
+    sessions. Appends go straight onto each session's capped deque; reads
+    return an immutable snapshot of it, rebuilt only on the first read after
+    a change, so repeated reads do not copy.
+    """
+    def __init__(self, max_lines, idle_ttl=SESSION_IDLE_TTL, max_sessions=MAX_SESSIONS):
+        self.max_lines = max_lines
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # least recently used first
+        self._lock = threading.Lock()
+        self._expired = 0
+        self._evicted = 0
+
+    def _expire_idle(self, now):
+        # Sessions are kept in access order, so expired ones are at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access <= self.idle_ttl:
+                break
+            del self._sessions[session_id]
+            self._expired += 1
+
+    def _touch(self, session_id, now, create):
+        session = self._sessions.get(session_id)
+        if session is not None and now - session.last_access > self.idle_ttl:
+            del self._sessions[session_id]
+            self._expired += 1
+            session = None
+        if session is None:
+            if not create:
+                return None
+            session = _Session(self.max_lines)
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._evicted += 1
+        else:
+            self._sessions.move_to_end(session_id)
+        session.last_access = now
+        return session
+
+    def get_history(self, session_id: str) -> tuple:
+        with self._lock:
+            session = self._touch(session_id, time.monotonic(), create=False)
+            if session is None:
+                return ()
+            if session.history is None:
+                session.history = tuple(session.lines)
+            return session.history
+
+    def append_turn(self, session_id: str, user_query: str, agent_response: str):
+        now = time.monotonic()
+        with self._lock:
+            self._expire_idle(now)
+            session = self._touch(session_id, now, create=True)
+            session.lines.append(f"User: {user_query}")
+            session.lines.append(f"Agent: {agent_response}")
+            session.history = None
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "expired": self._expired,
+                "evicted": self._evicted,
+            }
+
+class RedisSessionBackend(SessionBackend):
+    """
+    Stores each session as a capped Redis list so several agent workers can
+    share conversation state. Every access refreshes the key's TTL, which
+    gives the same idle expiry as the in-memory backend; the session count
+    cap is left to the server's maxmemory-policy (e.g. allkeys-lru).
+    `client` can be any object speaking the redis-py command API, such as
+    fakeredis.FakeRedis for local testing.
+    """
+    def __init__(self, max_lines, client=None, url=REDIS_URL, idle_ttl=SESSION_IDLE_TTL,
+                 key_prefix="telecom_agent:session:"):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.max_lines = max_lines
+        self.idle_ttl = idle_ttl
+        self.key_prefix = key_prefix
+
+    def _key(self, session_id):
+        return f"{self.key_prefix}{session_id}"
+
+    def get_history(self, session_id: str) -> tuple:
+        key = self._key(session_id)
+        pipe = self.client.pipeline()
+        pipe.lrange(key, 0, -1)
+        pipe.expire(key, self.idle_ttl)
+        lines, _ = pipe.execute()
+        return tuple(line.decode("utf-8") if isinstance(line, bytes) else line for line in lines)
+
+    def append_turn(self, session_id: str, user_query: str, agent_response: str):
+        key = self._key(session_id)
+        pipe = self.client.pipeline()
+        pipe.rpush(key, f"User: {user_query}", f"Agent: {agent_response}")
+        pipe.ltrim(key, -self.max_lines, -1)
+        pipe.expire(key, self.idle_ttl)
+        pipe.execute()
+
+    def clear(self, session_id: str):
+        self.client.delete(self._key(session_id))
+
+    def stats(self) -> dict:
+        return {"backend": "redis"}
+
+def create_session_backend(max_lines, name=SESSION_BACKEND) -> SessionBackend:
+    if name == 'memory':
+        return InMemorySessionBackend(max_lines)
+    elif name == 'redis':
+        return RedisSessionBackend(max_lines)
+    else:
+        raise ValueError(f"Invalid SESSION_BACKEND: {name}")
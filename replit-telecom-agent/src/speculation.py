@@ -0,0 +1,152 @@
+# telecom_agent/src/speculation.py
+import threading
+import time
+from collections import OrderedDict
+from difflib import SequenceMatcher
+
+from config import SPECULATION_SIMILARITY, SPECULATION_TTL, SPECULATION_MAX_SESSIONS
+from embeddings import normalize_query
+from hybrid_retriever import get_hybrid_retriever
+from device_matcher import get_device_matcher
+
+def transcript_similarity(a: str, b: str) -> float:
+    """
+    Word-level similarity of two transcripts in [0, 1]. An interim
+    hypothesis that the final only extends by a word or two scores high.
+    """
+    words_a = normalize_query(a).split()
+    words_b = normalize_query(b).split()
+    if not words_a or not words_b:
+        return 0.0
+    return SequenceMatcher(None, words_a, words_b, autojunk=False).ratio()
+
+class SpeculativeRetriever:
+    """
+    Starts hybrid retrieval on stable interim transcripts, before the caller
+    has finished speaking. One speculation is kept per session: a newer
+    interim replaces it only if the text changed materially. When the final
+    transcript arrives, take() reuses the speculative results if it names the
+    same devices as the interim (so retrieval was filtered the same way) and
+    is similar enough, and cancels them otherwise. Extensions are held to the
+    same threshold: one more word after a long interim passes, but "my phone"
+    does not cover "my phone keeps dropping calls".
+    """
+    def __init__(self, retriever=None, similarity=SPECULATION_SIMILARITY, ttl=SPECULATION_TTL,
+                 max_sessions=SPECULATION_MAX_SESSIONS, device_matcher=None):
+        self.retriever = retriever or get_hybrid_retriever()
+        # None means the process-wide matcher, looked up per use so it
+        # follows KB re-ingestion
+        self.device_matcher = device_matcher
+        self.similarity = similarity
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._speculations = OrderedDict()  # session_id -> {"text", "future", "started", "finished"}
+        self._stats = {"speculations": 0, "skipped": 0, "hits": 0, "misses": 0, "expired": 0,
+                       "device_mismatches": 0, "latency_saved_ms": 0.0}
+
+    def _covers(self, speculated: str, text: str):
+        """
+        Returns (covered, reason): whether results retrieved for `speculated`
+        serve `text`. Texts naming different devices never do, however
+        similar ("my pixel 2" against "my pixel 2 xl").
+        """
+        matcher = self.device_matcher or get_device_matcher()
+        if matcher.device_scope(speculated) != matcher.device_scope(text):
+            return False, "devices"
+        score = transcript_similarity(speculated, text)
+        return score >= self.similarity, f"{score:.2f}"
+
+    def _discard(self, speculation):
+        speculation["future"].cancel()
+
+    def speculate(self, session_id: str, text: str) -> bool:
+        """
+        Starts retrieval for an interim transcript. Returns False when the
+        running speculation already covers this text.
+        """
+        if not normalize_query(text):
+            return False
+        with self._lock:
+            current = self._speculations.get(session_id)
+            if current is not None and self._covers(current["text"], text)[0]:
+                self._stats["skipped"] += 1
+                return False
+            if current is not None:
+                self._discard(current)
+            speculation = {"text": text, "started": time.perf_counter(), "finished": None}
+            speculation["future"] = self.retriever.submit(text)
+            speculation["future"].add_done_callback(
+                lambda _, speculation=speculation: speculation.__setitem__("finished", time.perf_counter())
+            )
+            self._speculations[session_id] = speculation
+            self._speculations.move_to_end(session_id)
+            self._stats["speculations"] += 1
+            while len(self._speculations) > self.max_sessions:
+                _, evicted = self._speculations.popitem(last=False)
+                self._discard(evicted)
+        return True
+
+    def take(self, session_id: str, final_text: str):
+        """
+        Returns retrieval results speculated for `final_text`, or None if
+        there is no usable speculation (the caller then retrieves normally).
+        """
+        with self._lock:
+            speculation = self._speculations.pop(session_id, None)
+        if speculation is None:
+            return None
+        now = time.perf_counter()
+        if now - speculation["started"] > self.ttl:
+            self._discard(speculation)
+            with self._lock:
+                self._stats["expired"] += 1
+            return None
+        covered, reason = self._covers(speculation["text"], final_text)
+        if not covered:
+            self._discard(speculation)
+            with self._lock:
+                self._stats["misses"] += 1
+                if reason == "devices":
+                    self._stats["device_mismatches"] += 1
+            print(f"Speculation miss ({reason}): '{speculation['text']}' vs '{final_text}'")
+            return None
+        try:
+            results = speculation["future"].result()
+        except Exception as e:
+            print(f"Speculative retrieval failed: {e}")
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        # Retrieval work done before the final transcript arrived is latency
+        # the caller no longer waits for
+        finished = speculation["finished"]
+        saved = (min(finished, now) if finished else now) - speculation["started"]
+        with self._lock:
+            self._stats["hits"] += 1
+            self._stats["latency_saved_ms"] += saved * 1000
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._speculations)
+        decided = stats["hits"] + stats["misses"] + stats["expired"]
+        stats["hit_rate"] = round(stats["hits"] / decided, 3) if decided else 0.0
+        stats["avg_latency_saved_ms"] = round(stats["latency_saved_ms"] / stats["hits"], 3) if stats["hits"] else 0.0
+        stats["latency_saved_ms"] = round(stats["latency_saved_ms"], 3)
+        return stats
+
+_speculator = None
+_speculator_lock = threading.Lock()
+
+def get_speculator() -> SpeculativeRetriever:
+    """
+    Returns the process-wide speculative retriever.
+    """
+    global _speculator
+    if _speculator is None:
+        with _speculator_lock:
+            if _speculator is None:
+                _speculator = SpeculativeRetriever()
+    return _speculator
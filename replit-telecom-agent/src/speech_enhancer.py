@@ -31,3 +31,72 @@ def filter_for_tts(text: str) -> str:
     text = re.sub(r'\s+', ' ', text).strip()
     
     return text
+
+# Words whose trailing period does not end a sentence
+_NON_TERMINAL_ABBREVIATIONS = {"e.g", "i.e", "etc", "vs", "approx", "mr", "mrs", "ms", "dr", "st", "no"}
+_SENTENCE_END = re.compile(r'[.!?]+["\')\]]*(?=\s)')
+_CLAUSE_END = re.compile(r'[,;:](?=\s)')
+
+class PhraseStreamer:
+    """
+    Incremental counterpart of filter_for_tts for streamed LLM output.
+    Text deltas are buffered until a sentence boundary (or a clause boundary
+    once the phrase is long enough to be worth speaking on its own), and each
+    completed phrase is cleaned with filter_for_tts before it is emitted.
+    A boundary is only trusted once the whitespace after it has arrived, so
+    "6." at the end of a delta is not mistaken for the end of a sentence.
+    """
+    def __init__(self, min_clause_chars=40):
+        self.min_clause_chars = min_clause_chars
+        self._buffer = ""
+
+    def _is_terminal(self, text, end):
+        # Reject list markers ("1. ") and common abbreviations ("e.g. ")
+        start = end
+        while start > 0 and not text[start - 1].isspace():
+            start -= 1
+        word = text[start:end].strip('.!?"\'()[]').lower()
+        return not (word.isdigit() or word in _NON_TERMINAL_ABBREVIATIONS)
+
+    def _next_boundary(self):
+        newline = self._buffer.find("\n")
+        for match in _SENTENCE_END.finditer(self._buffer):
+            if newline != -1 and newline < match.start():
+                break
+            if self._is_terminal(self._buffer, match.start()):
+                return match.end()
+        if newline != -1:
+            return newline + 1
+        for match in _CLAUSE_END.finditer(self._buffer):
+            if match.end() >= self.min_clause_chars:
+                return match.end()
+        return None
+
+    def _drain(self):
+        phrases = []
+        while True:
+            boundary = self._next_boundary()
+            if boundary is None:
+                return phrases
+            phrase, self._buffer = self._buffer[:boundary], self._buffer[boundary:]
+            phrase = filter_for_tts(phrase)
+            if phrase:
+                phrases.append(phrase)
+
+    def feed(self, text_delta: str) -> list:
+        """
+        Adds a chunk of raw model output and returns any phrases it completed.
+        """
+        self._buffer += text_delta
+        return self._drain()
+
+    def flush(self) -> list:
+        """
+        Returns whatever is left once the model has finished.
+        """
+        phrases = self._drain()
+        remainder = filter_for_tts(self._buffer)
+        self._buffer = ""
+        if remainder:
+            phrases.append(remainder)
+        return phrases
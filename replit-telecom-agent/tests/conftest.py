@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# Same layout the scripts use: modules import each other from src/ by name
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
@@ -0,0 +1,39 @@
+# tests/test_catalog.py
+import pytest
+
+from catalog import CatalogIndex
+
+RECORDS = [
+    {"model": "Pixel 2", "deviceSku": "G011A-64GB", "simSku": "DFILLSIM5G-SA-A", "upcCode": "842776101846",
+     "prepaidSku": "N/A", "url": "N/A"},
+    {"model": "Galaxy S20 Ultra 5G", "deviceSku": "SMG988UZKV", "simSku": "DFILLSIM5G-SA-A",
+     "upcCode": "887276396682", "prepaidSku": "N/A", "url": "N/A"},
+]
+
+@pytest.fixture
+def catalog():
+    return CatalogIndex(RECORDS)
+
+@pytest.mark.parametrize("query, expected", [
+    ("what SIM does the Pixel 2 use?", "The Pixel 2 uses SIM DFILLSIM5G-SA-A."),
+    ("which UPC is the pixel 2", "The UPC code for the Pixel 2 is 842776101846."),
+    ("pixel 2 sim sku", "The Pixel 2 uses SIM DFILLSIM5G-SA-A."),
+    ("SMG988UZKV", "SMG988UZKV is the device SKU for the Galaxy S20 Ultra 5G."),
+    ("what device is SMG988UZKV", "SMG988UZKV is the device SKU for the Galaxy S20 Ultra 5G."),
+])
+def test_lookups_take_the_fast_path(catalog, query, expected):
+    assert catalog.answer(query)["response_text"].startswith(expected)
+
+@pytest.mark.parametrize("query", [
+    "sim card not detected on pixel 2",
+    "my pixel 2 says no sim, what do I do",
+    "my SMG988UZKV keeps dropping calls, how do I fix it",
+    "SMG988UZKV won't charge",
+    "how do I insert the sim in my galaxy s20 ultra 5g",
+    "why does my pixel 2 sim keep disconnecting",
+])
+def test_troubleshooting_about_the_same_device_goes_to_rag(catalog, query):
+    assert catalog.answer(query) is None
+
+def test_model_name_without_a_field_goes_to_rag(catalog):
+    assert catalog.answer("tell me about the pixel 2") is None
@@ -0,0 +1,29 @@
+# tests/test_context_builder.py
+from context_builder import ContextBuilder
+
+WIFI = "Open Settings and tap Wi-Fi. Choose your network and enter the password."
+VOICEMAIL = "To set up voicemail, dial *86."
+
+def test_chunks_without_query_terms_are_kept():
+    # "wifi" never matches "Wi-Fi" lexically, yet it is the RRF #1 chunk
+    text, report = ContextBuilder(token_budget=500).build_articles(
+        "how do I set up wifi", ["kb_1_chunk_0", "kb_2_chunk_0"], [WIFI, VOICEMAIL])
+    assert text == WIFI.replace(". ", ".\n") + "\n\n" + VOICEMAIL
+    assert report["dropped_chunks"] == 0
+
+def test_trimmed_chunk_without_query_terms_keeps_its_opening():
+    chunk = " ".join(f"Step note number {n} about the menu." for n in range(20))
+    text, report = ContextBuilder(token_budget=30).build_articles("wifi", ["kb_1_chunk_0"], [chunk])
+    assert report == {"duplicate_units": 0, "trimmed_chunks": 1, "dropped_chunks": 0}
+    assert text.startswith("Step note number 0 about the menu.\nStep note number 1 about the menu.")
+
+def test_trimming_prefers_units_matching_the_query():
+    chunk = "Charge the phone overnight. Tap Restart to reboot the phone. Keep the box for returns."
+    text, _ = ContextBuilder(token_budget=10).build_articles("how do I restart", ["kb_1_chunk_0"], [chunk])
+    assert text == "Tap Restart to reboot the phone."
+
+def test_top_ranked_chunk_is_cut_rather_than_dropped():
+    procedure = " ".join(f"{n}. Tap the next option in the list." for n in range(1, 30))
+    text, report = ContextBuilder(token_budget=20).build_articles("restart", ["kb_1_chunk_0"], [procedure])
+    assert text.startswith("1. Tap the next option") and text.endswith(" ...")
+    assert report["dropped_chunks"] == 0
@@ -0,0 +1,50 @@
+# tests/test_device_matcher.py
+import json
+
+import pytest
+
+import device_matcher
+from device_matcher import get_device_matcher
+
+class FakeCatalog:
+    kb_metadata = [
+        {"id": "kb_1", "device": "Google Pixel 2"},
+        {"id": "kb_2", "device": "Google Pixel 2 XL"},
+    ]
+    records = [{"model": "Pixel 2"}, {"model": "Pixel 2 XL"}]
+
+class FakeEngine:
+    version = "v1"
+
+    def current_version(self):
+        return self.version
+
+@pytest.fixture
+def kb(tmp_path, monkeypatch):
+    duplicates_path = tmp_path / "duplicates.json"
+    duplicates_path.write_text("{}")
+    engine = FakeEngine()
+    monkeypatch.setattr(device_matcher, "KB_DUPLICATES_PATH", str(duplicates_path))
+    monkeypatch.setattr(device_matcher, "get_catalog", FakeCatalog)
+    monkeypatch.setattr(device_matcher, "get_engine", lambda: engine)
+    monkeypatch.setattr(device_matcher, "_matcher", None)
+    return engine, duplicates_path
+
+def test_matcher_is_rebuilt_when_the_kb_version_changes(kb):
+    engine, duplicates_path = kb
+    matcher = get_device_matcher()
+    assert matcher.where_for("reset my pixel 2 xl") == {"device": {"$in": ["Google Pixel 2 XL"]}}
+    assert get_device_matcher() is matcher
+
+    # Re-ingestion keeps the Pixel 2 chunks in place of the Pixel 2 XL's
+    duplicates_path.write_text(json.dumps({"kb_2": ["kb_1"]}))
+    assert get_device_matcher() is matcher  # same version, nothing reread
+    engine.version = "v2"
+    rebuilt = get_device_matcher()
+    assert rebuilt is not matcher
+    assert rebuilt.where_for("reset my pixel 2 xl") == {"device": {"$in": ["Google Pixel 2 XL", "Google Pixel 2"]}}
+    assert rebuilt.device_scope("reset my pixel 2 xl") == ("Google Pixel 2", "Google Pixel 2 XL")
+    stats = rebuilt.stats()
+    assert stats["kb_version"] == "v2"
+    # Counters carry over the rebuild
+    assert stats["queries"] == 2 and stats["filtered"] == 2
@@ -0,0 +1,46 @@
+# tests/test_embeddings.py
+import time
+
+import pytest
+
+from embeddings import HashingEmbeddingBackend, QueryEmbeddingCache, _DiskTier
+
+def test_disk_tier_evicts_oldest_rows_above_cap(tmp_path):
+    disk = _DiskTier(str(tmp_path / "cache.sqlite"), ttl=3600, max_rows=3)
+    for i in range(5):
+        disk.put(f"key{i}", [float(i)])
+    disk.prune()
+    assert len(disk) == 3
+    assert disk.get("key0") is None and disk.get("key1") is None
+    assert disk.get("key4") == [4.0]
+    assert disk.evictions == 2
+
+def test_disk_tier_purges_expired_rows(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    disk = _DiskTier(path, ttl=3600, max_rows=100)
+    disk.put("fresh", [1.0])
+    disk.put("stale", [2.0])
+    disk._conn.execute("UPDATE query_embeddings SET created = ? WHERE key = 'stale'", (time.time() - 7200,))
+    disk._conn.commit()
+    assert disk.get("stale") is None
+    # Reopening prunes, as a restarted worker would
+    reopened = _DiskTier(path, ttl=3600, max_rows=100)
+    assert len(reopened) == 1
+    assert reopened.expirations == 1
+
+def test_disk_tier_prunes_periodically_on_write(tmp_path):
+    disk = _DiskTier(str(tmp_path / "cache.sqlite"), ttl=3600, max_rows=10)
+    for i in range(_DiskTier._PRUNE_EVERY):
+        disk.put(f"key{i}", [0.0])
+    assert len(disk) == 10
+
+def test_query_cache_reads_disk_tier_after_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    backend = HashingEmbeddingBackend(dimension=16)
+    first = QueryEmbeddingCache(backend, disk_path=path, disk_max_rows=10)
+    vector = first.embed_query("My WiFi keeps dropping!")
+    second = QueryEmbeddingCache(backend, disk_path=path, disk_max_rows=10)
+    # The disk tier stores float32
+    assert second.embed_query("my wifi keeps dropping") == pytest.approx(vector, abs=1e-6)
+    assert second.stats()["disk_hits"] == 1
+    assert second.stats()["disk_size"] == 1
@@ -0,0 +1,64 @@
+# tests/test_hybrid_retriever.py
+import asyncio
+import time
+
+from hybrid_retriever import HybridRetriever
+
+class FakeEngine:
+    def __init__(self, dense_delay=0.0, sparse_delay=0.0):
+        self.dense_delay = dense_delay
+        self.sparse_delay = sparse_delay
+        self.pinned = 0
+
+    def pin(self):
+        self.pinned += 1
+        return object()
+
+    def release(self, snapshot):
+        self.pinned -= 1
+
+    def query_dense(self, embedding, n_results, snapshot=None, where=None):
+        time.sleep(self.dense_delay)
+        return ["dense_doc"]
+
+    def search_sparse(self, query, n_results, snapshot=None, where=None):
+        time.sleep(self.sparse_delay)
+        return [{"id": "sparse_doc", "score": 1.0}]
+
+class FakeEmbedder:
+    def embed_query(self, query):
+        return [1.0, 0.0]
+
+def _retriever(engine, leg_timeout=0.05, late_leg_timeout=0.05):
+    return HybridRetriever(engine=engine, embedder=FakeEmbedder(), leg_timeout=leg_timeout,
+                           late_leg_timeout=late_leg_timeout, device_filter=False)
+
+def test_both_legs_in_time():
+    results = asyncio.run(_retriever(FakeEngine()).aretrieve("reset my phone"))
+    assert results == {"dense": ["dense_doc"], "sparse": [{"id": "sparse_doc", "score": 1.0}]}
+
+def test_slow_leg_is_dropped_at_its_deadline():
+    retriever = _retriever(FakeEngine(dense_delay=0.5))
+    results = asyncio.run(retriever.aretrieve("reset my phone"))
+    assert results["dense"] == []
+    assert results["sparse"] == [{"id": "sparse_doc", "score": 1.0}]
+    assert retriever.stats()["deadline_fallbacks"]["dense"] == 1
+
+def test_late_leg_used_within_grace_period():
+    retriever = _retriever(FakeEngine(dense_delay=0.1, sparse_delay=1.0), late_leg_timeout=0.5)
+    results = asyncio.run(retriever.aretrieve("reset my phone"))
+    assert results["dense"] == ["dense_doc"]
+    assert results["sparse"] == []
+
+def test_both_legs_slow_returns_empty_after_bounded_wait():
+    engine = FakeEngine(dense_delay=1.0, sparse_delay=1.0)
+    retriever = _retriever(engine)
+    start = time.perf_counter()
+    results = asyncio.run(retriever.aretrieve("reset my phone"))
+    elapsed = time.perf_counter() - start
+    assert results == {"dense": [], "sparse": []}
+    assert elapsed < 0.5
+    assert retriever.stats()["no_leg_in_time"] == 1
+    # The snapshot pin is released once the abandoned legs finish
+    time.sleep(1.2)
+    assert engine.pinned == 0
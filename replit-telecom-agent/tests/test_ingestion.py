@@ -0,0 +1,54 @@
+# tests/test_ingestion.py
+import pytest
+
+import ingestion
+
+DOCUMENTS = {
+    "kb_1.txt": "To restart your Pixel 2, press and hold the Power button. Then tap Restart on the screen.",
+    "kb_2.txt": "To restart your Pixel 2 XL, press and hold the Power button. Then tap Restart on the screen.",
+    "kb_3.txt": "To set up voicemail, dial *86 and follow the prompts.",
+}
+
+@pytest.fixture
+def knowledge_base(tmp_path, monkeypatch):
+    for filename, content in DOCUMENTS.items():
+        (tmp_path / filename).write_text(content)
+    monkeypatch.setattr(ingestion, "KB_DOCUMENTS_PATH", str(tmp_path))
+    monkeypatch.setattr(ingestion, "INGEST_CHUNK_WORKERS", 1)
+    monkeypatch.setattr(ingestion, "CHUNK_DEDUP_ENABLED", True)
+    monkeypatch.setattr(ingestion, "CHUNK_DEDUP_THRESHOLD", 0.5)
+    return tmp_path
+
+def test_scan_keeps_no_chunk_text(knowledge_base):
+    documents = ingestion.scan_documents({})
+    assert [document["doc_id"] for document in documents] == ["kb_1", "kb_2", "kb_3"]
+    assert all("chunks" not in document for document in documents)
+    duplicates = ingestion.find_duplicate_chunks(documents)
+    assert duplicates == {("kb_2", 0): ("kb_1", 0)}
+    # Signatures are dropped once deduplication is done
+    assert all("signatures" not in document for document in documents)
+
+def test_indexing_pass_reads_only_documents_to_embed(knowledge_base, monkeypatch):
+    documents = ingestion.scan_documents({})
+    duplicates = ingestion.find_duplicate_chunks(documents)
+    work = list(ingestion.iter_document_work({"documents": {}}, {}, documents, duplicates))
+    assert [chunk_text for w in work for _, chunk_text, _, _ in w["embed"]] == [
+        DOCUMENTS["kb_1.txt"], DOCUMENTS["kb_3.txt"]
+    ]
+    assert work[0]["embed"][0][2]["duplicate_sources"] == "kb_2"
+    manifest = {"documents": {w["doc_id"]: w["entry"] for w in work}}
+
+    # Nothing changed: no document is read again
+    reads = []
+    read_document = ingestion._read_document
+    monkeypatch.setattr(ingestion, "_read_document", lambda filename: reads.append(filename) or read_document(filename))
+    assert list(ingestion.iter_document_work(manifest, {}, documents, duplicates)) == []
+    assert reads == []
+
+    # Only the edited document is read and re-chunked
+    (knowledge_base / "kb_3.txt").write_text("To set up voicemail, dial *86. Choose a PIN.")
+    documents = ingestion.scan_documents({})
+    reads.clear()
+    work = list(ingestion.iter_document_work(manifest, {}, documents, ingestion.find_duplicate_chunks(documents)))
+    assert reads == ["kb_3.txt"]
+    assert [w["embed"][0][1] for w in work] == ["To set up voicemail, dial *86. Choose a PIN."]
@@ -0,0 +1,33 @@
+# tests/test_kb_version.py
+import pytest
+
+import kb_version
+from kb_version import (
+    LEGACY_GENERATION, new_kb_generation, publish_kb_generation, read_kb_generation, read_previous_kb_generation
+)
+
+@pytest.fixture(autouse=True)
+def generation_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(kb_version, "KB_GENERATION_FILE", str(tmp_path / "kb_generation.json"))
+
+def test_without_pointer_the_legacy_indices_are_live():
+    assert read_kb_generation() == LEGACY_GENERATION
+    assert read_previous_kb_generation() is None
+
+def test_publish_keeps_previous_and_retires_the_one_before():
+    first, second, third = new_kb_generation(), new_kb_generation(), new_kb_generation()
+    assert first != second
+    assert publish_kb_generation(first) is None
+    assert read_kb_generation() == first
+    assert read_previous_kb_generation() == LEGACY_GENERATION
+    # The legacy indices were previous and are now retired
+    assert publish_kb_generation(second) == LEGACY_GENERATION
+    assert publish_kb_generation(third) == first
+    assert read_kb_generation() == third
+    assert read_previous_kb_generation() == second
+
+def test_publishing_the_live_generation_is_a_no_op():
+    generation = new_kb_generation()
+    publish_kb_generation(generation)
+    assert publish_kb_generation(dict(generation)) is None
+    assert read_previous_kb_generation() == LEGACY_GENERATION
@@ -0,0 +1,156 @@
+# tests/test_rag_pipeline.py
+import pytest
+
+import rag_pipeline
+from answer_cache import SemanticAnswerCache
+from embeddings import HashingEmbeddingBackend
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+class FakeStreamingModel:
+    """Streams a fixed answer in `step`-character deltas."""
+    def __init__(self, answer, step=4):
+        self.answer = answer
+        self.step = step
+        self.prompts = []
+
+    def generate_content(self, prompt, stream=False):
+        assert stream
+        self.prompts.append(prompt)
+        for start in range(0, len(self.answer), self.step):
+            yield _Chunk(self.answer[start:start + self.step])
+
+class FakeCatalog:
+    def answer(self, query):
+        return None
+
+class FakeEngine:
+    documents = {
+        "kb_1_chunk_0": "To restart your Pixel 2, press and hold the Power button. Tap Restart.",
+    }
+
+    def current_version(self):
+        return "v1"
+
+    def get_documents(self, ids):
+        return [self.documents.get(doc_id) for doc_id in ids]
+
+class FakeDeviceMatcher:
+    devices = ("Google Pixel 2", "Samsung Galaxy S20")
+
+    def device_scope(self, text):
+        return tuple(sorted(device for device in self.devices if device.lower() in text.lower()))
+
+RETRIEVAL = {"dense": ["kb_1_chunk_0"], "sparse": [{"id": "kb_1_chunk_0", "score": 1.0}]}
+ANSWER = "Press and hold the Power button. Then tap Restart, e.g. from the menu."
+
+@pytest.fixture
+def answer_cache(monkeypatch):
+    cache = SemanticAnswerCache(max_entries=8)
+    embedder = HashingEmbeddingBackend(dimension=64)
+    monkeypatch.setattr(rag_pipeline, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr(rag_pipeline, "get_catalog", FakeCatalog)
+    monkeypatch.setattr(rag_pipeline, "get_engine", FakeEngine)
+    monkeypatch.setattr(rag_pipeline, "get_device_matcher", FakeDeviceMatcher)
+    monkeypatch.setattr(rag_pipeline, "get_query_embedder", lambda: embedder)
+    monkeypatch.setattr(rag_pipeline, "get_answer_cache", lambda: cache)
+    return cache
+
+def test_stream_yields_phrases_and_reports_completion(answer_cache):
+    completed = []
+    model = FakeStreamingModel(ANSWER)
+    result = rag_pipeline.agent_pipeline_stream("how do I restart my phone", [], on_complete=completed.append,
+                                                model=model, retrieval_results=RETRIEVAL)
+    assert result["retrieved_doc_ids"] == ["kb_1_chunk_0"]
+    # Nothing is reported complete until the caller has consumed the phrases
+    assert completed == []
+    assert list(result["phrases"]) == ["Press and hold the Power button.", "Then tap Restart, e.g. from the menu."]
+    assert completed == [ANSWER]
+    assert "press and hold the Power button" in model.prompts[0]
+
+def test_stream_stores_answer_on_completion(answer_cache):
+    model = FakeStreamingModel(ANSWER)
+    result = rag_pipeline.agent_pipeline_stream("how do I restart my phone", [], model=model,
+                                                retrieval_results=RETRIEVAL)
+    phrases = result["phrases"]
+    next(phrases)
+    assert answer_cache.stats()["size"] == 0
+    list(phrases)
+    assert answer_cache.stats()["size"] == 1
+
+    # The same question is then answered from the cache without the model
+    completed = []
+    repeat = rag_pipeline.agent_pipeline_stream("How do I restart my phone?", [], on_complete=completed.append,
+                                                model=FakeStreamingModel("unused"), retrieval_results=RETRIEVAL)
+    assert list(repeat["phrases"]) == ["Press and hold the Power button.", "Then tap Restart, e.g. from the menu."]
+    assert completed == [ANSWER]
+    assert answer_cache.stats()["hits"] == 1
+
+def test_follow_up_questions_bypass_the_cache(answer_cache):
+    list(rag_pipeline.agent_pipeline_stream("how do I restart my phone", [], model=FakeStreamingModel(ANSWER),
+                                            retrieval_results=RETRIEVAL)["phrases"])
+    history = ["User: my screen is frozen", "Agent: Let's try a restart."]
+    model = FakeStreamingModel("Hold the Power button for 30 seconds.")
+    follow_up = rag_pipeline.agent_pipeline_stream("how do I restart my phone", history, model=model,
+                                                   retrieval_results=RETRIEVAL)
+    assert list(follow_up["phrases"]) == ["Hold the Power button for 30 seconds."]
+    assert len(model.prompts) == 1
+    # Neither looked up nor stored
+    assert answer_cache.stats()["hits"] == 0
+    assert answer_cache.stats()["size"] == 1
+
+def test_answers_are_not_reused_across_devices(answer_cache):
+    # Low enough that the two questions would otherwise match
+    answer_cache.threshold = 0.5
+    list(rag_pipeline.agent_pipeline_stream("how do I restart my Google Pixel 2", [],
+                                            model=FakeStreamingModel(ANSWER), retrieval_results=RETRIEVAL)["phrases"])
+    model = FakeStreamingModel("Press the Side key and Volume down.")
+    other = rag_pipeline.agent_pipeline_stream("How do I restart my Samsung Galaxy S20?", [], model=model,
+                                               retrieval_results=RETRIEVAL)
+    assert list(other["phrases"]) == ["Press the Side key and Volume down."]
+    assert answer_cache.stats()["hits"] == 0
+    assert answer_cache.stats()["device_mismatches"] == 1
+
+def test_cache_lookup_requires_the_same_device_scope():
+    cache = SemanticAnswerCache(max_entries=4, threshold=0.9)
+    vector = [1.0, 0.0, 0.0]
+    cache.store("restart my pixel 2", vector, "Pixel answer", ["kb_1_chunk_0"], "v1", ("Google Pixel 2",))
+    entry, _ = cache.lookup(vector, "v1", ("Samsung Galaxy S20",))
+    assert entry is None
+    entry, _ = cache.lookup(vector, "v1")
+    assert entry is None
+    # A slightly less similar entry with the right devices still wins
+    cache.store("restart my galaxy s20", [0.98, 0.2, 0.0], "Galaxy answer", ["kb_2_chunk_0"], "v1",
+                ("Samsung Galaxy S20",))
+    entry, similarity = cache.lookup(vector, "v1", ("Samsung Galaxy S20",))
+    assert entry["response_text"] == "Galaxy answer"
+    assert 0.9 <= similarity < 1.0
+    assert cache.stats()["device_mismatches"] == 2
+
+def test_stale_store_after_a_swap_keeps_the_new_entries():
+    cache = SemanticAnswerCache(max_entries=4, threshold=0.9)
+    old, new = "1700000000000000000-aaaaaaaa", "1700000000500000000-bbbbbbbb"
+    cache.store("restart my phone", [1.0, 0.0, 0.0], "Old answer", ["kb_1_chunk_0"], old)
+    # The hot-swap: the first request on the new snapshot resets the cache
+    cache.store("reset my phone", [0.0, 1.0, 0.0], "New answer", ["kb_1_chunk_1"], new)
+    assert cache.stats()["invalidations"] == 1
+    # A request that started on the old snapshot finishes afterwards
+    cache.store("set up wifi", [0.0, 0.0, 1.0], "Stale answer", ["kb_2_chunk_0"], old)
+    entry, _ = cache.lookup([0.0, 0.0, 1.0], old)
+    assert entry is None
+    stats = cache.stats()
+    assert stats["size"] == 1 and stats["kb_version"] == new
+    assert stats["stale_requests"] == 2 and stats["invalidations"] == 1
+    entry, _ = cache.lookup([0.0, 1.0, 0.0], new)
+    assert entry["response_text"] == "New answer"
+
+def test_embedding_width_change_starts_the_cache_over():
+    cache = SemanticAnswerCache(max_entries=4, threshold=0.9)
+    cache.store("restart my phone", [1.0, 0.0, 0.0], "Answer", ["kb_1_chunk_0"], "v1")
+    assert cache.lookup([1.0, 0.0], "v1") == (None, 0.0)
+    cache.store("restart my phone", [1.0, 0.0], "Answer", ["kb_1_chunk_0"], "v1")
+    entry, _ = cache.lookup([1.0, 0.0], "v1")
+    assert entry["response_text"] == "Answer"
+    assert cache.stats()["size"] == 1
@@ -0,0 +1,61 @@
+# tests/test_retrieval_engine.py
+import chromadb
+import pytest
+from chromadb.api.client import SharedSystemClient
+from whoosh.fields import Schema, TEXT, ID
+from whoosh.index import create_in
+
+import kb_version
+import retrieval_engine
+from retrieval_engine import RetrievalEngine
+
+@pytest.fixture
+def version(monkeypatch):
+    version = {"current": "v1"}
+    monkeypatch.setattr(retrieval_engine, "read_kb_version", lambda: version["current"])
+    return version
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch, version):
+    monkeypatch.setenv("ANONYMIZED_TELEMETRY", "False")
+    monkeypatch.setattr(kb_version, "KB_GENERATION_FILE", str(tmp_path / "kb_generation.json"))
+
+    chroma_path = str(tmp_path / "chroma")
+    collection = chromadb.PersistentClient(path=chroma_path).create_collection("telecom_kb")
+    collection.add(ids=["kb_1_chunk_0"], documents=["Tap Restart."], embeddings=[[1.0, 0.0]])
+    whoosh_path = tmp_path / "whoosh"
+    whoosh_path.mkdir()
+    writer = create_in(str(whoosh_path), Schema(id=ID(stored=True, unique=True), content=TEXT)).writer()
+    writer.add_document(id="kb_1_chunk_0", content="Tap Restart.")
+    writer.commit()
+    SharedSystemClient.clear_system_cache()
+
+    engine = RetrievalEngine(chroma_path=chroma_path, whoosh_path=str(whoosh_path), check_interval=0,
+                             sparse_engine="whoosh", dense_engine="chroma")
+    yield engine
+    SharedSystemClient.clear_system_cache()
+
+def test_swap_stops_the_old_chroma_system_once_released(engine, version):
+    old = engine.pin()
+    assert old.chroma_system._running
+
+    version["current"] = "v2"
+    new = engine.pin()
+    assert new is not old and new.chroma_system is not old.chroma_system
+    # Still pinned by an in-flight query
+    assert old.chroma_system._running
+    assert engine.get_documents(["kb_1_chunk_0"], snapshot=old) == ["Tap Restart."]
+
+    engine.release(old)
+    assert not old.chroma_system._running
+    assert new.chroma_system._running
+    assert engine.get_documents(["kb_1_chunk_0"], snapshot=new) == ["Tap Restart."]
+    assert engine.search_sparse("restart", snapshot=new)[0]["id"] == "kb_1_chunk_0"
+    engine.release(new)
+
+def test_unpinned_snapshot_is_stopped_at_the_swap(engine, version):
+    old = engine.pin()
+    engine.release(old)
+    version["current"] = "v2"
+    engine.get_documents(["kb_1_chunk_0"])
+    assert not old.chroma_system._running
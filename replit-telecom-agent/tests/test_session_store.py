@@ -0,0 +1,99 @@
+# tests/test_session_store.py
+import time
+
+import pytest
+
+import session_store
+from session_store import InMemorySessionBackend, RedisSessionBackend
+
+fakeredis = pytest.importorskip("fakeredis")
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(session_store.time, "monotonic", clock.monotonic)
+    return clock
+
+# --- In-memory backend ---
+
+def test_memory_history_is_trimmed_to_max_lines():
+    store = InMemorySessionBackend(max_lines=4)
+    for turn in range(3):
+        store.append_turn("s1", f"q{turn}", f"a{turn}")
+    assert store.get_history("s1") == ("User: q1", "Agent: a1", "User: q2", "Agent: a2")
+
+def test_memory_snapshot_is_reused_until_the_next_append():
+    store = InMemorySessionBackend(max_lines=4)
+    store.append_turn("s1", "q0", "a0")
+    first = store.get_history("s1")
+    assert store.get_history("s1") is first
+    store.append_turn("s1", "q1", "a1")
+    assert first == ("User: q0", "Agent: a0")
+    assert store.get_history("s1") == ("User: q0", "Agent: a0", "User: q1", "Agent: a1")
+
+def test_memory_idle_sessions_expire(clock):
+    store = InMemorySessionBackend(max_lines=4, idle_ttl=60)
+    store.append_turn("s1", "q0", "a0")
+    clock.now += 30
+    assert store.get_history("s1")  # reading refreshes the idle timer
+    clock.now += 59
+    assert store.get_history("s1")
+    clock.now += 61
+    assert store.get_history("s1") == ()
+    assert store.stats()["expired"] == 1
+
+def test_memory_least_recently_used_session_is_evicted():
+    store = InMemorySessionBackend(max_lines=4, max_sessions=2)
+    store.append_turn("s1", "q", "a")
+    store.append_turn("s2", "q", "a")
+    store.get_history("s1")
+    store.append_turn("s3", "q", "a")
+    assert store.get_history("s2") == ()
+    assert store.get_history("s1") and store.get_history("s3")
+    assert store.stats()["evicted"] == 1
+
+# --- Redis backend ---
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+def make_worker(server, **kwargs):
+    # Each worker has its own connection to the shared server
+    return RedisSessionBackend(max_lines=4, client=fakeredis.FakeRedis(server=server), **kwargs)
+
+def test_redis_history_is_shared_across_workers(server):
+    first, second = make_worker(server), make_worker(server)
+    first.append_turn("s1", "how do I restart", "Hold the Power button.")
+    assert second.get_history("s1") == ("User: how do I restart", "Agent: Hold the Power button.")
+    second.append_turn("s1", "thanks", "You're welcome.")
+    assert len(first.get_history("s1")) == 4
+    first.clear("s1")
+    assert second.get_history("s1") == ()
+
+def test_redis_history_is_trimmed_to_max_lines(server):
+    store = make_worker(server)
+    for turn in range(3):
+        store.append_turn("s1", f"q{turn}", f"a{turn}")
+    assert store.get_history("s1") == ("User: q1", "Agent: a1", "User: q2", "Agent: a2")
+
+def test_redis_every_access_refreshes_the_idle_ttl(server):
+    store = make_worker(server, idle_ttl=60)
+    client = store.client
+    key = store._key("s1")
+    store.append_turn("s1", "q0", "a0")
+    assert 0 < client.ttl(key) <= 60
+    client.expire(key, 5)
+    store.get_history("s1")
+    assert client.ttl(key) > 5
+    # Once the key expires the session is gone for every worker
+    client.pexpire(key, 1)
+    time.sleep(0.01)
+    assert make_worker(server).get_history("s1") == ()
@@ -0,0 +1,72 @@
+# tests/test_speculation.py
+from concurrent.futures import Future
+
+from speculation import SpeculativeRetriever
+
+class FakeRetriever:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, query):
+        self.submitted.append(query)
+        future = Future()
+        future.set_result({"dense": [f"results for {query}"], "sparse": []})
+        return future
+
+class FakeDeviceMatcher:
+    # Longest names first, as the real matcher prefers the longest mention
+    devices = ("Google Pixel 2 XL", "Google Pixel 2")
+
+    def device_scope(self, text):
+        for device in self.devices:
+            if device.lower() in text.lower():
+                return (device,)
+        return ()
+
+def make_speculator():
+    retriever = FakeRetriever()
+    return SpeculativeRetriever(retriever=retriever, device_matcher=FakeDeviceMatcher()), retriever
+
+def test_similar_final_with_the_same_devices_reuses_results():
+    speculator, _ = make_speculator()
+    speculator.speculate("s1", "how do I reset my Google Pixel 2 to factory settings")
+    results = speculator.take("s1", "how do I reset my Google Pixel 2 to factory settings now")
+    assert results["dense"] == ["results for how do I reset my Google Pixel 2 to factory settings"]
+    assert speculator.stats()["hits"] == 1
+
+def test_final_naming_another_device_is_not_reused():
+    speculator, _ = make_speculator()
+    # Word-level similarity is above the threshold, but retrieval for the
+    # interim was filtered to the wrong device
+    speculator.speculate("s1", "how do I reset my Google Pixel 2 to factory settings")
+    assert speculator.take("s1", "how do I reset my Google Pixel 2 XL to factory settings") is None
+    stats = speculator.stats()
+    assert stats["misses"] == 1 and stats["device_mismatches"] == 1
+
+def test_short_interim_does_not_cover_a_much_longer_final():
+    speculator, _ = make_speculator()
+    speculator.speculate("s1", "my phone")
+    assert speculator.take("s1", "my phone keeps dropping calls") is None
+    assert speculator.stats()["misses"] == 1
+
+def test_final_adding_a_word_to_a_long_interim_is_reused():
+    speculator, _ = make_speculator()
+    speculator.speculate("s1", "why does my phone keep dropping calls at home")
+    assert speculator.take("s1", "why does my phone keep dropping calls at home today") is not None
+
+def test_growing_interim_re_speculates():
+    speculator, retriever = make_speculator()
+    assert speculator.speculate("s1", "my phone")
+    assert speculator.speculate("s1", "my phone keeps dropping calls")
+    assert not speculator.speculate("s1", "my phone keeps dropping calls.")
+    assert retriever.submitted == ["my phone", "my phone keeps dropping calls"]
+    results = speculator.take("s1", "my phone keeps dropping calls")
+    assert results["dense"] == ["results for my phone keeps dropping calls"]
+
+def test_interim_naming_a_new_device_restarts_speculation():
+    speculator, retriever = make_speculator()
+    assert speculator.speculate("s1", "how do I reset my Google Pixel 2 to factory settings")
+    assert not speculator.speculate("s1", "how do I reset my Google Pixel 2 to factory settings please")
+    assert speculator.speculate("s1", "how do I reset my Google Pixel 2 XL to factory settings")
+    assert len(retriever.submitted) == 2
+    assert speculator.take("s1", "how do I reset my Google Pixel 2 XL to factory settings") is not None
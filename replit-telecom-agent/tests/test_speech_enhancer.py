@@ -0,0 +1,51 @@
+# tests/test_speech_enhancer.py
+import pytest
+
+from speech_enhancer import PhraseStreamer
+
+def stream(text, delta_size, min_clause_chars=40):
+    """Feeds `text` in `delta_size` pieces, as a streaming model would."""
+    streamer = PhraseStreamer(min_clause_chars=min_clause_chars)
+    phrases = []
+    for start in range(0, len(text), delta_size):
+        phrases.extend(streamer.feed(text[start:start + delta_size]))
+    return phrases + streamer.flush()
+
+# Delta sizes from one character up to the whole answer: phrasing must not
+# depend on where the model happens to split its output
+DELTA_SIZES = [1, 2, 3, 5, 8, 1000]
+
+@pytest.mark.parametrize("delta_size", DELTA_SIZES)
+def test_splits_sentences(delta_size):
+    assert stream("Restart your phone. Then try again! Did that work?", delta_size) == [
+        "Restart your phone.", "Then try again!", "Did that work?"]
+
+@pytest.mark.parametrize("delta_size", DELTA_SIZES)
+def test_long_clause_is_spoken_early(delta_size):
+    text = "If your phone still will not connect to the network, restart it and wait a minute"
+    assert stream(text, delta_size) == [
+        "If your phone still will not connect to the network,", "restart it and wait a minute"]
+
+@pytest.mark.parametrize("delta_size", DELTA_SIZES)
+def test_short_clause_stays_with_its_sentence(delta_size):
+    assert stream("Dial 86, then wait.", delta_size) == ["Dial 86, then wait."]
+
+@pytest.mark.parametrize("delta_size", DELTA_SIZES)
+def test_abbreviation_does_not_end_sentence(delta_size):
+    assert stream("Open an app, e.g. Maps. Done.", delta_size) == ["Open an app, e.g. Maps.", "Done."]
+
+@pytest.mark.parametrize("delta_size", DELTA_SIZES)
+def test_decimal_does_not_end_sentence(delta_size):
+    assert stream("The plan costs 5.99 per month. Thanks.", delta_size) == [
+        "The plan costs 5.99 per month.", "Thanks."]
+
+@pytest.mark.parametrize("delta_size", DELTA_SIZES)
+def test_list_markers_stay_with_their_step(delta_size):
+    text = "1. Open Settings.\n2. Tap Wi-Fi.\n3. Choose **Home**."
+    assert stream(text, delta_size) == ["1. Open Settings.", "2. Tap wifi.", "3. Choose Home."]
+
+def test_trailing_list_number_waits_for_more_text():
+    streamer = PhraseStreamer()
+    assert streamer.feed("Open Settings. 6.") == ["Open Settings."]
+    assert streamer.feed(" Tap Reset.") == []
+    assert streamer.flush() == ["6. Tap Reset."]
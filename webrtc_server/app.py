@@ -2,12 +2,18 @@
 import asyncio
 import json
 import os
+import time
+import uuid
 import aiohttp
 from aiohttp import web
 from aiortc import RTCPeerConnection, RTCSessionDescription
 from aiortc.contrib.media import MediaStreamTrack
 from google.cloud import speech_v1p1beta1 as speech
 from google.cloud import texttospeech_v1 as texttospeech
+from resources import ServiceResources
+from outbound_audio import OutboundAudioTrack, wav_to_pcm
+from audio_frontend import AudioFrontEnd, TARGET_RATE, frontend_events, speech_segments
+from tts_scheduler import aggregate_phrases, synthesize_in_order, scheduler_stats
 
 # --- Configuration ---
 # Service URLs
@@ -24,6 +30,46 @@ PORT = int(os.environ.get("PORT", 8000))
 GOOGLE_STT_LANGUAGE_CODE = "en-US"
 GOOGLE_TTS_LANGUAGE_CODE = "en-US"
 GOOGLE_TTS_VOICE_NAME = "en-US-Standard-J"
+# Inbound audio front end: 16 kHz mono packets, energy VAD with hangover
+STT_PACKET_MS = int(os.environ.get("STT_PACKET_MS", 100))
+VAD_THRESHOLD_DB = float(os.environ.get("VAD_THRESHOLD_DB", -45))
+VAD_HANGOVER_MS = int(os.environ.get("VAD_HANGOVER_MS", 400))
+# TTS scheduling: agent chunks are grouped into phrases before synthesis
+TTS_PHRASE_MIN_CHARS = int(os.environ.get("TTS_PHRASE_MIN_CHARS", 40))
+TTS_PHRASE_MAX_CHARS = int(os.environ.get("TTS_PHRASE_MAX_CHARS", 200))
+TTS_PHRASE_TIMEOUT_MS = int(os.environ.get("TTS_PHRASE_TIMEOUT_MS", 300))
+TTS_LOOKAHEAD = int(os.environ.get("TTS_LOOKAHEAD", 3)) # phrases synthesized ahead of playback
+# Shared HTTP pools to the agent and MCP services
+HTTP_POOL_LIMIT = int(os.environ.get("HTTP_POOL_LIMIT", 100))
+HTTP_POOL_LIMIT_PER_HOST = int(os.environ.get("HTTP_POOL_LIMIT_PER_HOST", 20))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", 60)) # max silence on a streaming response
+# Outbound audio: jitter buffer before an answer starts playing on the WebRTC track
+OUTBOUND_PREBUFFER_MS = int(os.environ.get("OUTBOUND_PREBUFFER_MS", 60))
+# Speculative retrieval: interim transcripts at least this stable are sent to
+# the agent's /speculate so retrieval starts before the caller stops talking
+SPECULATIVE_RETRIEVAL = os.environ.get("SPECULATIVE_RETRIEVAL", "true").lower() == "true"
+SPECULATION_MIN_STABILITY = float(os.environ.get("SPECULATION_MIN_STABILITY", 0.8))
+# Barge-in: caller speech cancels the answer that is still being generated/played
+BARGE_IN_ENABLED = os.environ.get("BARGE_IN_ENABLED", "true").lower() == "true"
+
+# --- Shared Resources ---
+resources = ServiceResources(
+    limit=HTTP_POOL_LIMIT,
+    limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+    connect_timeout=HTTP_CONNECT_TIMEOUT,
+    read_timeout=HTTP_READ_TIMEOUT,
+)
+
+async def start_resources(app):
+    await resources.start(
+        ["agent", "mcp"],
+        speech_client_factory=speech.SpeechAsyncClient if STT_PROVIDER == 'google' else None,
+        tts_client_factory=texttospeech.TextToSpeechAsyncClient if TTS_PROVIDER == 'google' else None,
+    )
+
+async def close_resources(app):
+    await resources.close()
 
 # --- WebRTC Media Track ---
 class AudioStreamer(MediaStreamTrack):
@@ -37,103 +83,228 @@ class AudioStreamer(MediaStreamTrack):
 
 # --- STT Service Routers ---
 
-async def stt_router(audio_streamer):
-    if STT_PROVIDER == 'google':
-        async for text in stream_to_google_stt(audio_streamer):
-            yield text
-    elif STT_PROVIDER == 'self-hosted':
-        async with aiohttp.ClientSession() as session:
-            async for text in stream_to_mcp_stt(audio_streamer, session):
+async def stt_router(audio_streamer, on_vad=None):
+    # Only speech reaches the STT provider: one recognition request per
+    # utterance, ended by the VAD's speech_end (the endpointing signal).
+    frontend = AudioFrontEnd(
+        packet_ms=STT_PACKET_MS, threshold_db=VAD_THRESHOLD_DB, hangover_ms=VAD_HANGOVER_MS
+    )
+    segments = speech_segments(frontend_events(audio_streamer, frontend, on_vad=on_vad))
+    try:
+        if STT_PROVIDER == 'google':
+            async for text in stream_to_google_stt(segments):
                 yield text
-    else:
-        raise ValueError(f"Invalid STT_PROVIDER: {STT_PROVIDER}")
+        elif STT_PROVIDER == 'self-hosted':
+            async for text in stream_to_mcp_stt(segments, resources.session("mcp")):
+                yield text
+        else:
+            raise ValueError(f"Invalid STT_PROVIDER: {STT_PROVIDER}")
+    finally:
+        print(f"Audio front end stats: {frontend.stats()}")
 
-async def stream_to_google_stt(audio_streamer):
-    client = speech.SpeechAsyncClient()
+async def stream_to_google_stt(segments):
+    client = resources.speech_client
     config = speech.RecognitionConfig(
         encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-        sample_rate_hertz=48000,
+        sample_rate_hertz=TARGET_RATE,
         language_code=GOOGLE_STT_LANGUAGE_CODE,
         enable_automatic_punctuation=True,
     )
     streaming_config = speech.StreamingRecognitionConfig(config=config, interim_results=True)
 
-    async def audio_generator():
-        yield speech.StreamingRecognizeRequest(streaming_config=streaming_config)
-        while True:
-            try:
-                frame = await audio_streamer.recv()
-                # Google STT requires raw PCM_16 data
-                yield speech.StreamingRecognizeRequest(audio_content=frame.tobytes())
-            except Exception:
-                break
-    
-    responses = await client.streaming_recognize(requests=audio_generator())
-    async for response in responses:
-        for result in response.results:
-            if result.is_final:
-                yield {"text": result.alternatives[0].transcript, "is_final": True}
-
-async def stream_to_mcp_stt(audio_streamer, session):
-    stt_endpoint = f"{MCP_URL}/stt"
-    headers = {"Authorization": f"Bearer {MCP_AUTH_TOKEN}"}
-    async with session.post(stt_endpoint, headers=headers, data=audio_streamer) as resp:
-        async for line in resp.content:
-            yield json.loads(line)
+    async for segment in segments:
+        async def audio_generator(segment=segment):
+            yield speech.StreamingRecognizeRequest(streaming_config=streaming_config)
+            # ~100 ms packets of 16 kHz mono PCM_16
+            async for pcm in segment:
+                yield speech.StreamingRecognizeRequest(audio_content=pcm)
+
+        responses = await client.streaming_recognize(requests=audio_generator())
+        async for response in responses:
+            for result in response.results:
+                if not result.alternatives:
+                    continue
+                if result.is_final:
+                    yield {"text": result.alternatives[0].transcript, "is_final": True}
+                else:
+                    # Interim hypotheses feed speculative retrieval
+                    yield {"text": result.alternatives[0].transcript, "is_final": False,
+                           "stability": result.stability}
+
+async def stream_to_mcp_stt(segments, session):
+    stt_endpoint = f"{MCP_URL}/stt/stream"
+    params = {"sample_rate": TARGET_RATE, "channels": 1}
+    headers = {"Authorization": f"Bearer {MCP_AUTH_TOKEN}", "Content-Type": "audio/L16"}
+    async for segment in segments:
+        # Each utterance is one chunked request; ending the body finalizes it
+        async with session.post(stt_endpoint, headers=headers, params=params, data=segment) as resp:
+            async for line in resp.content:
+                if line.strip():
+                    yield json.loads(line)
 
 # --- TTS Service Routers ---
-async def tts_router(text_stream):
+async def tts_router(text_stream, counters=None):
+    # Yields {"pcm", "sample_rate", "channels"} chunks of 16-bit PCM
+    # Per-word agent chunks become phrase-sized requests, synthesized ahead
+    # of playback and sent strictly in order
+    phrases = aggregate_phrases(
+        text_stream,
+        min_chars=TTS_PHRASE_MIN_CHARS,
+        max_chars=TTS_PHRASE_MAX_CHARS,
+        timeout=TTS_PHRASE_TIMEOUT_MS / 1000,
+    )
     if TTS_PROVIDER == 'google':
-        async for audio_chunk in stream_from_google_tts(text_stream):
+        async for audio_chunk in stream_from_google_tts(phrases, counters):
             yield audio_chunk
     elif TTS_PROVIDER == 'self-hosted':
-        async with aiohttp.ClientSession() as session:
-            async for audio_chunk in stream_to_mcp_tts(text_stream, session):
-                yield audio_chunk
+        async for audio_chunk in stream_to_mcp_tts(phrases, resources.session("mcp"), counters):
+            yield audio_chunk
     else:
         raise ValueError(f"Invalid TTS_PROVIDER: {TTS_PROVIDER}")
+    print(f"TTS scheduler stats: {scheduler_stats()}")
 
-async def stream_from_google_tts(text_stream):
-    client = texttospeech.TextToSpeechAsyncClient()
+async def stream_from_google_tts(phrases, counters=None):
+    client = resources.tts_client
     voice = texttospeech.VoiceSelectionParams(language_code=GOOGLE_TTS_LANGUAGE_CODE, name=GOOGLE_TTS_VOICE_NAME)
-    audio_config = texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.MP3)
-    
-    async for text_data in text_stream:
-        synthesis_input = texttospeech.SynthesisInput(text=text_data["text_chunk"])
+    # 48 kHz PCM goes straight onto the outbound track without resampling
+    audio_config = texttospeech.AudioConfig(
+        audio_encoding=texttospeech.AudioEncoding.LINEAR16, sample_rate_hertz=48000
+    )
+
+    async def synthesize(phrase):
+        synthesis_input = texttospeech.SynthesisInput(text=phrase)
         response = await client.synthesize_speech(input=synthesis_input, voice=voice, audio_config=audio_config)
-        yield response.audio_content
+        return wav_to_pcm(response.audio_content)
+
+    async for audio in synthesize_in_order(phrases, synthesize, lookahead=TTS_LOOKAHEAD, counters=counters):
+        yield audio
 
-async def stream_to_mcp_tts(text_stream, session):
-    tts_endpoint = f"{MCP_URL}/tts"
+async def stream_to_mcp_tts(phrases, session, counters=None):
+    tts_endpoint = f"{MCP_URL}/tts/stream"
     headers = {"Authorization": f"Bearer {MCP_AUTH_TOKEN}"}
-    async with session.post(tts_endpoint, headers=headers, data=text_stream) as resp:
-        async for chunk in resp.content.iter_chunked(1024):
-            yield chunk
+
+    async def synthesize(phrase):
+        async with session.post(tts_endpoint, headers=headers, json={"text": phrase, "format": "pcm"}) as resp:
+            if resp.status != 200:
+                raise RuntimeError(f"MCP TTS request failed with status {resp.status}")
+            return {
+                "pcm": await resp.read(),
+                "sample_rate": int(resp.headers["X-Sample-Rate"]),
+                "channels": int(resp.headers.get("X-Channels", 1)),
+            }
+
+    async for audio in synthesize_in_order(phrases, synthesize, lookahead=TTS_LOOKAHEAD, counters=counters):
+        yield audio
 
 # --- Core Orchestration Logic ---
 
-async def stream_to_agent(stt_stream, session):
+barge_in_stats = {
+    "turns": 0,
+    "barge_ins": 0,
+    "wasted_ms": 0.0,  # wall time already spent on answers that were cut off
+    "chars_received": 0,  # agent text received for answers that were cut off
+    "chars_avoided": 0,  # ...of which never sent to TTS
+    "audio_ms_discarded": 0.0,  # synthesized audio dropped from the outbound buffer
+}
+
+async def stream_agent_turn(query, session, session_id, counters):
+    """
+    Sends one final transcript to the agent and yields its response chunks.
+    One request per turn, so a barge-in can abort just this answer.
+    """
     agent_endpoint = f"{AGENT_URL}/stream"
-    async def text_generator():
-        async for stt_result in stt_stream:
-            yield json.dumps(stt_result) + "\n"
-    async with session.post(agent_endpoint, data=text_generator()) as resp:
+    # One conversation history per caller connection on the agent side
+    headers = {"X-Session-ID": session_id}
+    body = json.dumps({"text": query, "is_final": True}) + "\n"
+    async with session.post(agent_endpoint, headers=headers, data=body) as resp:
         async for line in resp.content:
-            yield json.loads(line)
+            if line.strip():
+                text_data = json.loads(line)
+                counters["chars_received"] += len(text_data.get("text_chunk", ""))
+                yield text_data
 
-async def handle_conversation_stream(ws, audio_streamer):
+async def speculate_on_agent(query, session, session_id):
+    """
+    Hands a stable interim transcript to the agent so it can start retrieval.
+    Best effort: a failure only means the final transcript retrieves normally.
+    """
+    try:
+        async with session.post(f"{AGENT_URL}/speculate", headers={"X-Session-ID": session_id},
+                                json={"text": query}) as resp:
+            await resp.read()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"Speculation request failed: {e}")
+
+async def handle_conversation_stream(ws, audio_streamer, session_id, outbound):
     """Orchestrates the full data pipeline."""
-    async with aiohttp.ClientSession() as session:
-        stt_stream = stt_router(audio_streamer)
-        agent_stream = stream_to_agent(stt_stream, session)
-        tts_audio_stream = tts_router(agent_stream)
-        
-        async for audio_chunk in tts_audio_stream:
+    session = resources.session("agent")
+    turn = None
+    counters = None
+    last_speculation = None
+    speculations = set()
+
+    async def run_turn(query, counters):
+        agent_stream = stream_agent_turn(query, session, session_id, counters)
+        try:
+            async for audio_chunk in tts_router(agent_stream, counters):
+                # Played to the caller over the WebRTC track, paced in 20 ms frames
+                outbound.enqueue(audio_chunk)
+        except Exception as e:
+            print(f"Error while answering '{query}': {e}")
+
+    async def interrupt_turn():
+        # Stops the agent request, pending TTS synthesis and the audio still
+        # queued on the outbound track, then tells the client to drop what it
+        # buffered. The answer may be fully generated yet still playing.
+        generating = turn is not None and not turn.done()
+        if not generating and not outbound.buffered_ms():
+            return
+        if generating:
+            turn.cancel()
             try:
-                await ws.send_bytes(audio_chunk)
-            except ConnectionResetError:
-                print("Client connection closed.")
-                break
+                await turn
+            except asyncio.CancelledError:
+                pass
+        barge_in_stats["barge_ins"] += 1
+        barge_in_stats["wasted_ms"] += (time.perf_counter() - counters["started"]) * 1000
+        barge_in_stats["chars_received"] += counters["chars_received"]
+        barge_in_stats["chars_avoided"] += counters["chars_received"] - counters.get("chars_submitted", 0)
+        barge_in_stats["audio_ms_discarded"] += outbound.clear()
+        try:
+            await ws.send_json({"type": "flush"})
+        except ConnectionResetError:
+            pass
+
+    async def on_vad(event):
+        if event["type"] == "speech_start" and BARGE_IN_ENABLED:
+            await interrupt_turn()
+
+    async for stt_result in stt_router(audio_streamer, on_vad=on_vad):
+        if not stt_result.get("text"):
+            continue
+        if not stt_result.get("is_final", True):
+            # MCP partials carry no stability score; they are already
+            # re-decoded over the whole utterance so treat them as stable.
+            stable = stt_result.get("stability", 1.0) >= SPECULATION_MIN_STABILITY
+            if SPECULATIVE_RETRIEVAL and stable and stt_result["text"] != last_speculation:
+                last_speculation = stt_result["text"]
+                task = asyncio.create_task(speculate_on_agent(last_speculation, session, session_id))
+                speculations.add(task)
+                task.add_done_callback(speculations.discard)
+            continue
+        last_speculation = None
+        if turn is not None and not turn.done():
+            if BARGE_IN_ENABLED:
+                await interrupt_turn()
+            else:
+                await turn
+        counters = {"started": time.perf_counter(), "chars_received": 0, "chars_submitted": 0}
+        barge_in_stats["turns"] += 1
+        turn = asyncio.create_task(run_turn(stt_result["text"], counters))
+
+    if turn is not None:
+        await turn
+    print(f"Barge-in stats: {barge_in_stats}")
 
 # --- WebSocket & WebRTC Connection Handling ---
 
@@ -141,12 +312,16 @@ async def websocket_handler(request):
     ws = web.WebSocketResponse()
     await ws.prepare(request)
     pc = RTCPeerConnection()
+    session_id = uuid.uuid4().hex
+    # Added before the answer is created so it is negotiated on the same connection
+    outbound = OutboundAudioTrack(prebuffer_ms=OUTBOUND_PREBUFFER_MS)
+    pc.addTrack(outbound)
 
     @pc.on("track")
     async def on_track(track):
         if track.kind == "audio":
             audio_streamer = AudioStreamer(track)
-            await handle_conversation_stream(ws, audio_streamer)
+            await handle_conversation_stream(ws, audio_streamer, session_id, outbound)
 
     async for msg in ws:
         if msg.type == aiohttp.WSMsgType.TEXT:
@@ -157,12 +332,24 @@ async def websocket_handler(request):
                 await pc.setLocalDescription(answer)
                 await ws.send_json({"type": "answer", "sdp": pc.localDescription.sdp})
     
+    print(f"Outbound audio stats: {outbound.stats()}")
+    outbound.stop()
     await pc.close()
     return ws
 
+async def stats_handler(request):
+    return web.json_response({
+        "resources": resources.stats(),
+        "tts_scheduler": scheduler_stats(),
+        "barge_in": barge_in_stats,
+    })
+
 # --- Application Setup ---
 app = web.Application()
+app.on_startup.append(start_resources)
+app.on_cleanup.append(close_resources)
 app.router.add_get("/ws", websocket_handler)
+app.router.add_get("/stats", stats_handler)
 
 if __name__ == "__main__":
     web.run_app(app, port=PORT)
@@ -0,0 +1,224 @@
+# webrtc_server/audio_frontend.py
+import numpy as np
+
+TARGET_RATE = 16000
+
+def frame_to_mono(frame) -> np.ndarray:
+    """
+    Converts an aiortc/PyAV audio frame (packed or planar 16-bit) to mono
+    float32 samples in [-1, 1].
+    """
+    samples = frame.to_ndarray()
+    channels = len(frame.layout.channels)
+    if frame.format.is_planar:
+        mono = samples.mean(axis=0) if channels > 1 else samples[0]
+    else:
+        mono = samples.reshape(-1, channels).mean(axis=1) if channels > 1 else samples.reshape(-1)
+    return mono.astype(np.float32) / 32768.0
+
+def pcm16_to_mono(data: bytes, channels: int) -> np.ndarray:
+    """
+    Same as frame_to_mono for interleaved 16-bit PCM bytes (e.g. a recording).
+    """
+    samples = np.frombuffer(data[:len(data) - len(data) % (2 * channels)], dtype='<i2')
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples.astype(np.float32) / 32768.0
+
+class Resampler:
+    """
+    Streaming resampler. Integer down-sampling ratios (48 kHz -> 16 kHz) use
+    a windowed-sinc low-pass FIR followed by decimation; the filter history
+    is carried between calls so frame boundaries are seamless. Other ratios
+    fall back to linear interpolation.
+    """
+    def __init__(self, orig_rate, target_rate=TARGET_RATE, taps=63):
+        self.orig_rate = orig_rate
+        self.target_rate = target_rate
+        self.factor = orig_rate // target_rate if orig_rate % target_rate == 0 else None
+        if self.factor and self.factor > 1:
+            n = np.arange(taps) - (taps - 1) / 2
+            cutoff = 0.9 / self.factor  # just below the new Nyquist
+            kernel = cutoff * np.sinc(cutoff * n) * np.hamming(taps)
+            self.kernel = (kernel / kernel.sum()).astype(np.float32)
+            self.history = np.zeros(taps - 1, dtype=np.float32)
+        self.phase = 0  # offset of the next output sample in the next input block
+        self.position = 0.0  # fractional read position for interpolation
+        self.last = np.zeros(1, dtype=np.float32)
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        if self.orig_rate == self.target_rate:
+            return samples
+        if self.factor:
+            padded = np.concatenate([self.history, samples])
+            filtered = np.convolve(padded, self.kernel, mode='valid')
+            self.history = padded[len(padded) - len(self.history):]
+            out = filtered[self.phase::self.factor]
+            self.phase = (self.phase - len(filtered)) % self.factor
+            return out.astype(np.float32)
+        # Linear interpolation over the previous block's last sample + this block
+        block = np.concatenate([self.last, samples])
+        step = self.orig_rate / self.target_rate
+        positions = np.arange(self.position, len(block) - 1, step)
+        out = np.interp(positions, np.arange(len(block)), block).astype(np.float32)
+        self.position = (positions[-1] + step - (len(block) - 1)) if len(positions) else self.position - (len(block) - 1)
+        self.last = block[-1:]
+        return out
+
+class AudioFrontEnd:
+    """
+    Audio stage between the inbound WebRTC track and the STT routers.
+
+    Mono 16 kHz audio is cut into `packet_ms` packets and gated by an energy
+    VAD: each 20 ms sub-frame is speech when it is louder than both an
+    absolute floor and an adaptive noise estimate. The gate opens on the
+    first speech packet (sending the preceding packet too, so onsets are not
+    clipped) and stays open for `hangover_ms` after the last one. process()
+    returns events: {"type": "speech_start", "at"}, {"type": "audio", "pcm"}
+    (16-bit mono PCM bytes) and {"type": "speech_end", "at"} - the
+    endpointing signal - where "at" is the stream position in seconds.
+    """
+    def __init__(self, sample_rate=TARGET_RATE, packet_ms=100, threshold_db=-45.0,
+                 noise_margin_db=10.0, hangover_ms=400, subframe_ms=20):
+        self.sample_rate = sample_rate
+        self.packet_ms = packet_ms
+        self.packet = sample_rate * packet_ms // 1000
+        self.subframe = sample_rate * subframe_ms // 1000
+        self.threshold_db = threshold_db
+        self.noise_margin_db = noise_margin_db
+        self.hangover_packets = max(1, -(-hangover_ms // packet_ms))
+        self.noise_floor_db = threshold_db - noise_margin_db
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._previous_packet = None
+        self._in_speech = False
+        self._silent_packets = 0
+        self.packets_in = 0
+        self.packets_sent = 0
+        self.speech_segments = 0
+
+    def _is_speech(self, packet):
+        frames = packet[:len(packet) - len(packet) % self.subframe].reshape(-1, self.subframe)
+        energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+        threshold = max(self.threshold_db, self.noise_floor_db + self.noise_margin_db)
+        voiced = energy_db > threshold
+        if not voiced.any():
+            # Track the background level slowly while nobody is talking
+            self.noise_floor_db = 0.95 * self.noise_floor_db + 0.05 * float(np.median(energy_db))
+        return bool(voiced.any())
+
+    def _elapsed(self, offset_packets):
+        # Stream position in seconds at the end of the current packet (+ offset)
+        return round((self.packets_in + offset_packets) * self.packet_ms / 1000, 3)
+
+    @staticmethod
+    def _to_pcm(packet):
+        return (np.clip(packet, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+
+    def process(self, samples: np.ndarray) -> list:
+        """
+        Feeds mono float32 samples at `sample_rate`; returns the resulting events.
+        """
+        self._buffer = np.concatenate([self._buffer, samples]) if len(self._buffer) else samples
+        events = []
+        while len(self._buffer) >= self.packet:
+            packet, self._buffer = self._buffer[:self.packet], self._buffer[self.packet:]
+            self.packets_in += 1
+            speech = self._is_speech(packet)
+            if speech:
+                self._silent_packets = 0
+                if not self._in_speech:
+                    self._in_speech = True
+                    self.speech_segments += 1
+                    events.append({"type": "speech_start", "at": self._elapsed(-1)})
+                    if self._previous_packet is not None:
+                        events.append({"type": "audio", "pcm": self._to_pcm(self._previous_packet)})
+                        self.packets_sent += 1
+            elif self._in_speech:
+                self._silent_packets += 1
+            if self._in_speech:
+                events.append({"type": "audio", "pcm": self._to_pcm(packet)})
+                self.packets_sent += 1
+                if self._silent_packets >= self.hangover_packets:
+                    self._in_speech = False
+                    events.append({"type": "speech_end", "at": self._elapsed(0)})
+            self._previous_packet = packet
+        return events
+
+    def flush(self) -> list:
+        """
+        Closes an open speech segment at the end of the stream.
+        """
+        if self._in_speech:
+            self._in_speech = False
+            return [{"type": "speech_end", "at": self._elapsed(0)}]
+        return []
+
+    def stats(self) -> dict:
+        return {
+            "packets_in": self.packets_in,
+            "packets_sent": self.packets_sent,
+            "sent_ratio": round(self.packets_sent / self.packets_in, 3) if self.packets_in else 0.0,
+            "speech_segments": self.speech_segments,
+            "noise_floor_db": round(self.noise_floor_db, 1),
+        }
+
+def process_pcm(data: bytes, sample_rate: int, channels: int, frontend=None, frame_ms=20) -> list:
+    """
+    Runs recorded interleaved 16-bit PCM through the same downmix, resample
+    and VAD path as live frames, in `frame_ms` pieces like aiortc delivers
+    them. Used to tune and check the front end offline.
+    """
+    frontend = frontend or AudioFrontEnd()
+    resampler = Resampler(sample_rate, frontend.sample_rate)
+    step = sample_rate * frame_ms // 1000 * channels * 2
+    events = []
+    for offset in range(0, len(data), step):
+        mono = pcm16_to_mono(data[offset:offset + step], channels)
+        events.extend(frontend.process(resampler.process(mono)))
+    return events + frontend.flush()
+
+async def frontend_events(audio_streamer, frontend, on_vad=None):
+    """
+    Async generator of front-end events for a live inbound track. `on_vad`
+    (a coroutine function) is awaited with each speech_start/speech_end as
+    soon as it happens, independently of how the STT side consumes audio.
+    """
+    resampler = None
+    while True:
+        try:
+            frame = await audio_streamer.recv()
+        except Exception:
+            break
+        if resampler is None:
+            resampler = Resampler(frame.sample_rate, frontend.sample_rate)
+        for event in frontend.process(resampler.process(frame_to_mono(frame))):
+            if on_vad is not None and event["type"] != "audio":
+                await on_vad(event)
+            yield event
+    for event in frontend.flush():
+        if on_vad is not None:
+            await on_vad(event)
+        yield event
+
+async def speech_segments(events):
+    """
+    Splits front-end events into utterances: yields one async generator of
+    PCM packets per speech segment, ending at its speech_end. Each segment
+    must be consumed before the next one is requested.
+    """
+    events = events.__aiter__()
+    while True:
+        async for event in events:
+            if event["type"] == "speech_start":
+                break
+        else:
+            return
+
+        async def segment():
+            async for event in events:
+                if event["type"] == "speech_end":
+                    return
+                if event["type"] == "audio":
+                    yield event["pcm"]
+
+        yield segment()
@@ -0,0 +1,135 @@
+# webrtc_server/outbound_audio.py
+import asyncio
+import fractions
+import io
+import time
+import wave
+
+import numpy as np
+from av import AudioFrame
+from aiortc import MediaStreamTrack
+
+from audio_frontend import Resampler
+
+OUTPUT_RATE = 48000  # Opus runs at 48 kHz
+FRAME_MS = 20
+
+def wav_to_pcm(wav_bytes: bytes) -> dict:
+    """
+    Unwraps a 16-bit PCM WAV (e.g. Google LINEAR16 output) into the
+    {"pcm", "sample_rate", "channels"} chunks the TTS routers yield.
+    """
+    with wave.open(io.BytesIO(wav_bytes), "rb") as audio:
+        return {
+            "pcm": audio.readframes(audio.getnframes()),
+            "sample_rate": audio.getframerate(),
+            "channels": audio.getnchannels(),
+        }
+
+class OutboundAudioTrack(MediaStreamTrack):
+    """
+    Server-to-caller audio track. TTS audio is queued with enqueue(), and
+    recv() hands aiortc one 20 ms 48 kHz mono frame per call, paced against
+    the wall clock like a live source, for Opus encoding. Silence is sent
+    while there is nothing to say. A new utterance starts playing only once
+    `prebuffer_ms` is queued (or has waited that long), a small jitter
+    buffer that keeps TTS network hiccups from turning into gaps.
+    """
+    kind = "audio"
+
+    def __init__(self, prebuffer_ms=60):
+        super().__init__()
+        self.samples_per_frame = OUTPUT_RATE * FRAME_MS // 1000
+        self.prebuffer = OUTPUT_RATE * prebuffer_ms // 1000
+        self._buffer = np.zeros(0, dtype=np.int16)
+        self._playing = False
+        self._waiting_since = None
+        self._resamplers = {}
+        self._start = None
+        self._pts = 0
+        self.frames_sent = 0
+        self.speech_frames = 0
+        self.gaps = 0
+        self.max_buffered_ms = 0.0
+        self.discarded_ms = 0.0
+
+    def enqueue(self, chunk: dict):
+        """
+        Queues 16-bit PCM ({"pcm", "sample_rate", "channels"}) for playback.
+        """
+        samples = np.frombuffer(chunk["pcm"], dtype='<i2').astype(np.float32) / 32768.0
+        channels = chunk.get("channels", 1)
+        if channels > 1:
+            samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+        rate = chunk["sample_rate"]
+        if rate != OUTPUT_RATE:
+            resampler = self._resamplers.get(rate)
+            if resampler is None:
+                resampler = self._resamplers[rate] = Resampler(rate, OUTPUT_RATE)
+            samples = resampler.process(samples)
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+        self._buffer = np.concatenate([self._buffer, pcm])
+        if self._waiting_since is None and not self._playing:
+            self._waiting_since = time.time()
+        self.max_buffered_ms = max(self.max_buffered_ms, self.buffered_ms())
+
+    def clear(self) -> float:
+        """
+        Drops queued audio (barge-in); returns the milliseconds discarded.
+        """
+        dropped = self.buffered_ms()
+        self._buffer = np.zeros(0, dtype=np.int16)
+        self._playing = False
+        self._waiting_since = None
+        self._resamplers = {}
+        self.discarded_ms += dropped
+        return dropped
+
+    def buffered_ms(self) -> float:
+        return len(self._buffer) * 1000 / OUTPUT_RATE
+
+    def _next_samples(self):
+        if not self._playing and len(self._buffer):
+            waited = time.time() - (self._waiting_since or time.time())
+            if len(self._buffer) >= self.prebuffer or waited * OUTPUT_RATE >= self.prebuffer:
+                self._playing = True
+                self._waiting_since = None
+        if not self._playing:
+            return np.zeros(self.samples_per_frame, dtype=np.int16)
+        samples, self._buffer = self._buffer[:self.samples_per_frame], self._buffer[self.samples_per_frame:]
+        self.speech_frames += 1
+        if len(self._buffer) == 0:
+            # Ran dry (end of an answer or TTS fell behind): wait for the prebuffer again
+            self._playing = False
+            self.gaps += 1
+        if len(samples) < self.samples_per_frame:
+            samples = np.concatenate([samples, np.zeros(self.samples_per_frame - len(samples), dtype=np.int16)])
+        return samples
+
+    async def recv(self):
+        if self.readyState != "live":
+            raise Exception("Track ended")
+        # Pace frames in real time; aiortc pulls as fast as recv() returns
+        if self._start is None:
+            self._start = time.time()
+        else:
+            self._pts += self.samples_per_frame
+            wait = self._start + self._pts / OUTPUT_RATE - time.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        frame = AudioFrame.from_ndarray(self._next_samples().reshape(1, -1), format="s16", layout="mono")
+        frame.sample_rate = OUTPUT_RATE
+        frame.pts = self._pts
+        frame.time_base = fractions.Fraction(1, OUTPUT_RATE)
+        self.frames_sent += 1
+        return frame
+
+    def stats(self) -> dict:
+        return {
+            "frames_sent": self.frames_sent,
+            "speech_frames": self.speech_frames,
+            "gaps": self.gaps,
+            "buffered_ms": round(self.buffered_ms(), 1),
+            "max_buffered_ms": round(self.max_buffered_ms, 1),
+            "discarded_ms": round(self.discarded_ms, 1),
+        }
@@ -0,0 +1,43 @@
+# webrtc_server/replay_frontend.py
+"""
+Replays a recorded 16-bit PCM WAV through the audio front end offline and
+prints the speech segments the VAD finds, so thresholds can be tuned on
+real calls without a browser.
+
+    python replay_frontend.py call.wav --threshold-db -45 --hangover-ms 400
+"""
+import argparse
+import time
+import wave
+
+from audio_frontend import AudioFrontEnd, process_pcm
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("wav", help="16-bit PCM WAV recording")
+    parser.add_argument("--packet-ms", type=int, default=100)
+    parser.add_argument("--threshold-db", type=float, default=-45.0)
+    parser.add_argument("--hangover-ms", type=int, default=400)
+    args = parser.parse_args()
+
+    with wave.open(args.wav, "rb") as recording:
+        if recording.getsampwidth() != 2:
+            parser.error("only 16-bit PCM WAV files are supported")
+        sample_rate = recording.getframerate()
+        channels = recording.getnchannels()
+        data = recording.readframes(recording.getnframes())
+
+    frontend = AudioFrontEnd(packet_ms=args.packet_ms, threshold_db=args.threshold_db, hangover_ms=args.hangover_ms)
+    start = time.perf_counter()
+    events = process_pcm(data, sample_rate, channels, frontend)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    for event in events:
+        if event["type"] != "audio":
+            print(f"{event['at']:8.2f}s  {event['type'].replace('_', ' ')}")
+    duration = len(data) / (2 * channels * sample_rate)
+    print(f"{duration:.1f}s of audio processed in {elapsed_ms:.1f} ms")
+    print(frontend.stats())
+
+if __name__ == "__main__":
+    main()
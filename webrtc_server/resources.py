@@ -0,0 +1,113 @@
+# webrtc_server/resources.py
+import aiohttp
+
+class ServiceResources:
+    """
+    Long-lived clients shared by every conversation: one keep-alive HTTP
+    connection pool per backend service and one Google Speech / TTS client
+    each. Created in the aiohttp app's on_startup hook and closed in
+    on_cleanup, so calls reuse TCP/TLS connections and gRPC channels instead
+    of setting them up per conversation.
+    """
+    def __init__(self, limit=100, limit_per_host=20, connect_timeout=5.0, read_timeout=60.0,
+                 keepalive_timeout=60.0):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.sessions = {}
+        self.speech_client = None
+        self.tts_client = None
+        self._counters = {}
+
+    def _trace_config(self, name):
+        counters = self._counters[name] = {
+            "requests": 0, "awaiting_response": 0, "errors": 0,
+            "connections_created": 0, "connections_reused": 0, "connection_queued": 0,
+        }
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            counters["requests"] += 1
+            counters["awaiting_response"] += 1
+
+        async def on_request_end(session, context, params):
+            # Fires once response headers arrive; the body may still be streaming
+            counters["awaiting_response"] -= 1
+
+        async def on_request_exception(session, context, params):
+            counters["awaiting_response"] -= 1
+            counters["errors"] += 1
+
+        async def on_connection_create_end(session, context, params):
+            counters["connections_created"] += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            counters["connections_reused"] += 1
+
+        async def on_connection_queued_start(session, context, params):
+            # The pool (or the per-host limit) was exhausted
+            counters["connection_queued"] += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_end.append(on_request_end)
+        trace.on_request_exception.append(on_request_exception)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace.on_connection_queued_start.append(on_connection_queued_start)
+        return trace
+
+    def _create_session(self, name):
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        # No total timeout: agent answers and STT uploads are long-lived streams.
+        # sock_read bounds how long a stream may go quiet.
+        timeout = aiohttp.ClientTimeout(total=None, connect=self.connect_timeout, sock_read=self.read_timeout)
+        return aiohttp.ClientSession(connector=connector, timeout=timeout, trace_configs=[self._trace_config(name)])
+
+    def session(self, name) -> aiohttp.ClientSession:
+        return self.sessions[name]
+
+    async def start(self, session_names, speech_client_factory=None, tts_client_factory=None):
+        for name in session_names:
+            self.sessions[name] = self._create_session(name)
+        if speech_client_factory is not None:
+            self.speech_client = speech_client_factory()
+        if tts_client_factory is not None:
+            self.tts_client = tts_client_factory()
+
+    async def close(self):
+        for session in self.sessions.values():
+            await session.close()
+        self.sessions = {}
+        for client in (self.speech_client, self.tts_client):
+            transport = getattr(client, "transport", None)
+            if transport is not None:
+                await transport.close()
+        self.speech_client = None
+        self.tts_client = None
+
+    def stats(self) -> dict:
+        pools = {}
+        for name, session in self.sessions.items():
+            counters = dict(self._counters[name])
+            lookups = counters["connections_created"] + counters["connections_reused"]
+            counters["reuse_rate"] = round(counters["connections_reused"] / lookups, 3) if lookups else 0.0
+            # aiohttp has no public pool gauges; read the connector's bookkeeping
+            connector = session.connector
+            in_use = len(getattr(connector, "_acquired", ()))
+            counters["connections_in_use"] = in_use
+            counters["connections_idle"] = sum(len(conns) for conns in getattr(connector, "_conns", {}).values())
+            counters["limit"] = self.limit
+            counters["limit_per_host"] = self.limit_per_host
+            counters["utilization"] = round(in_use / self.limit_per_host, 3)
+            pools[name] = counters
+        return {
+            "pools": pools,
+            "speech_client": self.speech_client is not None,
+            "tts_client": self.tts_client is not None,
+        }
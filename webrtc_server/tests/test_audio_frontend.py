@@ -0,0 +1,113 @@
+# webrtc_server/tests/test_audio_frontend.py
+import numpy as np
+import pytest
+
+from audio_frontend import AudioFrontEnd, Resampler, pcm16_to_mono, process_pcm
+
+RECORDING_RATE = 48000
+# Speech bursts, in seconds, inside a 4 s call; edges fall mid-packet so each
+# burst covers whole 100 ms packets: 0.5-1.5 s and 2.5-3.0 s
+BURSTS = [(0.55, 1.45), (2.55, 2.95)]
+DURATION = 4.0
+
+def tone(frequency, seconds, rate, amplitude=0.3):
+    t = np.arange(int(round(seconds * rate))) / rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+@pytest.fixture
+def recording():
+    """
+    A 48 kHz stereo 16-bit PCM call recording: -60 dB background noise with
+    a voiced tone during each burst, identical on both channels.
+    """
+    rng = np.random.default_rng(7)
+    mono = rng.normal(0, 0.001, int(DURATION * RECORDING_RATE)).astype(np.float32)
+    for start, end in BURSTS:
+        first = int(start * RECORDING_RATE)
+        burst = tone(220, end - start, RECORDING_RATE)
+        mono[first:first + len(burst)] += burst
+    pcm = (np.clip(mono, -1, 1) * 32767).astype('<i2')
+    return np.repeat(pcm, 2).tobytes()
+
+def test_pcm16_downmix(recording):
+    mono = pcm16_to_mono(recording, channels=2)
+    assert len(mono) == DURATION * RECORDING_RATE
+    # A trailing partial sample frame is ignored
+    assert len(pcm16_to_mono(recording[:-2], channels=2)) == len(mono) - 1
+
+# --- VAD segment boundaries ---
+
+def test_speech_segments_start_and_end_on_packet_boundaries(recording):
+    frontend = AudioFrontEnd(hangover_ms=400)
+    events = process_pcm(recording, RECORDING_RATE, channels=2, frontend=frontend)
+    boundaries = [(event["type"], event["at"]) for event in events if event["type"] != "audio"]
+    # Starts are the beginning of the first speech packet; ends come four
+    # silent packets (the hangover) after the last one
+    assert boundaries == [
+        ("speech_start", 0.5), ("speech_end", 1.9),
+        ("speech_start", 2.5), ("speech_end", 3.4),
+    ]
+    stats = frontend.stats()
+    assert stats["packets_in"] == 40
+    assert stats["speech_segments"] == 2
+    # Each segment: the packet before the onset, the speech packets and the hangover
+    assert stats["packets_sent"] == (1 + 10 + 4) + (1 + 5 + 4)
+
+def test_segment_still_open_at_the_end_is_closed_by_flush(recording):
+    # Cut the recording in the middle of the second burst
+    cut = int(2.8 * RECORDING_RATE) * 2 * 2
+    events = process_pcm(recording[:cut], RECORDING_RATE, channels=2)
+    assert events[-1] == {"type": "speech_end", "at": 2.8}
+
+def test_silence_sends_nothing(recording):
+    quiet = recording[:int(0.5 * RECORDING_RATE) * 4]
+    assert process_pcm(quiet, RECORDING_RATE, channels=2) == []
+
+# --- 16 kHz resampling ---
+
+def test_resampling_48k_to_16k_is_seamless_across_frames():
+    samples = tone(1000, 1.0, RECORDING_RATE)
+    whole = Resampler(RECORDING_RATE).process(samples)
+    framed = Resampler(RECORDING_RATE)
+    frame = RECORDING_RATE // 50
+    pieces = np.concatenate([framed.process(samples[i:i + frame]) for i in range(0, len(samples), frame)])
+    assert len(whole) == len(pieces) == 16000
+    np.testing.assert_allclose(pieces, whole, atol=1e-5)
+
+def test_resampling_keeps_speech_band_and_removes_aliases():
+    passed = Resampler(RECORDING_RATE).process(tone(1000, 1.0, RECORDING_RATE))
+    # After the filter's warm-up the output is the 1 kHz tone sampled at
+    # 16 kHz, delayed by the filter's 31 input samples
+    t = np.arange(len(passed)) / 16000 - 31 / RECORDING_RATE
+    steady = slice(100, None)
+    np.testing.assert_allclose(passed[steady], (0.3 * np.sin(2 * np.pi * 1000 * t))[steady], atol=0.01)
+    # 10 kHz is above the new 8 kHz Nyquist and would alias to 6 kHz
+    stopped = Resampler(RECORDING_RATE).process(tone(10000, 1.0, RECORDING_RATE))
+    assert np.sqrt(np.mean(stopped[steady] ** 2)) < 0.003
+
+def test_non_integer_ratio_uses_interpolation():
+    resampler = Resampler(44100)
+    samples = tone(440, 1.0, 44100)
+    frame = 441
+    out = np.concatenate([resampler.process(samples[i:i + frame]) for i in range(0, len(samples), frame)])
+    assert abs(len(out) - 16000) <= 1
+    # Output starts on the zero sample of history before the first block
+    t = np.arange(len(out)) / 16000 - 1 / 44100
+    assert out[0] == 0
+    np.testing.assert_allclose(out[1:], (0.3 * np.sin(2 * np.pi * 440 * t))[1:], atol=0.01)
+
+# --- 100 ms packetization ---
+
+def test_audio_is_sent_in_100ms_packets_whatever_the_input_framing():
+    frontend = AudioFrontEnd()
+    samples = tone(220, 1.05, 16000)
+    events = []
+    for i in range(0, len(samples), 333):
+        events.extend(frontend.process(samples[i:i + 333]))
+    audio = [event["pcm"] for event in events if event["type"] == "audio"]
+    assert len(audio) == 10
+    # 1600 samples of 16-bit PCM each; the last 50 ms wait for the next packet
+    assert {len(pcm) for pcm in audio} == {1600 * 2}
+    assert frontend.stats()["packets_in"] == 10
+    decoded = np.frombuffer(b"".join(audio), dtype='<i2').astype(np.float32) / 32767
+    np.testing.assert_allclose(decoded, samples[:16000], atol=1e-4)
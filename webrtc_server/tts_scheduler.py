@@ -0,0 +1,128 @@
+# webrtc_server/tts_scheduler.py
+import asyncio
+import re
+import time
+
+# Phrase boundaries: sentence ends always flush; clause punctuation flushes
+# once the phrase is long enough to be worth a round trip.
+_SENTENCE_END = re.compile(r'[.!?]["\')\]]*$')
+_CLAUSE_END = re.compile(r'[,;:—]$')
+
+_END = object()
+
+stats = {
+    "chunks_in": 0,
+    "phrases": 0,
+    "phrase_chars": 0,
+    "synth_requests": 0,
+    "synth_errors": 0,
+    "wait_ms_total": 0.0,  # time the sender waited on the next phrase's audio
+}
+
+def scheduler_stats() -> dict:
+    phrases = stats["phrases"]
+    return {
+        "chunks_in": stats["chunks_in"],
+        "phrases": phrases,
+        "synth_requests": stats["synth_requests"],
+        "synth_errors": stats["synth_errors"],
+        "chunks_per_request": round(stats["chunks_in"] / stats["synth_requests"], 2) if stats["synth_requests"] else 0.0,
+        "avg_phrase_chars": round(stats["phrase_chars"] / phrases, 1) if phrases else 0.0,
+        "avg_inter_phrase_wait_ms": round(stats["wait_ms_total"] / phrases, 2) if phrases else 0.0,
+    }
+
+async def aggregate_phrases(text_stream, min_chars=40, max_chars=200, timeout=0.3):
+    """
+    Buffers agent `text_chunk`s (single words or short phrases) into
+    phrase-sized strings. A phrase is emitted at a sentence end, at clause
+    punctuation once it has `min_chars`, at `max_chars`, or when no new
+    text has arrived for `timeout` seconds so a slow generator never leaves
+    the caller in silence.
+    """
+    chunks = asyncio.Queue()
+
+    async def pump():
+        try:
+            async for text_data in text_stream:
+                await chunks.put(text_data.get("text_chunk", ""))
+        finally:
+            await chunks.put(_END)
+
+    pump_task = asyncio.create_task(pump())
+    buffer = ""
+    try:
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.get(), timeout if buffer.strip() else None)
+            except asyncio.TimeoutError:
+                yield buffer.strip()
+                buffer = ""
+                continue
+            if chunk is _END:
+                break
+            stats["chunks_in"] += 1
+            buffer += chunk
+            phrase = buffer.rstrip()
+            if (_SENTENCE_END.search(phrase)
+                    or (len(phrase) >= min_chars and _CLAUSE_END.search(phrase))
+                    or len(phrase) >= max_chars):
+                yield phrase.strip()
+                buffer = ""
+        if buffer.strip():
+            yield buffer.strip()
+        # Surface errors from the upstream agent stream
+        await pump_task
+    finally:
+        pump_task.cancel()
+
+async def synthesize_in_order(phrases, synthesize, lookahead=3, counters=None):
+    """
+    Starts synthesis for up to `lookahead` phrases concurrently as they
+    arrive and yields their audio strictly in phrase order. A phrase that
+    fails to synthesize is skipped rather than ending the conversation.
+    If given, counters["chars_submitted"] tracks the text sent to TTS.
+    """
+    pending = asyncio.Queue()
+    slots = asyncio.Semaphore(max(1, lookahead))
+
+    async def schedule():
+        try:
+            async for phrase in phrases:
+                if not phrase:
+                    continue
+                # Waits once `lookahead` phrases are in flight or not yet sent
+                await slots.acquire()
+                stats["phrases"] += 1
+                stats["phrase_chars"] += len(phrase)
+                stats["synth_requests"] += 1
+                if counters is not None:
+                    counters["chars_submitted"] = counters.get("chars_submitted", 0) + len(phrase)
+                pending.put_nowait(asyncio.create_task(synthesize(phrase)))
+        finally:
+            pending.put_nowait(_END)
+
+    scheduler = asyncio.create_task(schedule())
+    try:
+        while True:
+            task = await pending.get()
+            if task is _END:
+                break
+            start = time.perf_counter()
+            try:
+                audio = await task
+            except Exception as e:
+                stats["synth_errors"] += 1
+                print(f"TTS synthesis failed for phrase: {e}")
+                continue
+            finally:
+                stats["wait_ms_total"] += (time.perf_counter() - start) * 1000
+                slots.release()
+            if audio:
+                yield audio
+        await scheduler
+    finally:
+        scheduler.cancel()
+        while not pending.empty():
+            task = pending.get_nowait()
+            if task is not _END:
+                task.cancel()